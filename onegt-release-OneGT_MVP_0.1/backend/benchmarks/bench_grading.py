@@ -0,0 +1,94 @@
+"""
+Grading benchmark: the per-question answer scan the grade route used before
+services.assessment_grading, against grade_submission.
+
+Grades SUBMISSIONS random submissions of a QUESTIONS-question assessment on
+THREADS threads (as concurrent grade requests would) and prints the best
+wall time of REPEAT runs for each. Grading only: no database.
+
+    cd backend
+    python benchmarks/bench_grading.py --questions 150 --submissions 500 --threads 20
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.assessment_grading import grade_submission  # noqa: E402
+
+OPTIONS = ["a", "b", "c", "d"]
+
+
+def grade_by_scan(questions, answers):
+    """The grade route's loop before the grading engine: one scan of the answers per question."""
+    correct_count = 0
+    detailed = []
+    for q in questions:
+        user_answer = next((a for a in answers if a["question_id"] == q["id"]), None)
+        submitted = user_answer["option_id"] if user_answer else ""
+        is_correct = submitted == q.get("correct_option_id", "")
+        if is_correct:
+            correct_count += 1
+        detailed.append({
+            "question_id": q["id"],
+            "submitted": submitted,
+            "correct": q.get("correct_option_id", ""),
+            "is_correct": is_correct,
+            "points_awarded": 1 if is_correct else 0,
+            "explanation": q.get("explanation"),
+        })
+    total = len(questions)
+    return (float(correct_count) / total) * 100 if total else 0.0, detailed
+
+
+def make_workload(n_questions, n_submissions, seed):
+    rng = random.Random(seed)
+    questions = [
+        {"id": f"q{i}", "correct_option_id": rng.choice(OPTIONS), "explanation": f"Question {i}"}
+        for i in range(n_questions)
+    ]
+    submissions = []
+    for _ in range(n_submissions):
+        answers = [{"question_id": q["id"], "option_id": rng.choice(OPTIONS)} for q in questions]
+        rng.shuffle(answers)
+        submissions.append(answers)
+    return questions, submissions
+
+
+def run(grade, questions, submissions, threads, repeat):
+    best = float("inf")
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(pool.map(lambda answers: grade(questions, answers), submissions))
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=150)
+    parser.add_argument("--submissions", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    questions, submissions = make_workload(args.questions, args.submissions, args.seed)
+    for answers in submissions[:20]:
+        assert grade_by_scan(questions, answers)[0] == grade_submission(questions, answers).score
+
+    scan = run(grade_by_scan, questions, submissions, args.threads, args.repeat)
+    indexed = run(grade_submission, questions, submissions, args.threads, args.repeat)
+    print(f"{args.submissions} submissions x {args.questions} questions on {args.threads} threads "
+          f"(best of {args.repeat})")
+    print(f"  answer scan per question: {scan * 1000:8.1f} ms")
+    print(f"  grade_submission:         {indexed * 1000:8.1f} ms  ({scan / indexed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
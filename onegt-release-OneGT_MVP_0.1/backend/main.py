@@ -4,7 +4,7 @@ import traceback
 import sys
 import asyncio
 from pathlib import Path
-from fastapi import FastAPI, Request, status
+from fastapi import Depends, FastAPI, Request, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -45,6 +45,7 @@ from routers.talent import candidates as talent_candidates, demands as talent_de
 # Import Assessment routers
 from routers.assessment import assessments as assessment_router, admin as assessment_admin, candidate as assessment_candidate, examiner as assessment_examiner, learning as assessment_learning
 from utils.assessment_db import init_db
+from middleware.auth_middleware import require_admin
 
 # ─────────────────────────────────────────────
 # Startup connectivity check
@@ -143,6 +144,17 @@ async def _check_external_apis():
     print(f"{BOLD}{'─'*60}{RESET}\n")
 
 
+async def _warm_profitability_cube():
+    """Cold-rebuild the finance profitability cube off the event loop and log the timings."""
+    from services.async_sheets import async_sheets
+    from services.profitability_cube import rebuild_profitability_cube
+    try:
+        report = await async_sheets.run(rebuild_profitability_cube)
+        logger.info(f"Profitability cube warm-up: {report}")
+    except Exception as e:
+        logger.error(f"Profitability cube warm-up failed: {e}")
+
+
 from contextlib import asynccontextmanager
 
 @asynccontextmanager
@@ -153,8 +165,18 @@ async def lifespan(app: FastAPI):
         init_db()
     except Exception as e:
         logger.error(f"Failed to initialize assessment database: {e}")
+    if settings.PROFITABILITY_CUBE_WARMUP:
+        app.state.cube_warmup = asyncio.create_task(_warm_profitability_cube())
+    from services.cache_bus import cache_bus
+    cache_bus.start()
     yield
-    # Run on shutdown (nothing needed)
+    cache_bus.stop()
+    # Run on shutdown: write out any queued sheet mutations
+    from services.google_sheets import sheets_service
+    try:
+        sheets_service.flush_writes()
+    except Exception as e:
+        logger.error(f"Failed to flush queued sheet writes: {e}")
 
 
 app = FastAPI(
@@ -270,6 +292,23 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/cache", dependencies=[Depends(require_admin)])
+async def cache_health():
+    """Cache, sync, pool and write-buffer gauges (Admin only: they expose internal state)."""
+    from services.google_sheets import sheets_service
+    from services.cashflow_engine import cashflow_engine
+    from services.profitability_cube import profitability_cube
+    from services.cache_bus import cache_bus
+    return {
+        "sheets": sheets_service.cache_stats(),
+        "sync": sheets_service.sync_stats(),
+        "invalidation_bus": cache_bus.stats(),
+        "client_pool": sheets_service.pool_stats(),
+        "writes": sheets_service.write_stats(),
+        "profitability_cube": profitability_cube.stats(),
+        "cashflow": cashflow_engine.stats()
+    }
+
 # Mount static files for production (must be after API routes)
 if STATIC_DIR.exists():
     app.mount("/assets", StaticFiles(directory=STATIC_DIR / "assets"), name="assets")
@@ -147,6 +147,10 @@ def group_rows_to_report(records: List[dict], report_id: str) -> Optional[Expens
     if not report_rows:
         return None
     
+    return rows_to_report(report_id, report_rows)
+
+def rows_to_report(report_id: str, report_rows: List[dict]) -> ExpenseReport:
+    """Build an ExpenseReport from the (non-empty) rows of one report."""
     # Get header info from first row
     first_row = report_rows[0]
     
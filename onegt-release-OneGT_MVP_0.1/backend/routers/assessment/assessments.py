@@ -2,21 +2,24 @@
 Assessment Router - Ported from Assessment-Portal-1/backend/main.py.
 Handles assessment creation, retrieval, and grading.
 """
+import asyncio
 import json
 import random
 import logging
 from datetime import datetime
 from typing import List, Optional, Any
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 
 from middleware.auth_middleware import get_current_user, TokenData
 from utils.assessment_db import (
-    save_assessment, get_assessment, update_assessment, delete_assessment,
-    get_all_assessments, save_result, get_user_attempt_count, mark_assessment_started,
-    upsert_user_from_token, _gen_id, _now_iso
+    get_assessment, delete_assessment, get_user_attempt_count, upsert_user_from_token, _gen_id, _now_iso,
+    AttemptNotAllowed
 )
+from utils.async_assessment_db import async_assessment_db as adb
 from services.assessment_ai import generate_questions
+from services.assessment_grading import grade_submission
 
 logger = logging.getLogger("chrms.assessment.assessments")
 
@@ -40,7 +43,7 @@ async def create_assessment_route(
     current_user: TokenData = Depends(get_current_user)
 ):
     # Sync user
-    upsert_user_from_token(current_user)
+    await adb.upsert_user_from_token(current_user)
     
     questions = []
     if questions_json and questions_json != "[]":
@@ -89,7 +92,7 @@ async def create_assessment_route(
                 except:
                     file_content = str(raw)
 
-        questions = generate_questions(prompt, file_content or None)
+        questions = await run_in_threadpool(generate_questions, prompt, file_content or None)
 
     if not questions:
         raise HTTPException(400, "No questions could be extracted or generated.")
@@ -112,7 +115,7 @@ async def create_assessment_route(
     except:
         assigned = []
 
-    save_assessment({
+    await adb.save_assessment({
         "assessment_id": assessment_id,
         "title": title,
         "description": description,
@@ -185,13 +188,13 @@ async def start_assessment_route(
     assessment_id: str, 
     current_user: TokenData = Depends(get_current_user)
 ):
-    upsert_user_from_token(current_user)
-    
-    assessment = get_assessment(assessment_id)
+    _, assessment = await asyncio.gather(
+        adb.upsert_user_from_token(current_user), adb.get_assessment(assessment_id)
+    )
     if not assessment:
         raise HTTPException(404, "Assessment not found")
 
-    mark_assessment_started(assessment_id, current_user.associate_id)
+    await adb.mark_assessment_started(assessment_id, current_user.associate_id)
     return {"success": True, "message": "Assessment started"}
 
 @router.post("/{assessment_id}/grade")
@@ -200,46 +203,21 @@ async def grade_assessment_route(
     request: Request,
     current_user: TokenData = Depends(get_current_user)
 ):
-    upsert_user_from_token(current_user)
-    
     body = await request.json()
-    assessment = get_assessment(assessment_id)
+    user_id = current_user.associate_id
+    _, assessment = await asyncio.gather(
+        adb.upsert_user_from_token(current_user),
+        adb.get_assessment(assessment_id),
+    )
     if not assessment:
         raise HTTPException(404, "Assessment not found")
 
-    user_id = current_user.associate_id
-    attempts = get_user_attempt_count(assessment_id, user_id)
-    retake_perms = assessment.get("retake_permissions", [])
-    has_retake = user_id in retake_perms
-
-    if attempts > 0 and not has_retake:
-        raise HTTPException(403, "You have already attempted this assessment.")
-
-    if attempts > 0 and has_retake:
-        updated = [uid for uid in retake_perms if uid != user_id]
-        update_assessment(assessment_id, {"retake_permissions": updated})
-
-    correct_count: int = 0
-    detailed = []
-
-    for q in assessment["questions"]:
-        answers = body.get("submissions") or body.get("answers") or []
-        user_answer = next((a for a in answers if a["question_id"] == q["id"]), None)
-        submitted = user_answer["option_id"] if user_answer else ""
-        is_correct = submitted == q.get("correct_option_id", "")
-        if is_correct:
-            correct_count += 1
-        detailed.append({
-            "question_id": q["id"],
-            "submitted": submitted,
-            "correct": q.get("correct_option_id", ""),
-            "is_correct": is_correct,
-            "points_awarded": 1 if is_correct else 0,
-            "explanation": q.get("explanation"),
-        })
-
+    try:
+        graded = grade_submission(assessment["questions"], body.get("submissions") or body.get("answers") or [])
+    except ValueError as e:
+        raise HTTPException(400, str(e))
     total = len(assessment["questions"])
-    score = (float(correct_count) / total) * 100 if total else 0.0
+    score = graded.score
 
     try:
         t_start = datetime.fromisoformat(body["time_started"].replace("Z", "+00:00")).timestamp()
@@ -256,8 +234,10 @@ async def grade_assessment_route(
         "score": score,
         "max_score": 100,
         "total_questions": total,
-        "correct_count": correct_count,
-        "detailed": detailed,
+        "correct_count": graded.correct_count,
+        "points_awarded": graded.points_awarded,
+        "points_possible": graded.points_possible,
+        "detailed": graded.detailed,
         "analytics": {
             "time_taken_seconds": time_taken,
             "accuracy_percent": score,
@@ -268,7 +248,11 @@ async def grade_assessment_route(
         "termination_reason": body.get("termination_reason"),
     }
 
-    save_result(result)
+    try:
+        # Checks the attempt limit and uses up a retake permission in the same transaction
+        await adb.save_graded_result(result)
+    except AttemptNotAllowed:
+        raise HTTPException(403, "You have already attempted this assessment.")
     return result
 
 @router.delete("/{assessment_id}/delete")
@@ -9,7 +9,7 @@ from fastapi.responses import JSONResponse
 
 from middleware.auth_middleware import get_current_user, TokenData
 from utils.assessment_db import (
-    get_assessments_by_candidate, get_results_by_user, get_assessment, 
+    get_assessments_by_candidate, get_results_by_user, get_results_with_titles,
     upsert_user_from_token
 )
 
@@ -49,14 +49,13 @@ def candidate_results(current_user: TokenData = Depends(get_current_user)):
     upsert_user_from_token(current_user)
     user_id = current_user.associate_id
     
-    results = get_results_by_user(user_id)
+    results = get_results_with_titles(user_id)
     formatted = []
     for r in results:
-        assessment = get_assessment(r["assessment_id"])
         res = r["result"]
         formatted.append({
             "assessment_id": r["assessment_id"],
-            "assessment_title": assessment["title"] if assessment else "Unknown Assessment",
+            "assessment_title": r["assessment_title"] or "Unknown Assessment",
             "score": res.get("score", 0),
             "max_score": res.get("max_score", 100),
             "graded_at": res.get("graded_at"),
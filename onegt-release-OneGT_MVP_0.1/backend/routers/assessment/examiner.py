@@ -2,6 +2,7 @@
 Assessment Examiner Router - Ported from Assessment-Portal-1/backend/main.py.
 Handles examiner-specific endpoints for managing assessments and viewing candidate results.
 """
+import asyncio
 import logging
 from typing import List, Optional, Any
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
@@ -9,10 +10,10 @@ from fastapi.responses import JSONResponse
 
 from middleware.auth_middleware import get_current_user, TokenData, require_manager_or_admin
 from utils.assessment_db import (
-    get_assessments_by_examiner, get_all_results, get_assessment,
-    get_user_by_id, get_results, update_assessment, get_user_attempt_count,
-    db_get_users_by_role, upsert_user_from_token
+    get_assessments_by_examiner, get_result_analytics, get_assessment,
+    get_user_by_id, get_results, get_results_with_users, upsert_user_from_token
 )
+from utils.async_assessment_db import async_assessment_db as adb
 
 logger = logging.getLogger("chrms.assessment.examiner")
 
@@ -38,16 +39,12 @@ def examiner_assessments(current_user: TokenData = Depends(require_manager_or_ad
         cid for a in assessments for cid in (a.get("assigned_to") or [])
     ))
 
-    all_results = get_all_results()
-    assessment_ids = {a.get("assessment_id") or a.get("id") for a in assessments}
-    relevant = [r for r in all_results if r["assessment_id"] in assessment_ids]
+    stats = get_result_analytics([a.get("assessment_id") or a.get("id") for a in assessments])
+    attempts = sum(s["attempts"] for s in stats)
 
     avg_score = 0
-    if relevant:
-        avg_score = sum(
-            (r["result"].get("score", 0) / max(r["result"].get("max_score", 100), 1)) * 100
-            for r in relevant
-        ) / len(relevant)
+    if attempts:
+        avg_score = sum(s["score_percent_sum"] for s in stats) / attempts
 
     formatted = [{
         "id": a.get("assessment_id") or a.get("id"),
@@ -56,7 +53,7 @@ def examiner_assessments(current_user: TokenData = Depends(require_manager_or_ad
         "difficulty": a.get("difficulty"),
         "created_at": _serialise(a.get("created_at")),
         "assigned_to": a.get("assigned_to", []),
-        "questions_count": len(a.get("questions", [])),
+        "questions_count": a["questions_count"],
     } for a in assessments]
 
     return {"assessments": formatted, "totalCandidates": total_candidates, "avgScore": avg_score}
@@ -81,20 +78,19 @@ def examiner_assessment_detail(
     if not assessment:
         raise HTTPException(404, "Assessment not found")
 
-    results = get_results(assessment_id)
+    results = get_results_with_users(assessment_id)
     sorted_results = sorted(results, key=lambda r: r["result"].get("graded_at", ""))
 
     user_attempts: dict[str, int] = {}
     formatted = []
     for r in sorted_results:
-        user = get_user_by_id(r["user_id"])
         retake_granted = r["user_id"] in (assessment.get("retake_permissions") or [])
         user_attempts[r["user_id"]] = user_attempts.get(r["user_id"], 0) + 1
         attempt_num = user_attempts[r["user_id"]]
         formatted.append({
             "user_id": r["user_id"],
-            "user_name": user["name"] if user else f"Unknown ({r['user_id'][:8]})",
-            "user_email": user["email"] if user else "N/A",
+            "user_name": r["user_name"] or f"Unknown ({r['user_id'][:8]})",
+            "user_email": r["user_email"] or "N/A",
             "score": r["result"].get("score", 0),
             "max_score": r["result"].get("max_score", 100),
             "graded_at": r["result"].get("graded_at"),
@@ -118,7 +114,7 @@ async def examiner_update_assignments(
     if not isinstance(assigned_to, list):
         raise HTTPException(400, "assigned_to must be an array")
 
-    updated = update_assessment(assessment_id, {"assigned_to": assigned_to})
+    updated = await adb.update_assessment(assessment_id, {"assigned_to": assigned_to})
     if not updated:
         raise HTTPException(404, "Assessment not found")
 
@@ -168,7 +164,9 @@ async def grant_retake(
     if not candidate_id:
         raise HTTPException(400, "candidate_id is required")
 
-    assessment = get_assessment(assessment_id)
+    assessment, attempts = await asyncio.gather(
+        adb.get_assessment(assessment_id), adb.get_user_attempt_count(assessment_id, candidate_id)
+    )
     if not assessment:
         raise HTTPException(404, "Assessment not found")
 
@@ -176,7 +174,6 @@ async def grant_retake(
     if assessment["created_by"] != current_user.associate_id and current_user.role != "Admin":
         raise HTTPException(403, "Only the creator or an admin can grant retake permissions")
 
-    attempts = get_user_attempt_count(assessment_id, candidate_id)
     if attempts == 0:
         raise HTTPException(400, "Candidate has not attempted this assessment yet")
 
@@ -184,7 +181,7 @@ async def grant_retake(
     if candidate_id in perms:
         return {"message": "Candidate already has retake permission"}
 
-    update_assessment(assessment_id, {"retake_permissions": perms + [candidate_id]})
+    await adb.update_assessment(assessment_id, {"retake_permissions": perms + [candidate_id]})
     return {"message": "Retake permission granted successfully",
             "candidate_id": candidate_id, "assessment_id": assessment_id}
 
@@ -200,7 +197,7 @@ async def revoke_retake(
     if not candidate_id:
         raise HTTPException(400, "candidate_id is required")
 
-    assessment = get_assessment(assessment_id)
+    assessment = await adb.get_assessment(assessment_id)
     if not assessment:
         raise HTTPException(404, "Assessment not found")
 
@@ -208,7 +205,7 @@ async def revoke_retake(
         raise HTTPException(403, "Only the creator or an admin can revoke retake permissions")
 
     perms = assessment.get("retake_permissions") or []
-    update_assessment(assessment_id, {
+    await adb.update_assessment(assessment_id, {
         "retake_permissions": [uid for uid in perms if uid != candidate_id]
     })
     return {"message": "Retake permission revoked successfully",
@@ -10,11 +10,12 @@ from fastapi.responses import JSONResponse
 
 from middleware.auth_middleware import get_current_user, TokenData, require_manager_or_admin
 from utils.assessment_db import (
-    get_all_learning_resources, get_learning_resource, create_learning_resource,
-    update_learning_resource, delete_learning_resource, save_learning_progress,
+    get_all_learning_resources, get_learning_resource,
+    delete_learning_resource, save_learning_progress,
     get_user_learning_progress, get_resource_view_analytics, upsert_user_from_token,
     _gen_id, _serialise
 )
+from utils.async_assessment_db import async_assessment_db as adb
 
 logger = logging.getLogger("chrms.assessment.learning")
 
@@ -43,7 +44,7 @@ async def create_learning_resource_route(
     request: Request, 
     current_user: TokenData = Depends(require_manager_or_admin)
 ):
-    upsert_user_from_token(current_user)
+    await adb.upsert_user_from_token(current_user)
     body = await request.json()
     title = body.get("title")
     description = body.get("description")
@@ -55,7 +56,7 @@ async def create_learning_resource_route(
 
     url_type = _determine_url_type(course_url)
 
-    resource = create_learning_resource({
+    resource = await adb.create_learning_resource({
         "id": _gen_id(),
         "title": title,
         "description": description,
@@ -85,7 +86,7 @@ async def update_learning_resource_route(
     request: Request,
     current_user: TokenData = Depends(require_manager_or_admin)
 ):
-    upsert_user_from_token(current_user)
+    await adb.upsert_user_from_token(current_user)
     body = await request.json()
 
     updates: dict = {}
@@ -96,7 +97,7 @@ async def update_learning_resource_route(
         updates["course_url"] = body["course_url"]
         updates["url_type"] = _determine_url_type(body["course_url"])
 
-    resource = update_learning_resource(resource_id, updates)
+    resource = await adb.update_learning_resource(resource_id, updates)
     if not resource:
         raise HTTPException(404, "Learning resource not found")
     safe = {k: _serialise(v) for k, v in resource.items()}
@@ -1,14 +1,19 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+import asyncio
 from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
 import re
 
-from services.google_sheets import sheets_service
+from services.async_sheets import async_sheets
+from services.currency_service import currency_service, RateTable
+from services.profitability_cube import profitability_cube, rebuild_profitability_cube
+from services.cashflow_engine import cashflow_engine
+from services.finance_rows import parse_month
 from config import settings
 from utils.logging_utils import trace_exceptions_async
 
-from middleware.auth_middleware import get_current_user_optional
+from middleware.auth_middleware import get_current_user_optional, require_admin
 from auth import TokenData
 from models.crms.deal import DealFinanceView
 from models.crms.invoice import Invoice, InvoiceItem
@@ -19,8 +24,6 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/crms/dashboard", tags=["CRMS - Dashboard"])
 
 
-import re
-
 def safe_float(val, default=0.0):
     try:
         if val is None or val == "":
@@ -46,88 +49,9 @@ def safe_int(val, default=0):
     except (ValueError, TypeError):
         return default
 
-def get_usd_converter():
-    try:
-        currency_records = sheets_service.get_all_records(settings.CURRENCY_SHEET)
-        rates_map = {}
-        for r in currency_records:
-            year = safe_int(r.get("Year"))
-            month = str(r.get("Month", ""))
-            if year and month:
-                rates_map[(year, month)] = {k: safe_float(v) for k, v in r.items() if k not in ["Year", "Month"]}
-                
-        def convert(value, record_currency, target_currency="USD", date_str=None):
-            if not record_currency or record_currency.upper() == target_currency.upper() or value == 0:
-                return value
-            
-            try:
-                dt = None
-                if date_str:
-                    try:
-                        dt = datetime.strptime(str(date_str)[:10], "%Y-%m-%d")
-                    except ValueError:
-                        pass
-                
-                months = ["", "Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-                
-                # Find rate to convert record currency to USD
-                rate_to_usd = 1.0
-                if record_currency.upper() != "USD":
-                    available_rates = []
-                    for (y, m), rates in rates_map.items():
-                        if rates.get(record_currency.upper()):
-                            month_idx = months.index(m) if m in months else 0
-                            available_rates.append((y, month_idx, rates[record_currency.upper()]))
-                            
-                    if not available_rates:
-                        return value # Cannot convert
-                        
-                    available_rates.sort(key=lambda x: (x[0], x[1]), reverse=True)
-                    rate_to_usd = available_rates[0][2] # Default to latest
-                    
-                    if dt:
-                        month_name = months[dt.month]
-                        period_rates = rates_map.get((dt.year, month_name))
-                        if period_rates and period_rates.get(record_currency.upper()):
-                            rate_to_usd = period_rates[record_currency.upper()]
-                
-                # Convert to USD first
-                usd_value = value / rate_to_usd
-                
-                # If target is USD, we're done
-                if target_currency.upper() == "USD":
-                    return usd_value
-                    
-                # Otherwise, find the target currency rate for the same period and multiply
-                target_rate = None
-                if dt:
-                    period_rates = rates_map.get((dt.year, month_name))
-                    if period_rates and period_rates.get(target_currency.upper()):
-                        target_rate = period_rates[target_currency.upper()]
-                
-                if not target_rate:
-                    # Find latest target rate
-                    target_available_rates = []
-                    for (y, m), rates in rates_map.items():
-                        if rates.get(target_currency.upper()):
-                            month_idx = months.index(m) if m in months else 0
-                            target_available_rates.append((y, month_idx, rates[target_currency.upper()]))
-                    if target_available_rates:
-                        target_available_rates.sort(key=lambda x: (x[0], x[1]), reverse=True)
-                        target_rate = target_available_rates[0][2]
-                
-                if target_rate:
-                    return usd_value * target_rate
-                    
-                return usd_value
-            except Exception as e:
-                logger.error(f"Error converting currency: {e}")
-                return value
-                
-        return convert
-    except Exception as e:
-        logger.error(f"Failed to initialize currency converter: {e}")
-        return lambda v, rc, tc, d=None: v
+async def load_rate_table() -> RateTable:
+    """Load the currency rate table off the event loop."""
+    return await async_sheets.run(currency_service.table)
 
 
 @router.get("/overview")
@@ -160,32 +84,44 @@ async def get_crms_overview(
         
         return owner == user_email or owner == user_name or owner == user_id or assigned_to == user_email or assigned_to == user_name or assigned_to == user_id
 
+    # Fetch every sheet this view needs in one batched call, alongside the currency rates
+    crms_data, rates = await asyncio.gather(
+        async_sheets.get_crms_many_records([
+            settings.CRMS_LEADS_SHEET, settings.CRMS_OPPORTUNITIES_SHEET, settings.CRMS_CUSTOMERS_SHEET,
+            settings.CRMS_DEALS_SHEET, settings.CRMS_TASKS_SHEET
+        ]),
+        load_rate_table()
+    )
+    
     # Get leads stats
-    all_leads = sheets_service.get_crms_all_records(settings.CRMS_LEADS_SHEET)
+    all_leads = crms_data[settings.CRMS_LEADS_SHEET]
     leads = [l for l in all_leads if matches_year(l, ["Created At", "Created On"]) and is_owned_by_user(l)]
     leads_new = len([l for l in leads if l.get("Status") == "New"])
     leads_qualified = len([l for l in leads if l.get("Status") == "Qualified"])
     
-    convert_currency = get_usd_converter()
-    
     # Get opportunities stats
-    all_opportunities = sheets_service.get_crms_all_records(settings.CRMS_OPPORTUNITIES_SHEET)
+    all_opportunities = crms_data[settings.CRMS_OPPORTUNITIES_SHEET]
     opportunities = [o for o in all_opportunities 
                      if matches_year(o, ["Created At", "Created On", "Expected Close Date"]) and is_owned_by_user(o)]
     
-    total_opp_value = sum(convert_currency(safe_float(o.get("Value")), o.get("Currency", "USD"), currency, o.get("Expected Close Date")) for o in opportunities)
-    weighted_value = sum(
-        convert_currency(safe_float(o.get("Value")), o.get("Currency", "USD"), currency, o.get("Expected Close Date")) * (safe_int(o.get("Probability")) / 100)
-        for o in opportunities
+    opp_values = rates.convert_many(
+        [safe_float(o.get("Value")) for o in opportunities],
+        [o.get("Currency", "USD") for o in opportunities],
+        [o.get("Expected Close Date") for o in opportunities],
+        currency
     )
+    total_opp_value = float(opp_values.sum())
+    weighted_value = float(sum(
+        value * (safe_int(o.get("Probability")) / 100) for value, o in zip(opp_values, opportunities)
+    ))
     
     # Get customers stats
-    all_customers = sheets_service.get_crms_all_records(settings.CRMS_CUSTOMERS_SHEET)
+    all_customers = crms_data[settings.CRMS_CUSTOMERS_SHEET]
     customers = [c for c in all_customers 
                  if matches_year(c, ["Created At", "Created On"])]
     
     # Get deals stats
-    all_deals = sheets_service.get_crms_all_records(settings.CRMS_DEALS_SHEET)
+    all_deals = crms_data[settings.CRMS_DEALS_SHEET]
     owned_deals = [d for d in all_deals if is_owned_by_user(d)]
     
     won_deals_total = []
@@ -194,9 +130,14 @@ async def get_crms_overview(
     lost_deals_count = 0
     total_deals_in_period = 0
     
-    for d in owned_deals:
+    deal_values = rates.convert_many(
+        [safe_float(d.get("Value")) for d in owned_deals],
+        [d.get("Currency", "USD") for d in owned_deals],
+        [d.get("Close Date", "") for d in owned_deals],
+        currency
+    )
+    for d, value in zip(owned_deals, deal_values.tolist()):
         stage = d.get("Stage")
-        value = convert_currency(safe_float(d.get("Value")), d.get("Currency", "USD"), currency, d.get("Close Date", ""))
         
         if stage in ["Closed Won", "Closed Lost"]:
             if matches_year(d, ["Close Date"]):
@@ -218,7 +159,7 @@ async def get_crms_overview(
     conversion_rate = (len(customers) / len(leads) * 100) if len(leads) > 0 else 0
     
     # Get tasks stats
-    all_tasks = sheets_service.get_crms_all_records(settings.CRMS_TASKS_SHEET)
+    all_tasks = crms_data[settings.CRMS_TASKS_SHEET]
     tasks = [t for t in all_tasks if is_owned_by_user(t)]
     open_tasks = len([t for t in tasks if t.get("Status") == "Open"])
     overdue_tasks = len([
@@ -289,25 +230,34 @@ async def get_sales_pipeline(
         
         return owner == user_email or owner == user_name or owner == user_id or assigned_to == user_email or assigned_to == user_name or assigned_to == user_id
         
-    all_opportunities = sheets_service.get_crms_all_records(settings.CRMS_OPPORTUNITIES_SHEET)
+    all_opportunities, rates = await asyncio.gather(
+        async_sheets.get_crms_all_records(settings.CRMS_OPPORTUNITIES_SHEET),
+        load_rate_table()
+    )
     opportunities = [o for o in all_opportunities if matches_year(o, ["Created At", "Created On", "Expected Close Date"]) and is_owned_by_user(o)]
     
-    convert_currency = get_usd_converter()
-    
     stages = ["Qualification", "Proposal", "Negotiation", "Closed Won", "Closed Lost"]
     pipeline = {}
     
+    opp_values = rates.convert_many(
+        [safe_float(o.get("Value")) for o in opportunities],
+        [o.get("Currency", "USD") for o in opportunities],
+        [o.get("Expected Close Date") for o in opportunities],
+        currency
+    )
+    opp_stages = [o.get("Stage") for o in opportunities]
+    
     for stage in stages:
-        stage_opps = [o for o in opportunities if o.get("Stage") == stage]
+        in_stage = [i for i, s in enumerate(opp_stages) if s == stage]
         pipeline[stage] = {
-            "count": len(stage_opps),
-            "value": sum(convert_currency(safe_float(o.get("Value")), o.get("Currency", "USD"), currency, o.get("Expected Close Date")) for o in stage_opps)
+            "count": len(in_stage),
+            "value": float(opp_values[in_stage].sum())
         }
     
     return {
         "pipeline": pipeline,
         "total_opportunities": len(opportunities),
-        "total_value": sum(convert_currency(safe_float(o.get("Value")), o.get("Currency", "USD"), currency, o.get("Expected Close Date")) for o in opportunities)
+        "total_value": float(opp_values.sum())
     }
 
 @router.get("/lead-sources")
@@ -337,7 +287,7 @@ async def get_lead_sources(
         
         return owner == user_email or owner == user_name or owner == user_id or assigned_to == user_email or assigned_to == user_name or assigned_to == user_id
         
-    all_leads = sheets_service.get_crms_all_records(settings.CRMS_LEADS_SHEET)
+    all_leads = await async_sheets.get_crms_all_records(settings.CRMS_LEADS_SHEET)
     leads = [l for l in all_leads if matches_year(l, ["Created At", "Created On"]) and is_owned_by_user(l)]
     
     sources = {}
@@ -368,8 +318,10 @@ async def get_recent_activities(current_user: Optional[TokenData] = Depends(get_
         
         return owner == user_email or owner == user_name or owner == user_id or assigned_to == user_email or assigned_to == user_name or assigned_to == user_id
 
+    crms_data = await async_sheets.get_crms_many_records([settings.CRMS_CALLS_SHEET, settings.CRMS_TASKS_SHEET])
+    
     # Get recent calls
-    all_calls = sheets_service.get_crms_all_records(settings.CRMS_CALLS_SHEET)
+    all_calls = crms_data[settings.CRMS_CALLS_SHEET]
     calls = [c for c in all_calls if is_owned_by_user(c)]
     recent_calls = sorted(
         calls,
@@ -378,7 +330,7 @@ async def get_recent_activities(current_user: Optional[TokenData] = Depends(get_
     )[:10]
     
     # Get recent tasks
-    all_tasks = sheets_service.get_crms_all_records(settings.CRMS_TASKS_SHEET)
+    all_tasks = crms_data[settings.CRMS_TASKS_SHEET]
     tasks = [t for t in all_tasks if is_owned_by_user(t)]
     recent_tasks = sorted(
         tasks,
@@ -427,12 +379,14 @@ async def get_finance_overview(current_user: Optional[TokenData] = Depends(get_c
         
         return owner == user_email or owner == user_name or owner == user_id or assigned_to == user_email or assigned_to == user_name or assigned_to == user_id
 
+    crms_data = await async_sheets.get_crms_many_records([settings.CRMS_DEALS_SHEET, CRMS_INVOICES_SHEET])
+    
     # 1. Fetch Deals
-    all_deals = sheets_service.get_crms_all_records(settings.CRMS_DEALS_SHEET)
+    all_deals = crms_data[settings.CRMS_DEALS_SHEET]
     owned_deals = [d for d in all_deals if is_owned_by_user(d)]
 
     # 2. Fetch Invoices
-    all_invoices = sheets_service.get_crms_all_records(CRMS_INVOICES_SHEET)
+    all_invoices = crms_data[CRMS_INVOICES_SHEET]
     
     # 3. Process Invoices into Models
     invoice_models = []
@@ -506,7 +460,7 @@ async def debug_payroll():
     # Call the actual profitability function internally to see what it generates
     res = await get_finance_profitability()
     
-    all_projects = sheets_service.get_all_records(settings.PROJECTS_SHEET)
+    all_projects = await async_sheets.get_all_records(settings.PROJECTS_SHEET)
     project_to_deal_map = {
         str(p.get("Project ID", "")).strip(): str(p.get("Deal ID", "")).strip()
         for p in all_projects 
@@ -519,516 +473,93 @@ async def debug_payroll():
         "profitability": res
     }
 
+def _parse_month(value: Optional[str], name: str):
+    """Parse a YYYY-MM query parameter into (year, month)."""
+    try:
+        return parse_month(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be in YYYY-MM format")
+
+
 @router.get("/finance/profitability")
 @trace_exceptions_async
 async def get_finance_profitability(
     currency: str = "USD",
+    start_month: Optional[str] = None,
+    end_month: Optional[str] = None,
     current_user: Optional[TokenData] = Depends(get_current_user_optional)
 ):
-    """Get profitability data mapped by Project (Deal)."""
-    
-    # 1. Fetch Deals
-    all_deals = sheets_service.get_crms_all_records(settings.CRMS_DEALS_SHEET)
-    
-    # Currency converter
-    convert_currency = get_usd_converter()
-    
-    # 2. Fetch Customers
-    all_customers = sheets_service.get_crms_all_records(settings.CRMS_CUSTOMERS_SHEET)
-    customer_map = {str(c.get("Customer ID", "")).strip(): c.get("Customer Name", "") for c in all_customers}
+    """Get profitability data mapped by Project (Deal), optionally for months in [start_month, end_month]."""
+    start = _parse_month(start_month, "start_month")
+    end = _parse_month(end_month, "end_month")
+    
+    # Fetch the cube's sources and the currency rates: one batchGet per spreadsheet, run concurrently
+    crms_data, hrms_data = await asyncio.gather(
+        async_sheets.get_crms_many_records([
+            settings.CRMS_DEALS_SHEET, settings.CRMS_CUSTOMERS_SHEET, CRMS_INVOICES_SHEET
+        ]),
+        async_sheets.get_many_records([
+            settings.CURRENCY_SHEET, settings.PAYROLL_SHEET, settings.PROJECTS_SHEET,
+            settings.ALLOCATIONS_SHEET, settings.EXPENSES_SHEET
+        ])
+    )
+    rates = currency_service.table_for(hrms_data[settings.CURRENCY_SHEET])
     
-    # 3. Fetch Invoices -> Income
-    all_invoices = sheets_service.get_crms_all_records(CRMS_INVOICES_SHEET)
+    # Apply whatever changed since the last request (a no-op while the sheets are unchanged)
+    await async_sheets.run(profitability_cube.refresh, {
+        "deals": crms_data[settings.CRMS_DEALS_SHEET],
+        "customers": crms_data[settings.CRMS_CUSTOMERS_SHEET],
+        "invoices": crms_data[CRMS_INVOICES_SHEET],
+        "payroll": hrms_data[settings.PAYROLL_SHEET],
+        "projects": hrms_data[settings.PROJECTS_SHEET],
+        "allocations": hrms_data[settings.ALLOCATIONS_SHEET],
+        "expenses": hrms_data[settings.EXPENSES_SHEET],
+    })
     
-    # 4. Fetch Payroll -> Exact Salary values per associate & month
-    all_payroll = sheets_service.get_all_records(settings.PAYROLL_SHEET)
-    payroll_map = {} # dict[(associate_id, year, month)] -> earnings
-    for row in all_payroll:
-        aid = str(row.get("Employee Code") or row.get("Associate ID") or "").strip()
-        year = str(row.get("Year") or row.get("Payroll Year") or "").strip()
-        month = str(row.get("Month") or row.get("Payroll Month") or "").strip()
-        earnings_str = str(row.get("Earnings", "0")).replace(",", "").replace("₹", "").strip()
-        # Fallback to Net Pay if Earnings not available
-        if not safe_float(earnings_str, 0):
-            earnings_str = str(row.get("Net Pay", "0")).replace(",", "").replace("₹", "").strip()
-        
-        earnings = safe_float(earnings_str, 0.0)
-        
-        if aid and year and month:
-            # Standardize month to 3 letter abbreviation or full name parsing if needed
-            payroll_map[(aid, year, month[:3].capitalize())] = earnings
-            # Also store with full month name just in case
-            payroll_map[(aid, year, month.capitalize())] = earnings
+    return {"profitability": profitability_cube.lookup(rates, currency, start, end)}
 
-    # 5. Fetch Projects to map Project ID to Deal ID
-    all_projects = sheets_service.get_all_records(settings.PROJECTS_SHEET)
-    
-    # Pre-process deals for matching by Customer ID and Value
-    deals_by_cust_val = {}
-    for d in all_deals:
-        c_id = str(d.get("Customer ID", "")).strip()
-        val_str = str(d.get("Value", "")).replace(",", "").replace("$", "").replace("₹", "").strip()
-        if c_id and val_str:
-            val = safe_float(val_str)
-            if val > 0:
-                key = f"{c_id}_{val}"
-                deals_by_cust_val[key] = str(d.get("Deal ID", "")).strip()
 
-    project_to_deal_map = {}
-    for p in all_projects:
-        pid = str(p.get("Project ID", "")).strip()
-        if not pid: continue
-        
-        did = str(p.get("Deal ID", "")).strip()
-        if did:
-            project_to_deal_map[pid] = did
-        else:
-            # Fallback to Customer ID and SOW Value match
-            c_id = str(p.get("Customer ID", "")).strip()
-            sow_val = str(p.get("SOW Value", "0")).replace(",", "").replace("$", "").replace("₹", "").strip()
-            if c_id and sow_val:
-                val = safe_float(sow_val)
-                if val > 0:
-                    key = f"{c_id}_{val}"
-                    if key in deals_by_cust_val:
-                        project_to_deal_map[pid] = deals_by_cust_val[key]
-
-    # 5b. Fetch Allocations -> Salary Expenses
-    all_allocations = sheets_service.get_all_records(settings.ALLOCATIONS_SHEET)
-    
-    def calculate_allocation_cost(alloc, aid, alloc_start, alloc_end):
-        try:
-            alloc_pct = safe_float(str(alloc.get("Allocation %", "")).replace("%", ""), 100) / 100
-            
-            # Create a date range to check exactly which months are covered
-            current_date = alloc_start
-            total_cost = 0.0
-            
-            while current_date <= alloc_end:
-                year_str = str(current_date.year)
-                month_str_short = current_date.strftime("%b") # e.g., 'Jan'
-                month_str_long = current_date.strftime("%B") # e.g., 'January'
-                
-                # Check payroll map
-                monthly_salary = payroll_map.get((aid, year_str, month_str_long)) or \
-                                 payroll_map.get((aid, year_str, month_str_short))
-                                 
-                if monthly_salary is None:
-                    # Explicitly fallback to 0.0 if exact payroll for that month is missing
-                    monthly_salary = 0.0
-                
-                # Calculate how many days in this month are within the allocation
-                # Next month start
-                if current_date.month == 12:
-                    next_month = datetime(current_date.year + 1, 1, 1)
-                else:
-                    next_month = datetime(current_date.year, current_date.month + 1, 1)
-                
-                month_end = next_month - timedelta(days=1)
-                
-                # Overlap of allocation period and this month
-                overlap_end = min(alloc_end, month_end)
-                overlap_start = max(alloc_start, datetime(current_date.year, current_date.month, 1))
-                
-                overlap_days = (overlap_end - overlap_start).days + 1
-                days_in_month = (month_end - datetime(current_date.year, current_date.month, 1)).days + 1
-                
-                cost_for_month = (monthly_salary / days_in_month) * overlap_days * alloc_pct
-                converted_cost = convert_currency(cost_for_month, "INR", currency, current_date)
-                total_cost += converted_cost
-                
-                current_date = next_month
-                
-            return total_cost
-        except Exception as e:
-            logger.warning(f"Error calculating allocation cost: {e}")
-            return 0.0
-            
-    project_salary_expenses = {}
-    from utils.date_utils import parse_date_from_sheet
-    for al in all_allocations:
-        status = str(al.get("Status", "")).upper().strip()
-        if status in ["CANCELED", "REJECTED", "DRAFT"]:
-            continue
-            
-        pid = str(al.get("Project ID", "")).strip()
-        deal_id = project_to_deal_map.get(pid) or pid
-        aid = str(al.get("Associate ID", "")).strip()
-        
-        start_str = al.get("Start Date", "").strip()
-        end_str = al.get("End Date", "").strip()
-        if not start_str or not end_str:
-            continue
-            
-        d1 = parse_date_from_sheet(start_str)
-        d2 = parse_date_from_sheet(end_str)
-        if not d1 or not d2:
-            continue
-            
-        alloc_start = datetime.strptime(d1, "%Y-%m-%d")
-        alloc_end = datetime.strptime(d2, "%Y-%m-%d")
-        
-        if alloc_end < alloc_start:
-            continue
-            
-        cost = calculate_allocation_cost(al, aid, alloc_start, alloc_end)
-        project_salary_expenses[deal_id] = project_salary_expenses.get(deal_id, 0.0) + cost
-        
-    # 6. Fetch Expenses -> Other Expenses
-    all_expenses = sheets_service.get_all_records(settings.EXPENSES_SHEET)
-    project_other_expenses = {}
-    for exp in all_expenses:
-        status = str(exp.get("Status", "")).upper().strip()
-        if status not in ["APPROVED", "PAID", "SUBMITTED"]: # Includes submitted as pending potential expenses
-            continue
-            
-        pid = str(exp.get("Project ID", "")).strip()
-        deal_id = project_to_deal_map.get(pid) or pid
-        amount_str = str(exp.get("Total Amount INR") or exp.get("Total Amount") or exp.get("total_amount") or "0").replace(",", "").replace("₹", "").strip()
-        
-        # Expenses are typically recorded in INR when looking at 'Total Amount INR'.
-        # If the key was just 'Total Amount' and actually in another currency, 
-        # we'd need a separate Currency column, but assuming INR as base for HRMS expenses
-        exp_date = str(exp.get("Date", exp.get("Expense Date", "")))
-        amount_inr = safe_float(amount_str, 0.0)
-        
-        # Convert to requested currency
-        amount = convert_currency(amount_inr, "INR", currency, exp_date)
-        
-        project_other_expenses[deal_id] = project_other_expenses.get(deal_id, 0.0) + amount
-        
-    # 7. Aggregate
-    profitability = []
-    
-    # Process invoices
-    project_income = {}
-    for inv in all_invoices:
-        status = str(inv.get("Status", "")).lower().strip()
-        if status == "cancelled":
-            continue
-        pid = str(inv.get("Deal Id", "")).strip()
-        amount_str = str(inv.get("Invoice Total", inv.get("Total Amount")) or "0").replace(",", "").replace("$", "").replace("₹", "").strip()
-        raw_amount = safe_float(amount_str, 0.0)
-        
-        inv_curr = inv.get("Currency", "USD")
-        inv_date = inv.get("Issue Date", "")
-        amount = convert_currency(raw_amount, inv_curr, currency, inv_date)
-        
-        project_income[pid] = project_income.get(pid, 0.0) + amount
-        
-    processed_deal_ids = set()
-    for d in all_deals:
-        deal_id = str(d.get("Deal ID", "")).strip()
-        cust_id = str(d.get("Customer ID", "")).strip()
-        name = d.get("Deal Name", "")
-        
-        if deal_id:
-            processed_deal_ids.add(deal_id)
-        
-        income = project_income.get(deal_id, 0.0)
-        salary_exp = project_salary_expenses.get(deal_id, 0.0)
-        other_exp = project_other_expenses.get(deal_id, 0.0)
-        
-        if income == 0 and salary_exp == 0 and other_exp == 0:
-            continue
-            
-        net_profit = income - salary_exp - other_exp
-        margin = (net_profit / income * 100) if income > 0 else 0.0
-        
-        profitability.append({
-            "deal_id": deal_id,
-            "deal_name": name,
-            "customer_id": cust_id,
-            "customer_name": customer_map.get(cust_id, "Unknown Customer"),
-            "income": income,
-            "salary_expense": salary_exp,
-            "other_expense": other_exp,
-            "net_profit": net_profit,
-            "margin_percentage": margin
-        })
-        
-    # Add unmapped projects (e.g., internal/investment projects)
-    all_cost_keys = set(project_income.keys()).union(set(project_salary_expenses.keys())).union(set(project_other_expenses.keys()))
-    unmapped_keys = all_cost_keys - processed_deal_ids
-    
-    project_info_map = {str(p.get("Project ID", "")).strip(): p for p in all_projects if str(p.get("Project ID", "")).strip()}
-    
-    for key in unmapped_keys:
-        if not key:
-            continue
-            
-        p = project_info_map.get(key, {})
-        name = p.get("Project Name", key)
-        cust_id = str(p.get("Customer ID", "")).strip()
-        
-        income = project_income.get(key, 0.0)
-        salary_exp = project_salary_expenses.get(key, 0.0)
-        other_exp = project_other_expenses.get(key, 0.0)
-        
-        if income == 0 and salary_exp == 0 and other_exp == 0:
-            continue
-            
-        net_profit = income - salary_exp - other_exp
-        margin = (net_profit / income * 100) if income > 0 else 0.0
-        
-        profitability.append({
-            "deal_id": key,
-            "deal_name": name + " (Investment/Internal)",
-            "customer_id": cust_id,
-            "customer_name": customer_map.get(cust_id, "Internal" if not cust_id else "Unknown Customer"),
-            "income": income,
-            "salary_expense": salary_exp,
-            "other_expense": other_exp,
-            "net_profit": net_profit,
-            "margin_percentage": margin
-        })
-        
-    return {"profitability": profitability}
+@router.post("/finance/profitability/rebuild")
+@trace_exceptions_async
+async def rebuild_finance_profitability(
+    current_user: TokenData = Depends(require_admin)
+):
+    """Rebuild the profitability cube from scratch and report how long it took (Admin only)."""
+    report = await async_sheets.run(rebuild_profitability_cube)
+    return {"rebuild": report, "stats": profitability_cube.stats()}
 
 @router.get("/finance/cashflow")
 @trace_exceptions_async
 async def get_finance_cashflow(
     currency: str = "USD",
+    from_month: Optional[str] = Query(None, alias="from", description="First month (YYYY-MM)"),
+    to_month: Optional[str] = Query(None, alias="to", description="Last month (YYYY-MM)"),
+    granularity: str = Query("month", description="month or quarter"),
     current_user: Optional[TokenData] = Depends(get_current_user_optional)
 ):
     """Get cash flow data showing actual balances and projections."""
-    
-    # 1. Fetch necessary data
-    all_deals = sheets_service.get_crms_all_records(settings.CRMS_DEALS_SHEET)
-    all_invoices = sheets_service.get_crms_all_records(CRMS_INVOICES_SHEET)
-    all_expenses = sheets_service.get_all_records(settings.EXPENSES_SHEET)
-    all_allocations = sheets_service.get_all_records(settings.ALLOCATIONS_SHEET)
-    all_payroll = sheets_service.get_all_records(settings.PAYROLL_SHEET)
-    convert_currency = get_usd_converter()
-    
-    from utils.date_utils import parse_date_from_sheet
-    
-    # Track metrics by month-year string e.g., '2024-01'
-    monthly_data = {}
-    def init_month(ym_str):
-        if ym_str not in monthly_data:
-            monthly_data[ym_str] = {
-                "month_key": ym_str,
-                "actual_in": 0.0,
-                "actual_out": 0.0,
-                "projected_in": 0.0,
-                "projected_out": 0.0,
-            }
-            
-    today = datetime.now()
-    ym_today = today.strftime("%Y-%m")
-            
-    # --- 1. Process Income (Invoices) ---
-    for inv in all_invoices:
-        status = str(inv.get("Status", "")).lower().strip()
-        if status == "cancelled":
-            continue
-            
-        amount_str = str(inv.get("Invoice Total", inv.get("Total Amount")) or "0").replace(",", "").replace("$", "").replace("₹", "").strip()
-        raw_amount = safe_float(amount_str, 0.0)
-        if raw_amount <= 0:
-            continue
-            
-        inv_curr = inv.get("Currency", "USD")
-        
-        if status == "paid":
-            # Actual In
-            pay_date_str = inv.get("Payment Date") or inv.get("Issue Date") or ""
-            d_str = parse_date_from_sheet(pay_date_str)
-            if d_str:
-                d = datetime.strptime(d_str, "%Y-%m-%d")
-                conv_amount = convert_currency(raw_amount, inv_curr, currency, d_str)
-                ym_str = d.strftime("%Y-%m")
-                init_month(ym_str)
-                monthly_data[ym_str]["actual_in"] += conv_amount
-        else:
-            # Projected In (Sent, Overdue, Draft)
-            due_date_str = inv.get("Due Date") or inv.get("Issue Date") or ""
-            d_str = parse_date_from_sheet(due_date_str)
-            if d_str:
-                d = datetime.strptime(d_str, "%Y-%m-%d")
-                # If due date is strictly in the past, roll it into current month's projection
-                if d < today:
-                    d = today
-                conv_amount = convert_currency(raw_amount, inv_curr, currency, d.strftime("%Y-%m-%d"))
-                ym_str = d.strftime("%Y-%m")
-                init_month(ym_str)
-                monthly_data[ym_str]["projected_in"] += conv_amount
-                
-    # --- 2. Process Projections (Active Deals remaining value) ---
-    deal_invoiced = {}
-    for inv in all_invoices:
-        status = str(inv.get("Status", "")).lower().strip()
-        if status == "cancelled":
-            continue
-        did = str(inv.get("Deal Id", "")).strip()
-        amount_str = str(inv.get("Invoice Total", inv.get("Total Amount")) or "0").replace(",", "").replace("$", "").replace("₹", "").strip()
-        amt = safe_float(amount_str, 0.0)
-        # Convert all to a baseline (e.g. USD) for comparison against deal value
-        inv_curr = inv.get("Currency", "USD")
-        amt_usd = convert_currency(amt, inv_curr, "USD", inv.get("Issue Date", ""))
-        deal_invoiced[did] = deal_invoiced.get(did, 0.0) + amt_usd
-        
-    for d in all_deals:
-        did = str(d.get("Deal ID", "")).strip()
-        status = str(d.get("Status", "")).lower().strip()
-        if "lost" in status or "cancelled" in status:
-            continue
-            
-        end_date_str = parse_date_from_sheet(d.get("End Date", ""))
-        val_str = str(d.get("Value", "0")).replace(",", "").replace("$", "").replace("₹", "").strip()
-        total_val_usd = convert_currency(safe_float(val_str, 0.0), d.get("Currency", "USD"), "USD", today.strftime("%Y-%m-%d"))
-        
-        invoiced_usd = deal_invoiced.get(did, 0.0)
-        remaining_val_usd = max(0, total_val_usd - invoiced_usd)
-        
-        if remaining_val_usd > 0 and end_date_str:
-            end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
-            # If the deal ends in the future, spread the remaining balance over the upcoming months
-            if end_date > today:
-                months_diff = (end_date.year - today.year) * 12 + (end_date.month - today.month) + 1
-                if months_diff > 0:
-                    val_per_month_usd = remaining_val_usd / months_diff
-                    val_per_month = convert_currency(val_per_month_usd, "USD", currency, today.strftime("%Y-%m-%d"))
-                    
-                    for i in range(months_diff):
-                        proj_date = datetime(today.year, today.month, 1) + timedelta(days=32 * i)
-                        proj_date = proj_date.replace(day=1)
-                        ym_str = proj_date.strftime("%Y-%m")
-                        init_month(ym_str)
-                        monthly_data[ym_str]["projected_in"] += val_per_month
-                        
-    # --- 3. Process Expenses (Other Expenses) ---
-    for exp in all_expenses:
-        status = str(exp.get("Status", "")).upper().strip()
-        if status not in ["APPROVED", "PAID"]: 
-            continue
-            
-        amount_str = str(exp.get("Total Amount INR") or exp.get("Total Amount") or exp.get("total_amount") or "0").replace(",", "").replace("₹", "").strip()
-        raw_amount = safe_float(amount_str, 0.0)
-        if raw_amount <= 0:
-            continue
-            
-        exp_date_str = str(exp.get("Date", exp.get("Expense Date", "")))
-        d_str = parse_date_from_sheet(exp_date_str)
-        if d_str:
-            d = datetime.strptime(d_str, "%Y-%m-%d")
-            conv_amount = convert_currency(raw_amount, "INR", currency, d_str)
-            ym_str = d.strftime("%Y-%m")
-            init_month(ym_str)
-            # Historically in the past vs future projections
-            if ym_str <= ym_today:
-                monthly_data[ym_str]["actual_out"] += conv_amount
-            else:
-                monthly_data[ym_str]["projected_out"] += conv_amount
-
-    # --- 4. Process Salaries (Allocations) ---
-    payroll_map = {}
-    for row in all_payroll:
-        aid = str(row.get("Employee Code") or row.get("Associate ID") or "").strip()
-        year = str(row.get("Year") or row.get("Payroll Year") or "").strip()
-        month = str(row.get("Month") or row.get("Payroll Month") or "").strip()
-        earnings_str = str(row.get("Earnings", "0")).replace(",", "").replace("₹", "").strip()
-        if not safe_float(earnings_str, 0):
-            earnings_str = str(row.get("Net Pay", "0")).replace(",", "").replace("₹", "").strip()
-        earnings = safe_float(earnings_str, 0.0)
-        if aid and year and month:
-            payroll_map[(aid, year, month[:3].capitalize())] = earnings
-            payroll_map[(aid, year, month.capitalize())] = earnings
-
-    # Extrapolate most recent salary for future projections
-    latest_salaries = {}
-    for aid, y, m in payroll_map.keys():
-        earn = payroll_map[(aid, y, m)]
-        if aid not in latest_salaries or earn > latest_salaries[aid]:
-            latest_salaries[aid] = earn
-
-    for al in all_allocations:
-        status = str(al.get("Status", "")).upper().strip()
-        if status in ["CANCELED", "REJECTED", "DRAFT"]:
-            continue
-            
-        aid = str(al.get("Associate ID", "")).strip()
-        start_str = al.get("Start Date", "").strip()
-        end_str = al.get("End Date", "").strip()
-        if not start_str or not end_str:
-            continue
-            
-        d1 = parse_date_from_sheet(start_str)
-        d2 = parse_date_from_sheet(end_str)
-        if not d1 or not d2:
-            continue
-            
-        alloc_start = datetime.strptime(d1, "%Y-%m-%d")
-        alloc_end = datetime.strptime(d2, "%Y-%m-%d")
-        if alloc_end < alloc_start:
-            continue
-            
-        alloc_pct = safe_float(str(al.get("Allocation %", "")).replace("%", ""), 100) / 100
-        current_date = alloc_start
-        
-        while current_date <= alloc_end:
-            year_str = str(current_date.year)
-            month_str_short = current_date.strftime("%b")
-            month_str_long = current_date.strftime("%B")
-            
-            monthly_salary = payroll_map.get((aid, year_str, month_str_long)) or \
-                             payroll_map.get((aid, year_str, month_str_short))
-                             
-            ym_str = current_date.strftime("%Y-%m")
-            is_future = ym_str > ym_today
-            
-            if monthly_salary is None:
-                # If we are projecting future salaries where payroll isn't available yet, use their latest known boundary
-                if is_future:
-                    monthly_salary = latest_salaries.get(aid, 0.0)
-                else:
-                    monthly_salary = 0.0
-            
-            if current_date.month == 12:
-                next_month = datetime(current_date.year + 1, 1, 1)
-            else:
-                next_month = datetime(current_date.year, current_date.month + 1, 1)
-                
-            month_end = next_month - timedelta(days=1)
-            overlap_end = min(alloc_end, month_end)
-            overlap_start = max(alloc_start, datetime(current_date.year, current_date.month, 1))
-            
-            overlap_days = (overlap_end - overlap_start).days + 1
-            days_in_month = (month_end - datetime(current_date.year, current_date.month, 1)).days + 1
-            
-            cost_for_month = (monthly_salary / days_in_month) * overlap_days * alloc_pct
-            converted_cost = convert_currency(cost_for_month, "INR", currency, current_date.strftime("%Y-%m-%d"))
-            
-            init_month(ym_str)
-            if is_future:
-                monthly_data[ym_str]["projected_out"] += converted_cost
-            else:
-                monthly_data[ym_str]["actual_out"] += converted_cost
-                
-            current_date = next_month
-
-    # 5. Format and sort by month
-    sorted_months = sorted(monthly_data.keys())
-    result = []
-    
-    cumulative_cash = 0.0
-    for ym in sorted_months:
-        entry = monthly_data[ym]
-        net_actual = entry["actual_in"] - entry["actual_out"]
-        net_proj = entry["projected_in"] - entry["projected_out"]
-        
-        # If the month is fully historical, only add actuals to cumulative cash. 
-        # If it's future, only add projections.
-        if ym < ym_today:
-            cumulative_cash += net_actual
-        elif ym == ym_today:
-            # Current month is a mix of both actual happened so far + projected remaining
-            cumulative_cash += (net_actual + net_proj)
-        else:
-            cumulative_cash += net_proj
-            
-        entry["cumulative_cash"] = cumulative_cash
-        result.append(entry)
-        
-    return {"cashflow": result}
+    if granularity not in ("month", "quarter"):
+        raise HTTPException(status_code=400, detail="granularity must be 'month' or 'quarter'")
+    start = _parse_month(from_month, "from")
+    end = _parse_month(to_month, "to")
+    
+    # 1. Fetch necessary data (one batchGet per spreadsheet, run concurrently)
+    crms_data, hrms_data = await asyncio.gather(
+        async_sheets.get_crms_many_records([settings.CRMS_DEALS_SHEET, CRMS_INVOICES_SHEET]),
+        async_sheets.get_many_records([
+            settings.CURRENCY_SHEET, settings.EXPENSES_SHEET, settings.ALLOCATIONS_SHEET, settings.PAYROLL_SHEET
+        ])
+    )
+    currency_records = hrms_data[settings.CURRENCY_SHEET]
+    rates = currency_service.table_for(currency_records)
+    
+    # 2. Apply only the rows that changed since the last request, then read the cached series
+    await async_sheets.run(cashflow_engine.refresh, {
+        "deals": crms_data[settings.CRMS_DEALS_SHEET],
+        "invoices": crms_data[CRMS_INVOICES_SHEET],
+        "expenses": hrms_data[settings.EXPENSES_SHEET],
+        "allocations": hrms_data[settings.ALLOCATIONS_SHEET],
+        "payroll": hrms_data[settings.PAYROLL_SHEET],
+    }, rates, currency_records)
+    
+    return {"cashflow": cashflow_engine.query(currency, start, end, granularity)}
@@ -4,18 +4,17 @@ from datetime import datetime
 import logging
 import traceback
 import uuid
-import threading
 import re
 
 from models.crms.invoice_template import InvoiceTemplateModel, InvoiceTemplateCreate, InvoiceTemplateUpdate
 from services.google_sheets import sheets_service
 from services.google_drive import drive_service
+from services.sequence_allocator import max_suffix, seed_records, sequence_allocator
 from middleware.auth_middleware import get_current_user, TokenData
 from config import settings
 
 logger = logging.getLogger(__name__)
 
-_id_lock = threading.Lock()
 DRIVE_ID_PATTERN = re.compile(r'^[a-zA-Z0-9_-]{25,50}$')
 
 router = APIRouter(prefix="/crms/invoice-templates", tags=["CRMS - Invoice Templates"])
@@ -30,28 +29,16 @@ def get_actual_id_column(record: dict) -> str:
     return "Template Id"
 
 def generate_template_id():
-    """Generate a unique template ID in format GTTPLXXXXXX. Thread-safe."""
-    with _id_lock:
-      try:
-        records = sheets_service.get_crms_all_records(SHEET_NAME)
-        max_id = 0
-        id_col = "Template Id"
-        if records:
-            id_col = get_actual_id_column(records[0])
-            
-        for record in records:
-            tpl_id = str(record.get(id_col, ""))
-            if tpl_id.startswith("GTTPL"):
-                try:
-                    num_part = int(tpl_id[5:])
-                    if num_part > max_id:
-                        max_id = num_part
-                except ValueError:
-                    continue
+    """Generate a unique template ID in format GTTPLXXXXXX. Safe across threads and workers."""
+    try:
+        def highest():
+            records = seed_records(sheets_service.get_crms_all_values(SHEET_NAME))
+            id_col = get_actual_id_column(records[0]) if records else "Template Id"
+            return max_suffix((r.get(id_col, "") for r in records), "GTTPL")
         
-        next_id = max_id + 1
+        next_id = sequence_allocator.allocate("GTTPL", highest)
         return f"GTTPL{next_id:06d}"
-      except Exception as e:
+    except Exception as e:
         logger.error(f"Error generating template ID: {e}")
         return f"GTTPL{uuid.uuid4().hex[:6].upper()}"
 
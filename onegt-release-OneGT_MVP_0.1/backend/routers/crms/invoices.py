@@ -9,6 +9,7 @@ import json
 from models.crms.invoice import Invoice, InvoiceCreate, InvoiceUpdate, InvoiceItem
 from pydantic import BaseModel
 from services.google_sheets import sheets_service
+from services.sequence_allocator import max_suffix, seed_records, sequence_allocator
 from config import settings
 from utils.logging_utils import trace_exceptions_async
 
@@ -23,53 +24,50 @@ router = APIRouter(prefix="/crms/invoices", tags=["CRMS - Invoices"])
 
 SHEET_NAME = settings.INVOICES_SHEET if hasattr(settings, 'INVOICES_SHEET') else "Invoices" 
 # Fallback if setting not yet added, but ideally should be added. 
-# Plan: I will use a new sheet name "Invoices" to avoid conflict with legacy "Invoices"
-CRMS_INVOICES_SHEET = "Invoices"
+# CRMS invoices live in their own "Invoices" sheet (CRMS_INVOICES_SHEET), apart from the legacy HRMS one;
+# the profitability cube reads the same setting
+CRMS_INVOICES_SHEET = settings.CRMS_INVOICES_SHEET
 ID_COLUMN = "Invoice Id"
 
 def generate_invoice_id():
     """Generate a unique invoice ID in format GTINVXXXXXX."""
     try:
-        records = sheets_service.get_crms_all_records(CRMS_INVOICES_SHEET)
-        max_id = 0
-        for record in records:
-            inv_id = str(record.get("Invoice Id", ""))
-            if inv_id.startswith("GTINV"):
-                try:
-                    num_part = int(inv_id[5:])
-                    if num_part > max_id:
-                        max_id = num_part
-                except ValueError:
-                    continue
+        def highest():
+            records = seed_records(sheets_service.get_crms_all_values(CRMS_INVOICES_SHEET))
+            return max_suffix((r.get("Invoice Id", "") for r in records), "GTINV")
         
-        next_id = max_id + 1
+        next_id = sequence_allocator.allocate("GTINV", highest)
         return f"GTINV{next_id:06d}"
     except Exception as e:
         logger.error(f"Error generating invoice ID: {e}")
         return f"GTINV{uuid.uuid4().hex[:6].upper()}"
 
+def invoice_number_prefix() -> str:
+    """Prefix of this month's invoice numbers (e.g., IN2026Q102)."""
+    now = datetime.now()
+    year = now.strftime("%Y")
+    month = now.strftime("%m")
+    quarter = f"Q{(now.month - 1) // 3 + 1}"
+    return f"IN{year}{quarter}{month}"
+
+def observe_invoice_number(invoice_number: str):
+    """Keep the invoice number sequence ahead of a number entered on an invoice."""
+    prefix = invoice_number_prefix()
+    num = max_suffix([invoice_number or ""], prefix)
+    if num:
+        sequence_allocator.observe(prefix, num)
+
 def generate_next_invoice_number():
     """Predict the next sequential invoice number (e.g., IN2026Q1020001)."""
     try:
-        now = datetime.now()
-        year = now.strftime("%Y")
-        month = now.strftime("%m")
-        quarter = f"Q{(now.month - 1) // 3 + 1}"
-        prefix = f"IN{year}{quarter}{month}"
+        prefix = invoice_number_prefix()
 
-        records = sheets_service.get_crms_all_records(CRMS_INVOICES_SHEET)
-        max_num = 0
-        for record in records:
-            inv_num = str(record.get("Invoice Number", ""))
-            if inv_num.startswith(prefix):
-                try:
-                    num_part = int(inv_num[len(prefix):])
-                    if num_part > max_num:
-                        max_num = num_part
-                except ValueError:
-                    continue
+        def highest():
+            records = seed_records(sheets_service.get_crms_all_values(CRMS_INVOICES_SHEET))
+            return max_suffix((r.get("Invoice Number", "") for r in records), prefix)
         
-        next_num = max_num + 1
+        # Only a suggestion: the number is reserved once an invoice is created with it
+        next_num = sequence_allocator.peek(prefix, highest)
         return f"{prefix}{next_num:04d}"
     except Exception as e:
         logger.error(f"Error generating next invoice number: {e}")
@@ -234,6 +232,7 @@ async def create_invoice(invoice: InvoiceCreate):
             pass
 
         sheets_service.crms_append_row(CRMS_INVOICES_SHEET, values)
+        observe_invoice_number(invoice.invoice_number)
         
         new_invoice = Invoice(
             id=invoice_id,
@@ -7,6 +7,8 @@ import traceback
 
 from models.crms.lead import Lead, LeadCreate, LeadUpdate
 from services.google_sheets import sheets_service
+from services.async_sheets import async_sheets
+from services.sequence_allocator import max_suffix, seed_records, sequence_allocator
 from config import settings
 
 logger = logging.getLogger(__name__)
@@ -20,20 +22,11 @@ ID_COLUMN = "Lead ID"
 def generate_lead_id():
     """Generate a unique lead ID in format GTLDXXXXX."""
     try:
-        records = sheets_service.get_crms_all_records(SHEET_NAME)
-        max_id = 0
-        for record in records:
-            lead_id = str(record.get("Lead ID", ""))
-            if lead_id.startswith("GTLD"):
-                try:
-                    # Extract numeric part (e.g., GTLD00001 -> 1)
-                    num_part = int(lead_id[4:])
-                    if num_part > max_id:
-                        max_id = num_part
-                except ValueError:
-                    continue
+        def highest():
+            records = seed_records(sheets_service.get_crms_all_values(SHEET_NAME))
+            return max_suffix((r.get("Lead ID", "") for r in records), "GTLD")
         
-        next_id = max_id + 1
+        next_id = sequence_allocator.allocate("GTLD", highest)
         return f"GTLD{next_id:05d}"
     except Exception as e:
         logger.error(f"Error generating lead ID: {e}")
@@ -49,7 +42,7 @@ async def get_leads(
 ):
     """Get all leads with optional filters."""
     try:
-        records = sheets_service.get_crms_all_records(SHEET_NAME)
+        records = await async_sheets.get_crms_all_records(SHEET_NAME)
         leads = []
         
         for record in records:
@@ -86,7 +79,7 @@ async def get_leads(
 async def get_lead(lead_id: str):
     """Get a single lead by ID."""
     try:
-        record = sheets_service.crms_get_row_by_id(SHEET_NAME, ID_COLUMN, lead_id)
+        record = await async_sheets.crms_get_row_by_id(SHEET_NAME, ID_COLUMN, lead_id)
         if not record:
             raise HTTPException(status_code=404, detail="Lead not found")
         
@@ -115,7 +108,7 @@ async def get_lead(lead_id: str):
 async def create_lead(lead: LeadCreate):
     """Create a new lead."""
     try:
-        lead_id = generate_lead_id()
+        lead_id = await async_sheets.run(generate_lead_id)
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         # Headers: Lead ID, Lead Name, Email, Phone Number, Company, Source, Lead Type, Assigned To, Created On, Status, Notes, Updated At
@@ -145,7 +138,7 @@ async def create_lead(lead: LeadCreate):
         # Ideally, we should use dictionary-based append if supported, but usually sheets api is list.
         # I'll stick to this order which matches user request + necessary fields.
         
-        sheets_service.crms_append_row(SHEET_NAME, values)
+        await async_sheets.crms_append_row(SHEET_NAME, values)
         
         return Lead(
             id=lead_id,
@@ -170,11 +163,11 @@ async def create_lead(lead: LeadCreate):
 async def update_lead(lead_id: str, lead_update: LeadUpdate):
     """Update an existing lead."""
     try:
-        row_index = sheets_service.crms_find_row_index(SHEET_NAME, ID_COLUMN, lead_id)
+        row_index = await async_sheets.crms_find_row_index(SHEET_NAME, ID_COLUMN, lead_id)
         if not row_index:
             raise HTTPException(status_code=404, detail="Lead not found")
         
-        existing = sheets_service.crms_get_row_by_id(SHEET_NAME, ID_COLUMN, lead_id)
+        existing = await async_sheets.crms_get_row_by_id(SHEET_NAME, ID_COLUMN, lead_id)
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         # Reconstruct values based on assumed column order:
@@ -199,7 +192,7 @@ async def update_lead(lead_id: str, lead_update: LeadUpdate):
             now
         ]
         
-        sheets_service.crms_update_row(SHEET_NAME, row_index, values)
+        await async_sheets.crms_update_row(SHEET_NAME, row_index, values)
         
         return Lead(
             id=lead_id,
@@ -226,11 +219,11 @@ async def update_lead(lead_id: str, lead_update: LeadUpdate):
 async def delete_lead(lead_id: str):
     """Delete a lead."""
     try:
-        row_index = sheets_service.crms_find_row_index(SHEET_NAME, ID_COLUMN, lead_id)
+        row_index = await async_sheets.crms_find_row_index(SHEET_NAME, ID_COLUMN, lead_id)
         if not row_index:
             raise HTTPException(status_code=404, detail="Lead not found")
         
-        sheets_service.crms_delete_row(SHEET_NAME, row_index)
+        await async_sheets.crms_delete_row(SHEET_NAME, row_index)
         return {"success": True, "message": "Lead deleted successfully"}
     except HTTPException:
         raise
@@ -243,7 +236,7 @@ async def delete_lead(lead_id: str):
 async def get_lead_stats():
     """Get lead statistics."""
     try:
-        records = sheets_service.get_crms_all_records(SHEET_NAME)
+        records = await async_sheets.get_crms_all_records(SHEET_NAME)
         
         status_counts = {}
         source_counts = {}
@@ -3,6 +3,7 @@ import traceback
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
 from typing import List
 from services.google_sheets import sheets_service
+from services.sequence_allocator import max_suffix, seed_records, sequence_allocator
 from utils.logging_utils import trace_exceptions_async
 from services.google_drive import drive_service
 from models.hrms.associate import (
@@ -27,24 +28,23 @@ DRIVE_SUBFOLDERS = [
 router = APIRouter()
 
 
-def generate_associate_id():
-    """Generate next sequential associate ID in format 100001, 100002, etc."""
+ASSOCIATE_ID_SEQUENCE = "associate"
+FIRST_ASSOCIATE_ID = 100001
+
+def _highest_associate_id() -> int:
+    records = seed_records(sheets_service.get_all_values(settings.ASSOCIATES_SHEET))
+    highest = max_suffix((str(r.get("Associate ID", "")).strip() for r in records), "")
+    return max(highest, FIRST_ASSOCIATE_ID - 1)
+
+def generate_associate_id(reserve: bool = True):
+    """Generate next sequential associate ID in format 100001, 100002, etc.
+
+    With ``reserve=False`` the next ID is only previewed, not taken.
+    """
     try:
-        records = sheets_service.get_all_records(settings.ASSOCIATES_SHEET)
-        if not records:
-            return "100001"
-        
-        max_seq = 100000
-        for record in records:
-            aid = str(record.get("Associate ID", "")).strip()
-            try:
-                seq = int(aid)
-                if seq >= 100001:
-                    max_seq = max(max_seq, seq)
-            except ValueError:
-                continue
-        
-        return str(max_seq + 1)
+        if reserve:
+            return str(sequence_allocator.allocate(ASSOCIATE_ID_SEQUENCE, _highest_associate_id))
+        return str(sequence_allocator.peek(ASSOCIATE_ID_SEQUENCE, _highest_associate_id))
     except Exception as e:
         logger.error(f"Error generating associate ID: {e}")
         return "100001"
@@ -117,7 +117,7 @@ async def get_associates(
 async def get_next_id():
     """Get the next available associate ID."""
     try:
-        next_id = generate_associate_id()
+        next_id = generate_associate_id(reserve=False)
         return {"next_id": next_id}
     except Exception as e:
         logger.error(f"Error getting next ID: {e}")
@@ -148,6 +148,9 @@ async def create_associate(associate: AssociateCreate):
         # Auto-generate ID if not provided
         if not associate.associate_id:
             associate.associate_id = generate_associate_id()
+        elif str(associate.associate_id).strip().isdigit():
+            # Keep the sequence ahead of IDs entered by hand (or taken from /next-id)
+            sequence_allocator.observe(ASSOCIATE_ID_SEQUENCE, int(str(associate.associate_id).strip()))
         
         # Check if ID already exists
         existing = sheets_service.get_row_by_id(
@@ -1,13 +1,18 @@
+import asyncio
 import logging
 import traceback
 from datetime import datetime
 from collections import defaultdict
+import numpy as np
 from fastapi import APIRouter, HTTPException, Query
 from typing import Optional, Any
-from services.google_sheets import sheets_service
-from models.common.currency import row_to_currency_rate, get_month_name
+from services.async_sheets import async_sheets
+from services.allocation_cost import AllocationMonths, group_totals
+from services.allocation_index import allocation_index
+from services.currency_service import currency_service
 from config import settings
 from utils.logging_utils import trace_exceptions_async
+from utils.date_utils import parse_sheet_datetime
 
 logger = logging.getLogger("chrms.dashboard")
 
@@ -15,22 +20,7 @@ router = APIRouter()
 
 def safe_parse_date(date_str: Optional[str]) -> Optional[datetime]:
     """Helper to safely parse dates from sheets in various formats."""
-    if not date_str or not str(date_str).strip():
-        return None
-    
-    date_str = str(date_str).strip()
-    # Common formats in Google Sheets
-    formats = [
-        "%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y", 
-        "%Y/%m/%d", "%d-%b-%Y", "%b %y", "%d %b %Y"
-    ]
-    
-    for fmt in formats:
-        try:
-            return datetime.strptime(date_str, fmt)
-        except ValueError:
-            continue
-    return None
+    return parse_sheet_datetime(date_str)
 
 def safe_float(value: Any) -> float:
     """Safely convert value to float, handling commas and currency symbols."""
@@ -56,10 +46,11 @@ def safe_float(value: Any) -> float:
 async def get_pending_approvals(manager_id: Optional[str] = None):
     # Trigger reload
     """Get count of pending timesheets and expense reports for a manager."""
-    # Get all required data
-    projects = sheets_service.get_all_records(settings.PROJECTS_SHEET)
-    timesheets = sheets_service.get_all_records(settings.TIMESHEETS_SHEET)
-    expenses = sheets_service.get_all_records(settings.EXPENSES_SHEET)
+    # Get all required data (one batched fetch)
+    data = await async_sheets.get_many_records([settings.PROJECTS_SHEET, settings.TIMESHEETS_SHEET, settings.EXPENSES_SHEET])
+    projects = data[settings.PROJECTS_SHEET]
+    timesheets = data[settings.TIMESHEETS_SHEET]
+    expenses = data[settings.EXPENSES_SHEET]
 
     # 1. Identify Managed Projects
     managed_project_ids = set()
@@ -114,10 +105,11 @@ async def get_pending_approvals(manager_id: Optional[str] = None):
 async def get_dashboard_overview(manager_id: Optional[str] = None):
     """Get high-level dashboard metrics."""
     try:
-        # Get counts
-        associates = sheets_service.get_all_records(settings.ASSOCIATES_SHEET)
-        projects = sheets_service.get_all_records(settings.PROJECTS_SHEET)
-        allocations = sheets_service.get_all_records(settings.ALLOCATIONS_SHEET)
+        # Get counts (one batched fetch)
+        data = await async_sheets.get_many_records([settings.ASSOCIATES_SHEET, settings.PROJECTS_SHEET, settings.ALLOCATIONS_SHEET])
+        associates = data[settings.ASSOCIATES_SHEET]
+        projects = data[settings.PROJECTS_SHEET]
+        allocations = data[settings.ALLOCATIONS_SHEET]
         
         # Filter strictly for ACTIVE associates
         active_associates_list = []
@@ -282,9 +274,10 @@ async def get_allocation_by_month(
 ):
     """Get associate-wise allocation for a specific month."""
     try:
-        allocations = sheets_service.get_all_records(settings.ALLOCATIONS_SHEET)
-        associates = sheets_service.get_all_records(settings.ASSOCIATES_SHEET)
-        projects = sheets_service.get_all_records(settings.PROJECTS_SHEET)
+        data = await async_sheets.get_many_records([settings.ALLOCATIONS_SHEET, settings.ASSOCIATES_SHEET, settings.PROJECTS_SHEET])
+        allocations = data[settings.ALLOCATIONS_SHEET]
+        associates = data[settings.ASSOCIATES_SHEET]
+        projects = data[settings.PROJECTS_SHEET]
         
         # Build associate lookup
         associate_lookup = {
@@ -298,13 +291,6 @@ async def get_allocation_by_month(
             for p in projects if p.get("Project ID")
         }
         
-        # Calculate target month range
-        target_start = datetime(year, month, 1)
-        if month == 12:
-            target_end = datetime(year + 1, 1, 1)
-        else:
-            target_end = datetime(year, month + 1, 1)
-        
         allocation_data = defaultdict(lambda: {
             "associate_name": "",
             "allocations": [],
@@ -313,47 +299,31 @@ async def get_allocation_by_month(
             "non_billable_allocation": 0
         })
         
-        for r in allocations:
-            associate_id = str(r.get("Associate ID", "")).strip()
-            if not associate_id:
-                continue
-            
-            product_id = str(r.get("Project ID", "")).strip()
-            
-            start_str = r.get("Start Date", "")
-            end_str = r.get("End Date", "")
-            
-            alloc_start = safe_parse_date(start_str)
-            alloc_end = safe_parse_date(end_str)
-            
-            if not alloc_end:
-                alloc_end = datetime(2099, 12, 31)
-            
-            if not alloc_start:
+        # Allocations overlapping the target month
+        for interval in allocation_index(allocations).in_month(year, month):
+            r = interval.record
+            associate_id = interval.associate_id
+            product_id = interval.project_id
+            try:
+                alloc_pct = safe_float(r.get("Allocation %", 100))
+                alloc_type = str(r.get("Allocation Type", "")).lower()
+                
+                allocation_data[associate_id]["associate_name"] = associate_lookup.get(associate_id, f"Unknown ({associate_id})")
+                allocation_data[associate_id]["allocations"].append({
+                    "project_id": product_id,
+                    "project_name": project_lookup.get(product_id, f"Unknown ({product_id})"),
+                    "allocation_type": r.get("Allocation Type"),
+                    "allocation_percentage": alloc_pct
+                })
+                allocation_data[associate_id]["total_allocation"] += alloc_pct
+                
+                if alloc_type == "billable":
+                    allocation_data[associate_id]["billable_allocation"] += alloc_pct
+                else:
+                    allocation_data[associate_id]["non_billable_allocation"] += alloc_pct
+            except Exception as row_err:
+                logger.warning(f"Error processing allocation row for {associate_id}: {row_err}")
                 continue
-            
-            # Check if allocation overlaps with target month
-            if alloc_start < target_end and alloc_end >= target_start:
-                try:
-                    alloc_pct = safe_float(r.get("Allocation %", 100))
-                    alloc_type = str(r.get("Allocation Type", "")).lower()
-                    
-                    allocation_data[associate_id]["associate_name"] = associate_lookup.get(associate_id, f"Unknown ({associate_id})")
-                    allocation_data[associate_id]["allocations"].append({
-                        "project_id": product_id,
-                        "project_name": project_lookup.get(product_id, f"Unknown ({product_id})"),
-                        "allocation_type": r.get("Allocation Type"),
-                        "allocation_percentage": alloc_pct
-                    })
-                    allocation_data[associate_id]["total_allocation"] += alloc_pct
-                    
-                    if alloc_type == "billable":
-                        allocation_data[associate_id]["billable_allocation"] += alloc_pct
-                    else:
-                        allocation_data[associate_id]["non_billable_allocation"] += alloc_pct
-                except Exception as row_err:
-                    logger.warning(f"Error processing allocation row for {associate_id}: {row_err}")
-                    continue
         
         result = []
         for associate_id, data in allocation_data.items():
@@ -398,22 +368,28 @@ async def get_project_profitability(
     Profit % = (Profit / Revenue) * 100
     """
     try:
-        projects = sheets_service.get_all_records(settings.PROJECTS_SHEET)
-        try:
-            invoices = sheets_service.get_all_records(settings.INVOICES_SHEET)
-        except Exception:
+        # Invoices and currency rates are optional sheets, so they are read
+        # separately (concurrently) and tolerated if missing
+        data, invoices, currency_rates = await asyncio.gather(
+            async_sheets.get_many_records([
+                settings.PROJECTS_SHEET, settings.ALLOCATIONS_SHEET, settings.ASSOCIATES_SHEET, settings.EXPENSES_SHEET
+            ]),
+            async_sheets.get_all_records(settings.INVOICES_SHEET),
+            async_sheets.get_all_records(settings.CURRENCY_SHEET),
+            return_exceptions=True
+        )
+        if isinstance(data, BaseException):
+            raise data
+        if isinstance(invoices, BaseException):
             invoices = []
-            
-        allocations = sheets_service.get_all_records(settings.ALLOCATIONS_SHEET)
-        associates = sheets_service.get_all_records(settings.ASSOCIATES_SHEET)
-        expenses = sheets_service.get_all_records(settings.EXPENSES_SHEET)
-        
-        # Try to get currency rates
-        try:
-            currency_rates = sheets_service.get_all_records(settings.CURRENCY_SHEET)
-        except:
+        if isinstance(currency_rates, BaseException):
             currency_rates = []
         
+        projects = data[settings.PROJECTS_SHEET]
+        allocations = data[settings.ALLOCATIONS_SHEET]
+        associates = data[settings.ASSOCIATES_SHEET]
+        expenses = data[settings.EXPENSES_SHEET]
+        
         # Build associate salary lookup (monthly salary = annual CTC / 12)
         associate_salaries = {}
         for a in associates:
@@ -422,30 +398,8 @@ async def get_project_profitability(
                 annual_ctc = safe_float(a.get("Fixed CTC", 0))
                 associate_salaries[aid] = annual_ctc / 12
         
-        # Build currency rate lookup by year-month key
-        # New format has Year and Month columns, rates are in a rates dict
-        currency_lookup = {}
-        currencies_available = []
-        for cr in currency_rates:
-            year_val = cr.get("Year")
-            month_val = cr.get("Month")
-            if year_val and month_val:
-                # Determine available currencies from the record keys
-                if not currencies_available:
-                    currencies_available = [k for k in cr.keys() if k not in ["Year", "Month"]]
-                # Store the rates dict keyed by "Year-Month" 
-                key = f"{year_val}-{month_val}"
-                currency_lookup[key] = cr
-        
-        # Helper function to convert amount to USD
-        def convert_to_usd_helper(amount, currency, rate_record):
-            currency = currency.upper()
-            if currency == "USD":
-                return amount
-            rate = safe_float(rate_record.get(currency, 0))
-            if rate == 0:
-                return amount  # No conversion possible
-            return amount / rate
+        # Currency rates by (year, month), shared with the CRMS finance views
+        rates = currency_service.table_for(currency_rates)
         
         # Parse date filters
         filter_start = None
@@ -486,7 +440,8 @@ async def get_project_profitability(
                 "invoice_count": 0
             }
         
-        # Calculate revenue from invoices
+        # Calculate revenue from invoices (converted to USD in one batch)
+        revenue_rows = []  # (project_id, amount, currency, invoice date)
         for inv in invoices:
             pid = inv.get("Project ID")
             if not pid or pid not in project_metrics:
@@ -505,22 +460,17 @@ async def get_project_profitability(
                     continue
             
             amount = safe_float(inv.get("InvoiceTotal", 0))
-            currency = inv.get("Currency", "USD")
-            
-            # Convert to USD if needed
-            if currency != "USD" and currency_lookup:
-                # Try to get rate for invoice month
-                inv_date = safe_parse_date(inv_date_str)
-                if inv_date:
-                    # Create key in "Year-Month" format (e.g., "2026-January")
-                    month_key = f"{inv_date.year}-{get_month_name(inv_date.month)}"
-                    if month_key in currency_lookup:
-                        amount = convert_to_usd_helper(amount, currency, currency_lookup[month_key])
-            
+            revenue_rows.append((pid, amount, inv.get("Currency", "USD"), safe_parse_date(inv_date_str)))
+        
+        revenue_usd = rates.convert_many(
+            [r[1] for r in revenue_rows], [r[2] for r in revenue_rows], [r[3] for r in revenue_rows], "USD"
+        )
+        for (pid, _, _, _), amount in zip(revenue_rows, revenue_usd.tolist()):
             project_metrics[pid]["revenue"] += amount
             project_metrics[pid]["invoice_count"] += 1
         
-        # Calculate salary cost from allocations
+        # Calculate salary cost from allocations (months counted and costs summed in one batch)
+        salary_rows = []  # (project_id, monthly salary, allocation fraction, effective start, effective end)
         for alloc in allocations:
             pid = alloc.get("Project ID")
             aid = alloc.get("Associate ID")
@@ -553,11 +503,13 @@ async def get_project_profitability(
             effective_start = max(alloc_start, filter_start) if filter_start else alloc_start
             effective_end = min(alloc_end, filter_end) if filter_end else alloc_end
             
-            # Calculate months
-            months = (effective_end.year - effective_start.year) * 12 + (effective_end.month - effective_start.month) + 1
-            months = max(1, months)
-            
-            salary_cost = monthly_salary * alloc_pct * months
+            salary_rows.append((pid, monthly_salary, alloc_pct, effective_start, effective_end))
+        
+        spans = AllocationMonths([r[3] for r in salary_rows], [r[4] for r in salary_rows])
+        months = np.maximum(spans.months_per_allocation, 1)
+        salary_costs = (np.array([r[1] for r in salary_rows], dtype=float)
+                        * np.array([r[2] for r in salary_rows], dtype=float) * months)
+        for pid, salary_cost in group_totals([r[0] for r in salary_rows], salary_costs).items():
             project_metrics[pid]["salary_cost"] += salary_cost
         
         # Calculate expense cost
@@ -635,7 +587,7 @@ async def get_revenue_trend(
     """Get monthly revenue trend for a year."""
     try:
         try:
-            invoices = sheets_service.get_all_records(settings.INVOICES_SHEET)
+            invoices = await async_sheets.get_all_records(settings.INVOICES_SHEET)
         except Exception:
             # If Invoice sheet is not found, return empty trend
             return {
@@ -648,7 +600,7 @@ async def get_revenue_trend(
         # Filter projects by manager if provided to get project list
         filter_project_ids = None
         if manager_id and not project_id:
-            projects = sheets_service.get_all_records(settings.PROJECTS_SHEET)
+            projects = await async_sheets.get_all_records(settings.PROJECTS_SHEET)
             filter_project_ids = {
                 p.get("Project ID") 
                 for p in projects 
@@ -705,7 +657,7 @@ async def get_revenue_trend(
 async def get_department_summary():
     """Get summary of associates by department."""
     try:
-        associates = sheets_service.get_all_records(settings.ASSOCIATES_SHEET)
+        associates = await async_sheets.get_all_records(settings.ASSOCIATES_SHEET)
         
         dept_data = defaultdict(lambda: {
             "count": 0,
@@ -754,13 +706,17 @@ async def get_utilization_report(
 ):
     """Get resource utilization report for a month."""
     try:
-        associates = sheets_service.get_all_records(settings.ASSOCIATES_SHEET)
-        allocations = sheets_service.get_all_records(settings.ALLOCATIONS_SHEET)
+        sheet_names = [settings.ASSOCIATES_SHEET, settings.ALLOCATIONS_SHEET]
+        if manager_id:
+            sheet_names.append(settings.PROJECTS_SHEET)
+        data = await async_sheets.get_many_records(sheet_names)
+        associates = data[settings.ASSOCIATES_SHEET]
+        allocations = data[settings.ALLOCATIONS_SHEET]
         
         # Filter projects by manager to get associate subset if manager_id provided
         managed_associate_ids = None
         if manager_id:
-            projects = sheets_service.get_all_records(settings.PROJECTS_SHEET)
+            projects = data[settings.PROJECTS_SHEET]
             managed_project_ids = {
                 p.get("Project ID") 
                 for p in projects 
@@ -772,13 +728,6 @@ async def get_utilization_report(
                 if a.get("Project ID") in managed_project_ids and a.get("Associate ID")
             }
         
-        # Calculate target month range
-        target_start = datetime(year, month, 1)
-        if month == 12:
-            target_end = datetime(year + 1, 1, 1)
-        else:
-            target_end = datetime(year, month + 1, 1)
-        
         # Build associate list
         associate_util = {
             a.get("Associate ID"): {
@@ -794,37 +743,24 @@ async def get_utilization_report(
         }
         
         # Calculate allocations
-        for alloc in allocations:
-            aid = str(alloc.get("Associate ID", "")).strip()
-            if not aid or aid not in associate_util:
+        for interval in allocation_index(allocations).in_month(year, month):
+            aid = interval.associate_id
+            if aid not in associate_util:
                 continue
             
-            start_str = alloc.get("Start Date", "")
-            end_str = alloc.get("End Date", "")
-            
-            alloc_start = safe_parse_date(start_str)
-            alloc_end = safe_parse_date(end_str)
-            
-            if not alloc_end:
-                alloc_end = datetime(2099, 12, 31)
-            
-            if not alloc_start:
+            alloc = interval.record
+            try:
+                alloc_pct = safe_float(alloc.get("Allocation %", 100))
+                alloc_type = str(alloc.get("Allocation Type", "")).lower()
+                
+                associate_util[aid]["total_allocation"] += alloc_pct
+                if alloc_type == "billable":
+                    associate_util[aid]["billable_allocation"] += alloc_pct
+                else:
+                    associate_util[aid]["non_billable_allocation"] += alloc_pct
+            except Exception as row_err:
+                logger.warning(f"Error processing utilization for associate {aid}: {row_err}")
                 continue
-            
-            # Check overlap
-            if alloc_start < target_end and alloc_end >= target_start:
-                try:
-                    alloc_pct = safe_float(alloc.get("Allocation %", 100))
-                    alloc_type = str(alloc.get("Allocation Type", "")).lower()
-                    
-                    associate_util[aid]["total_allocation"] += alloc_pct
-                    if alloc_type == "billable":
-                        associate_util[aid]["billable_allocation"] += alloc_pct
-                    else:
-                        associate_util[aid]["non_billable_allocation"] += alloc_pct
-                except Exception as row_err:
-                    logger.warning(f"Error processing utilization for associate {aid}: {row_err}")
-                    continue
         
         result = list(associate_util.values())
         
@@ -856,25 +792,23 @@ async def get_utilization_report(
     except Exception as e:
         logger.error(f"Error in dashboard/utilization: {e}")
         logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
 @router.get("/associate-overview")
 async def get_associate_overview(associate_id: str):
     """Get personal dashboard metrics for an associate."""
     try:
-        # Fetch data in parallel
-        allocations = sheets_service.get_all_records(settings.ALLOCATIONS_SHEET)
-        timesheets = sheets_service.get_all_records(settings.TIMESHEETS_SHEET)
-        projects = sheets_service.get_all_records(settings.PROJECTS_SHEET)
+        # Fetch data in one batched call
+        data = await async_sheets.get_many_records([settings.ALLOCATIONS_SHEET, settings.TIMESHEETS_SHEET, settings.PROJECTS_SHEET])
+        allocations = data[settings.ALLOCATIONS_SHEET]
+        timesheets = data[settings.TIMESHEETS_SHEET]
+        projects = data[settings.PROJECTS_SHEET]
         
         # Current date for month calculations
         now = datetime.now()
         target_year = now.year
         target_month = now.month
         
-        target_start = datetime(target_year, target_month, 1)
-        if target_month == 12:
-            target_end = datetime(target_year + 1, 1, 1)
-        else:
-            target_end = datetime(target_year, target_month + 1, 1)
+        index = allocation_index(allocations)
             
         # Metrics to calculate
         metrics = {
@@ -888,30 +822,21 @@ async def get_associate_overview(associate_id: str):
         
         # 1. Allocation & Active Projects
         assigned_project_ids = set()
-        for r in allocations:
-            if str(r.get("Associate ID", "")).strip() == str(associate_id).strip():
-                start_str = r.get("Start Date", "")
-                end_str = r.get("End Date", "")
-                
-                alloc_start = safe_parse_date(start_str)
-                alloc_end = safe_parse_date(end_str)
-                if not alloc_end:
-                    alloc_end = datetime(2099, 12, 31)
+        for interval in index.in_month(target_year, target_month, associate_id=associate_id):
+            r = interval.record
+            try:
+                pct = safe_float(r.get("Allocation %", 0))
+                m_type = str(r.get("Allocation Type", "")).lower()
                 
-                if alloc_start and alloc_start < target_end and alloc_end >= target_start:
-                    try:
-                        pct = safe_float(r.get("Allocation %", 0))
-                        m_type = str(r.get("Allocation Type", "")).lower()
-                        
-                        metrics["total_allocation"] += pct
-                        if m_type == "billable":
-                            metrics["billable_allocation"] += pct
-                        else:
-                            metrics["non_billable_allocation"] += pct
-                            
-                        assigned_project_ids.add(str(r.get("Project ID", "")).strip())
-                    except:
-                        pass
+                metrics["total_allocation"] += pct
+                if m_type == "billable":
+                    metrics["billable_allocation"] += pct
+                else:
+                    metrics["non_billable_allocation"] += pct
+                    
+                assigned_project_ids.add(interval.project_id)
+            except:
+                pass
 
         # Verify active projects count from project master
         active_projects = 0
@@ -939,33 +864,22 @@ async def get_associate_overview(associate_id: str):
             if m <= 0:
                 m += 12
                 y -= 1
-            
-            t_start = datetime(y, m, 1)
-            if m == 12:
-                t_end = datetime(y + 1, 1, 1)
-            else:
-                t_end = datetime(y, m + 1, 1)
                 
             m_total = 0
             m_billable = 0
             m_non_billable = 0
-            for r in allocations:
-                if str(r.get("Associate ID", "")).strip() == str(associate_id).strip():
-                    a_start = safe_parse_date(r.get("Start Date", ""))
-                    a_end = safe_parse_date(r.get("End Date", ""))
-                    if not a_end: a_end = datetime(2099, 12, 31)
-                    
-                    if a_start and a_start < t_end and a_end >= t_start:
-                        try:
-                            pct = safe_float(r.get("Allocation %", 0))
-                            alloc_type = str(r.get("Allocation Type", "")).lower()
-                            m_total += pct
-                            if alloc_type == "billable":
-                                m_billable += pct
-                            else:
-                                m_non_billable += pct
-                        except:
-                            pass
+            for interval in index.in_month(y, m, associate_id=associate_id):
+                r = interval.record
+                try:
+                    pct = safe_float(r.get("Allocation %", 0))
+                    alloc_type = str(r.get("Allocation Type", "")).lower()
+                    m_total += pct
+                    if alloc_type == "billable":
+                        m_billable += pct
+                    else:
+                        m_non_billable += pct
+                except:
+                    pass
             
             months_names = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
             trend.append({
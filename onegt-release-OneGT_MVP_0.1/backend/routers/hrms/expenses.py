@@ -2,12 +2,14 @@ from fastapi import APIRouter, HTTPException, Query, Depends, UploadFile, File,
 import traceback
 from typing import List, Optional
 from services.google_sheets import sheets_service
+from services.expense_report_index import expense_report_index
+from services.sequence_allocator import max_suffix, seed_records, sequence_allocator
 from models.hrms.expense_report import (
     ExpenseReport, ExpenseReportCreate, ExpenseReportUpdate,
     ExpenseItem, ExpenseItemCreate,
     EXPENSE_COLUMNS, EXPENSE_REPORT_STATUS,
     generate_report_id, generate_expense_id,
-    expense_item_to_row, row_to_expense_item, group_rows_to_report
+    expense_item_to_row, row_to_expense_item
 )
 from models.common.notification import NotificationCreate
 from config import settings
@@ -36,29 +38,11 @@ async def get_expense_reports(
     try:
         records = sheets_service.get_all_records(settings.EXPENSES_SHEET)
         
-        # Group by Expense Report ID
-        report_ids = set()
-        for r in records:
-            report_id = r.get("Expense Report ID")
-            if report_id:
-                report_ids.add(report_id)
-        
-        reports = []
-        for report_id in report_ids:
-            report = group_rows_to_report(records, report_id)
-            if report:
-                # Apply filters
-                if associate_id and report.associate_id != associate_id:
-                    continue
-                if project_id and report.project_id != project_id:
-                    continue
-                if status and report.status != status:
-                    continue
-                reports.append(report)
-        
-        # Sort by most recent first
-        reports.sort(key=lambda x: x.expense_report_id, reverse=True)
-        return reports
+        # Reports are grouped by Expense Report ID once per snapshot; filters use its
+        # associate/project/status indexes and results come most recent first
+        return expense_report_index(records).reports(
+            associate_id=associate_id, project_id=project_id, status=status
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -67,12 +51,12 @@ async def get_expense_report(report_id: str):
     """Get a single expense report with all items."""
     try:
         records = sheets_service.get_all_records(settings.EXPENSES_SHEET)
-        report = group_rows_to_report(records, report_id)
+        entry = expense_report_index(records).get(report_id)
         
-        if not report:
+        if not entry:
             raise HTTPException(status_code=404, detail="Expense report not found")
         
-        return report
+        return entry.report()
     except HTTPException:
         raise
     except Exception as e:
@@ -82,29 +66,18 @@ async def get_expense_report(report_id: str):
 async def create_expense_report(report: ExpenseReportCreate):
     """Create a new expense report with items."""
     try:
-        records = sheets_service.get_all_records(settings.EXPENSES_SHEET)
-        
         # Calculate next report sequence
         now = datetime.now()
         quarter = (now.month - 1) // 3 + 1
         # Prefix format matching generate_report_id logic: GTEXPQ{quarter}{month:02d}
         prefix = f"GTEXPQ{quarter}{now.month:02d}"
         
-        max_seq = 0
-        for r in records:
-            rid = str(r.get("Expense Report ID", ""))
-            if rid.startswith(prefix):
-                try:
-                    # ID format: prefix + 3 digit sequence
-                    if len(rid) >= len(prefix) + 3:
-                        seq_str = rid[len(prefix):len(prefix)+3]
-                        seq = int(seq_str)
-                        if seq > max_seq:
-                            max_seq = seq
-                except ValueError:
-                    continue
+        def highest():
+            records = seed_records(sheets_service.get_all_values(settings.EXPENSES_SHEET))
+            # ID format: prefix + 3 digit sequence
+            return max_suffix((r.get("Expense Report ID", "") for r in records), prefix, digits=3)
         
-        report_id = generate_report_id(max_seq + 1)
+        report_id = generate_report_id(sequence_allocator.allocate(prefix, highest))
         rows_added = 0
         
         for idx, item in enumerate(report.items, 1):
@@ -136,17 +109,14 @@ async def update_expense_report(report_id: str, update: ExpenseReportUpdate):
         records = sheets_service.get_all_records(settings.EXPENSES_SHEET)
         
         # Find existing rows for this report
-        existing_rows = []
-        for idx, r in enumerate(records):
-            if r.get("Expense Report ID") == report_id:
-                existing_rows.append(idx + 2)  # 1-indexed, +1 for header
-        
-        if not existing_rows:
+        entry = expense_report_index(records).get(report_id)
+        if not entry:
             raise HTTPException(status_code=404, detail="Expense report not found")
+        existing_rows = entry.row_numbers
         
         # Get current status and comments to preserve history
-        current_status = records[existing_rows[0] - 2].get("Status", "DRAFT")
-        existing_comments = records[existing_rows[0] - 2].get("Comments", "")
+        current_status = entry.first.get("Status", "DRAFT")
+        existing_comments = entry.first.get("Comments", "")
         
         # Only allow updates if DRAFT or REJECTED
         if current_status not in ["DRAFT", "REJECTED"]:
@@ -158,9 +128,9 @@ async def update_expense_report(report_id: str, update: ExpenseReportUpdate):
         
         # Add new items
         items = update.items or []
-        associate_id = update.associate_id or records[existing_rows[0] - 2].get("Associate ID", "")
-        project_id = update.project_id or records[existing_rows[0] - 2].get("Project ID", "")
-        project_name = update.project_name or records[existing_rows[0] - 2].get("Project Name", "")
+        associate_id = update.associate_id or entry.first.get("Associate ID", "")
+        project_id = update.project_id or entry.first.get("Project ID", "")
+        project_name = update.project_name or entry.first.get("Project Name", "")
         
         rows_added = 0
         for idx, item in enumerate(items, 1):
@@ -195,13 +165,10 @@ async def delete_expense_report(report_id: str):
         records = sheets_service.get_all_records(settings.EXPENSES_SHEET)
         
         # Find all rows for this report
-        rows_to_delete = []
-        for idx, r in enumerate(records):
-            if r.get("Expense Report ID") == report_id:
-                rows_to_delete.append(idx + 2)
-        
-        if not rows_to_delete:
+        entry = expense_report_index(records).get(report_id)
+        if not entry:
             raise HTTPException(status_code=404, detail="Expense report not found")
+        rows_to_delete = entry.row_numbers
         
         # Delete in reverse order
         for row_index in sorted(rows_to_delete, reverse=True):
@@ -286,13 +253,10 @@ async def submit_expense_report(
         records = sheets_service.get_all_records(settings.EXPENSES_SHEET)
         
         # Find rows for this report
-        report_rows = []
-        for idx, r in enumerate(records):
-            if r.get("Expense Report ID") == report_id:
-                report_rows.append((idx + 2, r))
-        
-        if not report_rows:
+        entry = expense_report_index(records).get(report_id)
+        if not entry:
             raise HTTPException(status_code=404, detail="Expense report not found")
+        report_rows = entry.rows
         
         current_status = report_rows[0][1].get("Status", "DRAFT")
         if current_status not in ["DRAFT", "REJECTED"]:
@@ -327,7 +291,7 @@ async def submit_expense_report(
         project_name = report_rows[0][1].get("Project Name", "")
         
         # Calculate total
-        total = sum(float(r.get("Expense", 0) or 0) for _, r in report_rows)
+        total = entry.total
         
         # Look up project manager
         manager_id = None
@@ -374,13 +338,10 @@ async def approve_expense_report(
     try:
         records = sheets_service.get_all_records(settings.EXPENSES_SHEET)
         
-        report_rows = []
-        for idx, r in enumerate(records):
-            if r.get("Expense Report ID") == report_id:
-                report_rows.append((idx + 2, r))
-        
-        if not report_rows:
+        entry = expense_report_index(records).get(report_id)
+        if not entry:
             raise HTTPException(status_code=404, detail="Expense report not found")
+        report_rows = entry.rows
         
         current_status = report_rows[0][1].get("Status", "DRAFT")
         if current_status != "SUBMITTED":
@@ -444,13 +405,10 @@ async def reject_expense_report(
     try:
         records = sheets_service.get_all_records(settings.EXPENSES_SHEET)
         
-        report_rows = []
-        for idx, r in enumerate(records):
-            if r.get("Expense Report ID") == report_id:
-                report_rows.append((idx + 2, r))
-        
-        if not report_rows:
+        entry = expense_report_index(records).get(report_id)
+        if not entry:
             raise HTTPException(status_code=404, detail="Expense report not found")
+        report_rows = entry.rows
         
         current_status = report_rows[0][1].get("Status", "DRAFT")
         if current_status != "SUBMITTED":
@@ -529,13 +487,10 @@ async def withdraw_expense_report(
     try:
         records = sheets_service.get_all_records(settings.EXPENSES_SHEET)
         
-        report_rows = []
-        for idx, r in enumerate(records):
-            if r.get("Expense Report ID") == report_id:
-                report_rows.append((idx + 2, r))
-        
-        if not report_rows:
+        entry = expense_report_index(records).get(report_id)
+        if not entry:
             raise HTTPException(status_code=404, detail="Expense report not found")
+        report_rows = entry.rows
         
         current_status = report_rows[0][1].get("Status", "DRAFT")
         if current_status != "SUBMITTED":
@@ -619,14 +574,12 @@ async def get_expense_summary(
         project_totals = {}
         monthly_project_totals = {}  # { "YYYY-MM": { "ProjectID": amount } }
         
-        for r in records:
+        # A project filter only visits that project's rows
+        rows = expense_report_index(records).rows_for_project(project_id) if project_id else records
+        for r in rows:
             if not r.get("Date"):
                 continue
             
-            # Apply project filter
-            if project_id and r.get("Project ID") != project_id:
-                continue
-            
             # Apply date filter
             date_str = r.get("Date", "")
             if year or month:
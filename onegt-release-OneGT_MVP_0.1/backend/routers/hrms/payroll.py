@@ -73,13 +73,10 @@ async def create_payroll(payroll: PayrollCreate):
 async def bulk_create_payroll(payrolls: List[PayrollCreate]):
     """Add multiple payroll records."""
     try:
-        count = 0
-        for payroll in payrolls:
-            row = payroll_to_row(payroll)
-            sheets_service.append_row(settings.PAYROLL_SHEET, row)
-            count += 1
+        rows = [payroll_to_row(payroll) for payroll in payrolls]
+        result = sheets_service.append_rows(settings.PAYROLL_SHEET, rows) if rows else {"batches": []}
         
-        return {"success": True, "message": f"Added {count} payroll records"}
+        return {"success": True, "message": f"Added {len(rows)} payroll records", "batches": result["batches"]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -160,6 +157,7 @@ async def upload_payroll_excel(file: UploadFile = File(...)):
         # Read data rows
         records_added = 0
         records_skipped = 0
+        rows_to_add = []
         
         for row_num, row in enumerate(ws.iter_rows(min_row=header_row + 1), start=header_row + 1):
             # Get employee code
@@ -210,17 +208,19 @@ async def upload_payroll_excel(file: UploadFile = File(...)):
                 net_pay=get_float("net_pay")
             )
             
-            # Append to sheet
-            row_data = payroll_to_row(payroll_data)
-            sheets_service.append_row(settings.PAYROLL_SHEET, row_data)
+            # Collect for a single batched append
+            rows_to_add.append(payroll_to_row(payroll_data))
             records_added += 1
         
+        batches = sheets_service.append_rows(settings.PAYROLL_SHEET, rows_to_add)["batches"] if rows_to_add else []
+        
         return {
             "success": True,
             "message": f"Successfully uploaded {records_added} payroll records for {month} {year}",
             "records_added": records_added,
             "records_skipped": records_skipped,
-            "period": f"{month} {year}"
+            "period": f"{month} {year}",
+            "batches": batches
         }
         
     except ImportError:
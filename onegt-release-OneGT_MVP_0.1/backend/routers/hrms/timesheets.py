@@ -1,6 +1,8 @@
+import asyncio
+import time
 from fastapi import APIRouter, HTTPException, Query
 from typing import List, Optional
-from services.google_sheets import sheets_service
+from services.async_sheets import async_sheets
 from models.hrms.timesheet import (
     Timesheet, TimesheetCreate, TimesheetUpdate, TimesheetBulkStatusUpdate,
     timesheet_to_row, row_to_timesheet, TIMESHEET_COLUMNS
@@ -28,11 +30,11 @@ async def get_timesheets(
     """Get timesheets with optional filters."""
     try:
         # Create sheet if it doesn't exist
-        sheets_service.create_sheet_if_not_exists(
+        await async_sheets.create_sheet_if_not_exists(
             settings.TIMESHEETS_SHEET, TIMESHEET_COLUMNS
         )
         
-        records = sheets_service.get_all_records(settings.TIMESHEETS_SHEET)
+        records = await async_sheets.get_all_records(settings.TIMESHEETS_SHEET)
         timesheets = []
         
         for idx, r in enumerate(records):
@@ -80,12 +82,12 @@ async def create_timesheet(timesheet: TimesheetCreate):
     """Create a new timesheet entry."""
     try:
         # Create sheet if it doesn't exist
-        sheets_service.create_sheet_if_not_exists(
+        await async_sheets.create_sheet_if_not_exists(
             settings.TIMESHEETS_SHEET, TIMESHEET_COLUMNS
         )
         
         row = timesheet_to_row(timesheet)
-        result = sheets_service.append_row(settings.TIMESHEETS_SHEET, row)
+        result = await async_sheets.append_row(settings.TIMESHEETS_SHEET, row)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -95,35 +97,38 @@ async def bulk_create_timesheets(timesheets: List[TimesheetCreate]):
     """Create multiple timesheet entries."""
     try:
         # Create sheet if it doesn't exist
-        sheets_service.create_sheet_if_not_exists(
+        await async_sheets.create_sheet_if_not_exists(
             settings.TIMESHEETS_SHEET, TIMESHEET_COLUMNS
         )
         
-        count = 0
         project_ids = set()
         associate_id = timesheets[0].associate_id if timesheets else ""
         
+        rows = []
         for ts in timesheets:
-            row = timesheet_to_row(ts)
-            sheets_service.append_row(settings.TIMESHEETS_SHEET, row)
-            count += 1
+            rows.append(timesheet_to_row(ts))
             if ts.status == 'Submitted':
                 project_ids.add(ts.project_id)
         
+        # One batched write instead of an append per entry
+        if rows:
+            await async_sheets.append_rows(settings.TIMESHEETS_SHEET, rows)
+        count = len(rows)
+        
         # Trigger notifications for managers if submitted
         if project_ids:
             try:
                 # Create notification sheet if it doesn't exist
                 notif_sheet = settings.NOTIFICATIONS_SHEET if hasattr(settings, 'NOTIFICATIONS_SHEET') else "Notifications"
-                sheets_service.create_sheet_if_not_exists(notif_sheet, ["Notification ID", "User ID", "Type", "Title", "Message", "Link", "Is Read", "Created At"])
+                await async_sheets.create_sheet_if_not_exists(notif_sheet, ["Notification ID", "User ID", "Type", "Title", "Message", "Link", "Is Read", "Created At"])
                 
                 # Get associate name
-                assoc_record = sheets_service.get_row_by_id(settings.ASSOCIATES_SHEET, "Associate ID", associate_id.strip())
+                assoc_record = await async_sheets.get_row_by_id(settings.ASSOCIATES_SHEET, "Associate ID", associate_id.strip())
                 assoc_name = assoc_record.get("Associate Name", associate_id) if assoc_record else associate_id
                 
                 for pid in project_ids:
                     # Find project manager
-                    proj_record = sheets_service.get_row_by_id(settings.PROJECTS_SHEET, "Project ID", pid.strip())
+                    proj_record = await async_sheets.get_row_by_id(settings.PROJECTS_SHEET, "Project ID", pid.strip())
                     if proj_record:
                         pm_id = str(proj_record.get("Project Manager ID", "")).strip()
                         if pm_id:
@@ -135,7 +140,7 @@ async def bulk_create_timesheets(timesheets: List[TimesheetCreate]):
                                 message=f'{assoc_name} has submitted timesheets for project {pid}.',
                                 link='/timesheets'
                             )
-                            sheets_service.append_row(
+                            await async_sheets.append_row(
                                 notif_sheet,
                                 notification_to_row(notif)
                             )
@@ -150,7 +155,7 @@ async def bulk_create_timesheets(timesheets: List[TimesheetCreate]):
 async def update_timesheet(row_index: int, update: TimesheetUpdate):
     """Update a timesheet entry by row index."""
     try:
-        records = sheets_service.get_all_records(settings.TIMESHEETS_SHEET)
+        records = await async_sheets.get_all_records(settings.TIMESHEETS_SHEET)
         if row_index < 2 or row_index > len(records) + 1:
             raise HTTPException(status_code=404, detail="Timesheet entry not found")
         
@@ -164,7 +169,7 @@ async def update_timesheet(row_index: int, update: TimesheetUpdate):
         merged = TimesheetCreate(**current_ts.model_dump(exclude={"row_index"}))
         row = timesheet_to_row(merged)
         
-        result = sheets_service.update_row(settings.TIMESHEETS_SHEET, row_index, row)
+        result = await async_sheets.update_row(settings.TIMESHEETS_SHEET, row_index, row)
         return result
     except HTTPException:
         raise
@@ -178,89 +183,84 @@ async def bulk_update_status(
 ):
     """Update status for multiple timesheet entries."""
     try:
+        started = time.perf_counter()
+        
         # Status is in the 8th column, Comments in the 9th
         status_col_index = 8
         comments_col_index = 9
         
         # We need to notify the associate about the status change
-        records = sheets_service.get_all_records(settings.TIMESHEETS_SHEET)
+        records = await async_sheets.get_all_records(settings.TIMESHEETS_SHEET)
         processed_associates = {} # associate_id -> set of project_ids
         
         timestamp = datetime.now().strftime("%d-%b-%Y %H:%M:%S")
         user_name = current_user.name or current_user.associate_id
         
+        # Format: <dd-mmm-yyyy hh:MM:ss> <user> <status> <comment or status change>
+        action_msg = update.reason if update.status == 'Rejected' else update.status
+        new_comment_entry = f"{timestamp} {user_name} {update.status} {action_msg}" if update.reason else f"{timestamp} {user_name} {update.status}"
+        
+        # 1. Compute every cell change up front
+        cells = []
         for row_index in update.row_indices:
-            # Update Status
-            sheets_service.update_cell(
-                settings.TIMESHEETS_SHEET, 
-                row_index, 
-                status_col_index, 
-                update.status
-            )
+            cells.append((row_index, status_col_index, update.status))
             
-            # Format and Append Comments
             if row_index - 2 < len(records):
                 r = records[row_index - 2]
                 existing_comments = r.get("Comments", "") or ""
+                final_comments = f"{existing_comments}\n{new_comment_entry}" if existing_comments else new_comment_entry
+                cells.append((row_index, comments_col_index, final_comments))
                 
-                # Format: <dd-mmm-yyyy hh:MM:ss> <user> <status> <comment or status change>
-                action_msg = update.reason if update.status == 'Rejected' else update.status
-                new_comment_entry = f"{timestamp} {user_name} {update.status} {action_msg}" if update.reason else f"{timestamp} {user_name} {update.status}"
-                
-                final_comments = existing_comments
-                if final_comments:
-                    final_comments += f"\n{new_comment_entry}"
-                else:
-                    final_comments = new_comment_entry
-
-                sheets_service.update_cell(
-                    settings.TIMESHEETS_SHEET,
-                    row_index,
-                    comments_col_index,
-                    final_comments
-                )
-            
-            # Track for notification
-            if row_index - 2 < len(records):
-                r = records[row_index - 2]
+                # Track for notification
                 aid = r.get("Associate ID")
                 pid = r.get("Project ID")
                 if aid:
-                    if aid not in processed_associates:
-                        processed_associates[aid] = set()
-                    processed_associates[aid].add(pid)
+                    processed_associates.setdefault(aid, set()).add(pid)
         
-        # Trigger notifications for associates
+        # 2. Write them in one batch_update
+        await async_sheets.update_cells(settings.TIMESHEETS_SHEET, cells)
+        written = time.perf_counter()
+        
+        # 3. Notify associates: one batched insert for all notification rows
+        type_map = {
+            'Approved': 'TimesheetApproved',
+            'Rejected': 'TimesheetRejected',
+            'Saved': 'TimesheetReturned'
+        }
+        notif_type = type_map.get(update.status, 'TimesheetUpdated')
+        notification_rows = []
         for aid, pids in processed_associates.items():
+            message = f'Your timesheets for projects {", ".join(pids)} have been {update.status.lower()}.'
+            if update.status == 'Rejected' and update.reason:
+                message += f' Reason: {update.reason}'
+            
+            notif = NotificationCreate(
+                user_id=aid,
+                type=notif_type,
+                title=f'Timesheet {update.status}',
+                message=message,
+                link='/timesheets'
+            )
+            notification_rows.append(notification_to_row(notif))
+        
+        if notification_rows:
             try:
-                type_map = {
-                    'Approved': 'TimesheetApproved',
-                    'Rejected': 'TimesheetRejected',
-                    'Saved': 'TimesheetReturned'
-                }
-                notif_type = type_map.get(update.status, 'TimesheetUpdated')
-                
-                message = f'Your timesheets for projects {", ".join(pids)} have been {update.status.lower()}.'
-                if update.status == 'Rejected' and update.reason:
-                    message += f' Reason: {update.reason}'
-                
-                # Internal Notification
-                notif = NotificationCreate(
-                    user_id=aid,
-                    type=notif_type,
-                    title=f'Timesheet {update.status}',
-                    message=message,
-                    link='/timesheets'
-                )
-                sheets_service.append_row(
+                await async_sheets.append_rows(
                     settings.NOTIFICATIONS_SHEET if hasattr(settings, 'NOTIFICATIONS_SHEET') else "Notifications",
-                    notification_to_row(notif)
+                    notification_rows
                 )
-
-                # Email Notification for Rejections
-                if update.status == 'Rejected':
+            except Exception as e:
+                print(f"Failed to notify associates: {e}")
+        
+        # Email Notification for Rejections (associates resolved from one in-memory lookup)
+        if update.status == 'Rejected' and processed_associates:
+            try:
+                associates = await async_sheets.get_all_records(settings.ASSOCIATES_SHEET)
+                associates_by_id = {str(a.get("Associate ID", "")).strip(): a for a in associates}
+                
+                async def send_rejection(aid, pids):
                     try:
-                        assoc_record = sheets_service.get_row_by_id(settings.ASSOCIATES_SHEET, "Associate ID", aid.strip())
+                        assoc_record = associates_by_id.get(aid.strip())
                         if assoc_record:
                             associate = row_to_associate(assoc_record)
                             await email_service.send_rejection_email(
@@ -272,11 +272,23 @@ async def bulk_update_status(
                             )
                     except Exception as email_err:
                         print(f"Failed to send rejection email to {aid}: {email_err}")
-
+                
+                await asyncio.gather(*(send_rejection(aid, pids) for aid, pids in processed_associates.items()))
             except Exception as e:
-                print(f"Failed to notify associate {aid}: {e}")
+                print(f"Failed to send rejection emails: {e}")
         
-        return {"success": True, "message": f"Updated {len(update.row_indices)} entries to {update.status}"}
+        finished = time.perf_counter()
+        return {
+            "success": True,
+            "message": f"Updated {len(update.row_indices)} entries to {update.status}",
+            "cells_updated": len(cells),
+            "notifications": len(notification_rows),
+            "latency_ms": {
+                "write": round((written - started) * 1000, 1),
+                "notify": round((finished - written) * 1000, 1),
+                "total": round((finished - started) * 1000, 1)
+            }
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -289,7 +301,7 @@ async def get_team_timesheets(
     """Get all timesheets pending approval for projects managed by the current user."""
     try:
         # 1. Get managed projects
-        all_proj_records = sheets_service.get_all_records(settings.PROJECTS_SHEET)
+        all_proj_records = await async_sheets.get_all_records(settings.PROJECTS_SHEET)
         managed_project_ids = set()
         is_admin = current_user.role.lower() == "admin"
         curr_associate_id = str(current_user.associate_id).strip()
@@ -305,7 +317,7 @@ async def get_team_timesheets(
             return []
             
         # 2. Get all timesheets and filter
-        records = sheets_service.get_all_records(settings.TIMESHEETS_SHEET)
+        records = await async_sheets.get_all_records(settings.TIMESHEETS_SHEET)
         timesheets = []
         
         # Default statuses to show if none provided
@@ -327,7 +339,7 @@ async def get_team_timesheets(
 async def delete_timesheet(row_index: int):
     """Delete a timesheet entry by row index."""
     try:
-        result = sheets_service.delete_row(settings.TIMESHEETS_SHEET, row_index)
+        result = await async_sheets.delete_row(settings.TIMESHEETS_SHEET, row_index)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -339,7 +351,7 @@ async def get_weekly_summary(
 ):
     """Get weekly timesheet summary for an associate."""
     try:
-        records = sheets_service.get_all_records(settings.TIMESHEETS_SHEET)
+        records = await async_sheets.get_all_records(settings.TIMESHEETS_SHEET)
         
         start_date = datetime.strptime(week_start, "%Y-%m-%d")
         end_date = start_date + timedelta(days=6)
@@ -394,7 +406,7 @@ async def get_weekly_summary(
 async def get_project_hours(project_id: str):
     """Get total hours logged for a project."""
     try:
-        records = sheets_service.get_all_records(settings.TIMESHEETS_SHEET)
+        records = await async_sheets.get_all_records(settings.TIMESHEETS_SHEET)
         
         total_hours = 0
         billable_hours = 0
@@ -1,4 +1,8 @@
 # Services package
 from .google_sheets import sheets_service, GoogleSheetsService
+from .sql_sheets import SqlSheetsService
+from .async_sheets import async_sheets, AsyncSheetsService
+from .currency_service import currency_service, CurrencyService, RateTable
 
-__all__ = ["sheets_service", "GoogleSheetsService"]
+__all__ = ["sheets_service", "GoogleSheetsService", "SqlSheetsService", "async_sheets", "AsyncSheetsService",
+           "currency_service", "CurrencyService", "RateTable"]
@@ -0,0 +1,146 @@
+"""
+Vectorized salary cost of allocations.
+
+An allocation's cost for a month is the associate's salary for that month,
+prorated by the days of the month the allocation covers and by its
+Allocation %. Rather than stepping through each allocation month by month,
+``AllocationMonths`` expands a batch of (start, end) spans into flat arrays
+with one row per (allocation, month) covered, and ``PayrollMatrix`` holds
+payroll as an (associate, month) array, so the salary join and the
+proration are a handful of array operations for the whole batch.
+
+Months are counted as NumPy ``datetime64[M]`` integers (months since
+January 1970); ``month_of`` turns one back into (year, month).
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.finance_rows import monthly_salary, parse_allocation_dates, parse_amount
+
+YearMonth = Tuple[int, int]
+
+
+def month_number(year: int, month: int) -> int:
+    return (year - 1970) * 12 + month - 1
+
+
+def month_of(number: int) -> Tuple[int, int]:
+    return 1970 + number // 12, number % 12 + 1
+
+
+class AllocationMonths:
+    """Allocation spans expanded to one row per (allocation, month) they cover.
+
+    ``allocation[i]`` is the position of row i's span in the input,
+    ``month[i]`` its month number, ``overlap_days[i]`` the days of that month
+    inside the span and ``days_in_month[i]`` the month's length.
+    ``months_per_allocation`` counts the rows of each span (0 if it ends
+    before it starts).
+    """
+
+    def __init__(self, starts: Sequence[datetime], ends: Sequence[datetime]):
+        start_days = np.array(starts, dtype="datetime64[D]")
+        end_days = np.array(ends, dtype="datetime64[D]")
+        first = start_days.astype("datetime64[M]").astype(np.int64)
+        last = end_days.astype("datetime64[M]").astype(np.int64)
+        counts = np.where(end_days >= start_days, last - first + 1, 0)
+        self.months_per_allocation = counts
+
+        self.allocation = np.repeat(np.arange(len(counts)), counts)
+        offsets = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+        self.month = first[self.allocation] + offsets
+
+        month_start = self.month.astype("datetime64[M]").astype("datetime64[D]")
+        next_month = (self.month + 1).astype("datetime64[M]").astype("datetime64[D]")
+        overlap_from = np.maximum(start_days[self.allocation], month_start)
+        overlap_to = np.minimum(end_days[self.allocation], next_month - 1)
+        self.overlap_days = (overlap_to - overlap_from).astype(np.int64) + 1
+        self.days_in_month = (next_month - month_start).astype(np.int64)
+
+
+class PayrollMatrix:
+    """Monthly earnings per associate as an (associate, month) array (NaN = no payroll row)."""
+
+    def __init__(self, payroll: Dict[str, Dict[Tuple[str, str], float]]):
+        """``payroll`` is ``payroll_by_associate`` output: ID -> {(year, month name): earnings}."""
+        self._codes = {aid: i for i, aid in enumerate(payroll)}
+        years = {aid: sorted({int(y) for y, _ in months if y.isdigit()}) for aid, months in payroll.items()}
+        all_years = [y for ys in years.values() for y in ys]
+        self._first = month_number(min(all_years), 1) if all_years else 0
+        span = (month_number(max(all_years), 12) - self._first + 1) if all_years else 0
+        self._grid = np.full((len(payroll), span), np.nan)
+        for aid, months in payroll.items():
+            row = self._codes[aid]
+            for year in years[aid]:
+                for month in range(1, 13):
+                    # Same lookup as the per-row code, so full and abbreviated month names both match
+                    salary = monthly_salary(months, datetime(year, month, 1))
+                    if salary is not None:
+                        self._grid[row, month_number(year, month) - self._first] = salary
+        # Highest earnings per associate, used to project months with no payroll yet
+        self.peak = np.array([max(months.values()) if months else 0.0 for months in payroll.values()], dtype=float)
+
+    def codes(self, associates: Sequence[str]) -> np.ndarray:
+        """Row of each associate ID (-1 if it has no payroll)."""
+        return np.array([self._codes.get(aid, -1) for aid in associates], dtype=np.intp)
+
+    def salaries(self, codes: np.ndarray, months: np.ndarray) -> np.ndarray:
+        """Earnings for each (associate row, month number) pair; NaN where there is none."""
+        out = np.full(codes.shape, np.nan)
+        cols = months - self._first
+        known = (codes >= 0) & (cols >= 0) & (cols < self._grid.shape[1])
+        out[known] = self._grid[codes[known], cols[known]]
+        return out
+
+
+def prorated_costs(spans: AllocationMonths, associates: Sequence[str], pcts: Sequence[float],
+                   payroll: PayrollMatrix, project_after: Optional[int] = None) -> np.ndarray:
+    """Cost of each row of ``spans``: that month's salary / days in month * overlap days * pct.
+
+    ``associates`` and ``pcts`` (fractions) are per allocation. Months without
+    payroll cost nothing, except months after the ``project_after`` month
+    number, which use the associate's peak earnings instead.
+    """
+    codes = payroll.codes(associates)[spans.allocation]
+    salary = payroll.salaries(codes, spans.month)
+    if project_after is not None:
+        missing = np.isnan(salary) & (spans.month > project_after)
+        peak = np.append(payroll.peak, 0.0)  # code -1 (no payroll) -> 0
+        salary[missing] = peak[codes[missing]]
+    salary = np.nan_to_num(salary)
+    return salary / spans.days_in_month * spans.overlap_days * np.asarray(pcts, dtype=float)[spans.allocation]
+
+
+def group_totals(groups: Sequence[str], values: np.ndarray) -> Dict[str, float]:
+    """Sum ``values`` per group label (e.g. per project)."""
+    codes: Dict[str, int] = {}
+    index = np.array([codes.setdefault(g, len(codes)) for g in groups], dtype=np.intp)
+    totals = np.bincount(index, weights=np.asarray(values, dtype=float), minlength=len(codes))
+    return dict(zip(codes, totals.tolist()))
+
+
+def monthly_costs(allocations: Sequence[Tuple[str, str, str, str]], payroll: PayrollMatrix,
+                  project_after: Optional[YearMonth] = None) -> List[List[Tuple[YearMonth, float]]]:
+    """[(month, cost), ...] of each (associate ID, start, end, allocation %) sheet row, in one batch.
+
+    Rows with a missing, unparseable or reversed date cost nothing.
+    """
+    valid = []
+    for i, (_, start_str, end_str, _) in enumerate(allocations):
+        dates = parse_allocation_dates(start_str, end_str)
+        if dates is not None:
+            valid.append((i, dates))
+    spans = AllocationMonths([dates[0] for _, dates in valid], [dates[1] for _, dates in valid])
+    costs = prorated_costs(
+        spans,
+        [allocations[i][0] for i, _ in valid],
+        [parse_amount(allocations[i][3], 100) / 100 for i, _ in valid],
+        payroll,
+        month_number(*project_after) if project_after else None,
+    )
+    result: List[List[Tuple[YearMonth, float]]] = [[] for _ in allocations]
+    for row, number, cost in zip(spans.allocation.tolist(), spans.month.tolist(), costs.tolist()):
+        result[valid[row][0]].append((month_of(number), cost))
+    return result
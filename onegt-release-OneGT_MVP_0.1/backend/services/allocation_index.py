@@ -0,0 +1,160 @@
+"""
+Interval index over the Allocations sheet.
+
+Dashboard month queries ask "which allocations overlap this month?", for
+everyone, one associate or one project. The index parses every row's Start
+and End Date once and stores the intervals in centered interval trees (one
+over all rows, one per associate, one per project), so a query costs
+O(log n + matches) instead of a scan that re-parses every date.
+
+An index is built once per snapshot: ``allocation_index(records)`` reuses
+the index of the records list it was last built from, and the cache hands
+out the same list until the sheet actually changes.
+"""
+import bisect
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.date_utils import parse_sheet_datetime
+
+# Allocations without an End Date run indefinitely
+OPEN_END = datetime(2099, 12, 31)
+
+
+class AllocationInterval:
+    __slots__ = ("start", "end", "position", "record", "associate_id", "project_id")
+
+    def __init__(self, start: datetime, end: datetime, position: int, record: Dict[str, Any]):
+        self.start = start
+        self.end = end
+        self.position = position
+        self.record = record
+        self.associate_id = str(record.get("Associate ID", "")).strip()
+        self.project_id = str(record.get("Project ID", "")).strip()
+
+
+class _Node:
+    """Intervals containing ``center``, plus subtrees for those wholly left/right of it."""
+    __slots__ = ("center", "by_start", "starts", "by_end", "ends", "left", "right")
+
+    def __init__(self, intervals: List[AllocationInterval]):
+        points = sorted([iv.start for iv in intervals] + [iv.end for iv in intervals])
+        self.center = points[len(points) // 2]
+        here, left, right = [], [], []
+        for iv in intervals:
+            if iv.end < self.center:
+                left.append(iv)
+            elif iv.start > self.center:
+                right.append(iv)
+            else:
+                here.append(iv)
+        self.by_start = sorted(here, key=lambda iv: iv.start)
+        self.starts = [iv.start for iv in self.by_start]
+        self.by_end = sorted(here, key=lambda iv: iv.end)
+        self.ends = [iv.end for iv in self.by_end]
+        self.left = _Node(left) if left else None
+        self.right = _Node(right) if right else None
+
+
+def _build(intervals: List[AllocationInterval]) -> Optional[_Node]:
+    return _Node(intervals) if intervals else None
+
+
+def _query(node: Optional[_Node], start: datetime, end: datetime, out: List[AllocationInterval]):
+    """Collect intervals with ``iv.start < end and iv.end >= start``."""
+    while node is not None:
+        if end <= node.center:
+            # Everything here reaches the center, so only the start can miss
+            out.extend(node.by_start[:bisect.bisect_left(node.starts, end)])
+            node = node.left
+        elif start > node.center:
+            # Everything here starts by the center, so only the end can miss
+            out.extend(node.by_end[bisect.bisect_left(node.ends, start):])
+            node = node.right
+        else:
+            # The range contains the center, so it overlaps everything here
+            out.extend(node.by_start)
+            _query(node.left, start, end, out)
+            node = node.right
+
+
+def month_range(year: int, month: int) -> Tuple[datetime, datetime]:
+    """First day of the month and first day of the next."""
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+class AllocationIndex:
+    def __init__(self, records: List[Dict[str, Any]]):
+        intervals = []
+        # Rows whose End Date precedes their Start Date break the tree's ordering;
+        # they are rare data errors, so they are kept aside and checked directly
+        self._inverted: List[AllocationInterval] = []
+        for pos, record in enumerate(records):
+            start = parse_sheet_datetime(record.get("Start Date", ""))
+            if not start:
+                continue
+            end = parse_sheet_datetime(record.get("End Date", "")) or OPEN_END
+            interval = AllocationInterval(start, end, pos, record)
+            if not interval.associate_id:
+                continue
+            if end < start:
+                self._inverted.append(interval)
+            else:
+                intervals.append(interval)
+
+        by_associate: Dict[str, List[AllocationInterval]] = {}
+        by_project: Dict[str, List[AllocationInterval]] = {}
+        for iv in intervals:
+            by_associate.setdefault(iv.associate_id, []).append(iv)
+            by_project.setdefault(iv.project_id, []).append(iv)
+
+        self.size = len(intervals) + len(self._inverted)
+        self._all = _build(intervals)
+        self._by_associate = {aid: _build(ivs) for aid, ivs in by_associate.items()}
+        self._by_project = {pid: _build(ivs) for pid, ivs in by_project.items()}
+
+    def overlapping(self, start: datetime, end: datetime, associate_id: Optional[str] = None,
+                    project_id: Optional[str] = None) -> List[AllocationInterval]:
+        """Allocations overlapping [start, end), in sheet order, optionally for one associate or project."""
+        if associate_id is not None:
+            root = self._by_associate.get(str(associate_id).strip())
+        elif project_id is not None:
+            root = self._by_project.get(str(project_id).strip())
+        else:
+            root = self._all
+        out: List[AllocationInterval] = []
+        _query(root, start, end, out)
+        out.extend(iv for iv in self._inverted if iv.start < end and iv.end >= start and
+                   (associate_id is None or iv.associate_id == str(associate_id).strip()) and
+                   (project_id is None or iv.project_id == str(project_id).strip()))
+        if associate_id is not None and project_id is not None:
+            out = [iv for iv in out if iv.project_id == str(project_id).strip()]
+        out.sort(key=lambda iv: iv.position)
+        return out
+
+    def in_month(self, year: int, month: int, associate_id: Optional[str] = None,
+                 project_id: Optional[str] = None) -> List[AllocationInterval]:
+        """Allocations active at any point in the given month."""
+        start, end = month_range(year, month)
+        return self.overlapping(start, end, associate_id=associate_id, project_id=project_id)
+
+
+_lock = threading.Lock()
+_built: List[Tuple[List[Dict[str, Any]], AllocationIndex]] = []
+_MAX_BUILT = 4
+
+
+def allocation_index(records: List[Dict[str, Any]]) -> AllocationIndex:
+    """Index for an Allocations records list, reused while the same list is served."""
+    with _lock:
+        for built_records, index in _built:
+            if built_records is records:
+                return index
+    index = AllocationIndex(records)
+    with _lock:
+        _built.insert(0, (records, index))
+        del _built[_MAX_BUILT:]
+    return index
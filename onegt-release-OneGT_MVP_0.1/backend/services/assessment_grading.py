@@ -0,0 +1,82 @@
+"""
+Assessment Grading Engine - scores a submission against an assessment's questions.
+
+Submissions are indexed by question_id once, so grading is linear in the
+number of questions and answers. Questions may carry:
+
+* ``points`` - the weight of the question (default 1).
+* ``correct_option_ids`` - several correct options ("select all that
+  apply"). The answer's ``option_ids`` earn partial credit: the share of
+  correct options selected, less the share of wrong ones, never below 0.
+
+Single-choice questions (``correct_option_id``) score all or nothing, as
+before; with default weights the score is the percentage of correct answers.
+A malformed answer (``option_ids`` that is not a list of IDs) raises
+ValueError.
+"""
+from typing import Any, Dict, List, NamedTuple
+
+
+class GradedSubmission(NamedTuple):
+    score: float           # Percentage of the available points
+    correct_count: int     # Questions answered fully correctly
+    points_awarded: float
+    points_possible: float
+    detailed: List[Dict[str, Any]]
+
+
+def index_answers(answers: List[Dict[str, Any]]) -> Dict[Any, Dict[str, Any]]:
+    """question_id -> answer; the first answer to a question counts."""
+    indexed: Dict[Any, Dict[str, Any]] = {}
+    for answer in answers:
+        if isinstance(answer, dict) and "question_id" in answer:
+            indexed.setdefault(answer["question_id"], answer)
+    return indexed
+
+
+def _credit(question: Dict[str, Any], answer: Dict[str, Any]) -> tuple:
+    """(submitted, correct, credit in [0, 1]) of one answer."""
+    correct_ids = question.get("correct_option_ids")
+    if correct_ids:
+        submitted = answer.get("option_ids")
+        if submitted is None:
+            submitted = [answer["option_id"]] if answer.get("option_id") else []
+        elif not isinstance(submitted, list) or not all(isinstance(o, (str, int)) for o in submitted):
+            raise ValueError(f"option_ids of question {question.get('id')} must be a list of option IDs")
+        chosen = set(submitted)
+        correct = set(correct_ids)
+        credit = (len(chosen & correct) - len(chosen - correct)) / len(correct)
+        return list(submitted), list(correct_ids), max(0.0, credit)
+    submitted = answer.get("option_id", "")
+    correct = question.get("correct_option_id", "")
+    return submitted, correct, 1.0 if submitted == correct else 0.0
+
+
+def grade_submission(questions: List[Dict[str, Any]], answers: List[Dict[str, Any]]) -> GradedSubmission:
+    by_question = index_answers(answers)
+    correct_count = 0
+    points_awarded = 0.0
+    points_possible = 0.0
+    detailed = []
+
+    for q in questions:
+        weight = float(q.get("points", 1) or 0)
+        submitted, correct, credit = _credit(q, by_question.get(q["id"], {}))
+        is_correct = credit >= 1.0
+        if is_correct:
+            correct_count += 1
+        awarded = weight * credit
+        points_awarded += awarded
+        points_possible += weight
+        detailed.append({
+            "question_id": q["id"],
+            "submitted": submitted,
+            "correct": correct,
+            "is_correct": is_correct,
+            "points_awarded": awarded,
+            "points_possible": weight,
+            "explanation": q.get("explanation"),
+        })
+
+    score = points_awarded / points_possible * 100 if points_possible else 0.0
+    return GradedSubmission(score, correct_count, points_awarded, points_possible, detailed)
@@ -0,0 +1,57 @@
+"""
+Async facade over the Sheets service.
+
+gspread is synchronous, so calling it from an ``async def`` route blocks the
+event loop and stalls every other request in the worker. This wrapper runs
+each call on a bounded thread pool and gives it a timeout, so routes can
+``await`` sheet reads and ``asyncio.gather`` independent ones.
+"""
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from config import settings
+from services.google_sheets import sheets_service
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSheetsService:
+    def __init__(self, service, max_workers: int = 16, timeout: Optional[float] = 30):
+        self._service = service
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sheets-io")
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run a blocking callable on the Sheets thread pool, with a timeout."""
+        loop = asyncio.get_running_loop()
+        call = loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        limit = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(call, limit)
+        except asyncio.TimeoutError:
+            # The worker thread cannot be interrupted; it finishes in the background
+            name = getattr(fn, "__name__", repr(fn))
+            logger.error(f"Sheets call {name} timed out after {limit}s")
+            raise TimeoutError(f"Sheets call {name} timed out after {limit}s") from None
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._service, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        return call
+
+
+# Singleton instance
+async_sheets = AsyncSheetsService(
+    sheets_service,
+    max_workers=settings.SHEETS_ASYNC_WORKERS,
+    timeout=settings.SHEETS_CALL_TIMEOUT_SECONDS
+)
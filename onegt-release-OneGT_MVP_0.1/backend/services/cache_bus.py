@@ -0,0 +1,180 @@
+"""
+Cross-replica cache invalidation bus.
+
+A write through one worker patches that worker's caches directly, and the
+shared cache tier reaches the other workers on the same host. Workers on
+other hosts (replicas) would keep serving their copy until its TTL runs
+out. With ``CACHE_INVALIDATION_BUS`` enabled, every write is also published
+as a change event on a PostgreSQL ``LISTEN/NOTIFY`` channel of the
+assessment database, and each worker's listener thread hands the events of
+other workers to the subscribed caches, which expire exactly the changed
+entry right away.
+
+An event names a cache scope ("sheets", "api"), the key that changed (None
+for everything in the scope), the kind of change and, where known, the
+first and last sheet rows it touched. Notifications sent while a listener
+is disconnected are lost, so after reconnecting it reports a reset of every
+scope.
+"""
+import json
+import logging
+import os
+import select
+import socket
+import threading
+import uuid
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "onegt_cache_invalidation"
+
+# Kinds of change
+APPEND = "append"  # Rows added after the last known row
+UPDATE = "update"  # Rows edited in place
+DELETE = "delete"  # Rows removed (later rows move up)
+RESET = "reset"    # Anything else: reload from scratch
+
+
+class CacheEvent(NamedTuple):
+    scope: str
+    key: Optional[str]
+    op: str
+    rows: Optional[Tuple[int, int]]
+
+
+class CacheBus:
+    def __init__(self, enabled: bool = False, channel: str = CHANNEL):
+        self.enabled = enabled
+        self.channel = channel
+        self.origin = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, List[Callable[[CacheEvent], None]]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {"published": 0, "publish_errors": 0, "received": 0, "handler_errors": 0, "reconnects": 0}
+
+    def subscribe(self, scope: str, handler: Callable[[CacheEvent], None]):
+        """Call ``handler`` with every event another worker publishes for ``scope``."""
+        with self._lock:
+            self._handlers.setdefault(scope, []).append(handler)
+
+    def publish(self, scope: str, key: Optional[str], op: str = RESET, rows: Optional[Tuple[int, int]] = None):
+        """Tell the other workers that ``key`` (None = all of ``scope``) changed.
+
+        Failures are logged and swallowed: the write already happened, and the
+        other workers still pick it up when their entries expire.
+        """
+        if not self.enabled:
+            return
+        from utils.assessment_db import get_conn, put_conn
+
+        payload = json.dumps({"o": self.origin, "s": scope, "k": key, "op": op, "r": list(rows) if rows else None})
+        try:
+            conn = get_conn()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                put_conn(conn)
+        except Exception as e:
+            self._count("publish_errors")
+            logger.warning(f"Could not publish cache invalidation of {scope}/{key}: {e}")
+            return
+        self._count("published")
+
+    # --- Listener ---
+
+    def start(self):
+        """Start the listener thread (no-op when the bus is disabled or already running)."""
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, name="cache-bus", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _listen(self):
+        from utils.assessment_db import connect
+
+        backoff = 1.0
+        connected_before = False
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = connect()
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.channel}")
+                logger.info(f"Listening for cache invalidations on {self.channel}")
+                if connected_before:
+                    # Events sent while disconnected are gone; expire everything instead
+                    self._count("reconnects")
+                    with self._lock:
+                        scopes = list(self._handlers)
+                    for scope in scopes:
+                        self._dispatch(CacheEvent(scope, None, RESET, None))
+                connected_before = True
+                backoff = 1.0
+                while not self._stop.is_set():
+                    if not select.select([conn], [], [], 5)[0]:
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._receive(conn.notifies.pop(0).payload)
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener disconnected, retrying in {backoff:.0f}s: {e}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60.0)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def _receive(self, payload: str):
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            logger.debug(f"Ignoring malformed cache invalidation: {payload!r}")
+            return
+        if data.get("o") == self.origin:
+            return
+        rows = data.get("r")
+        self._count("received")
+        self._dispatch(CacheEvent(data.get("s", ""), data.get("k"), data.get("op", RESET), tuple(rows) if rows else None))
+
+    def _dispatch(self, event: CacheEvent):
+        with self._lock:
+            handlers = list(self._handlers.get(event.scope, []))
+        for handler in handlers:
+            try:
+                handler(event)
+            except Exception as e:
+                self._count("handler_errors")
+                logger.warning(f"Cache invalidation handler failed for {event}: {e}")
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                **self._stats,
+                "enabled": self.enabled,
+                "listening": self._thread is not None and self._thread.is_alive(),
+                "origin": self.origin,
+            }
+
+
+cache_bus = CacheBus(enabled=settings.CACHE_INVALIDATION_BUS)
@@ -0,0 +1,382 @@
+"""
+Monthly cashflow engine for the CRMS finance view.
+
+Actual and projected money in/out is kept per (month, rate month, source
+currency) cell: invoices (paid -> actual in, open -> projected in), the
+uninvoiced remainder of active deals spread over their remaining months,
+approved expenses and prorated allocation salaries. For each requested
+currency the cells are converted once into per-month NumPy arrays that are
+cached; a changed invoice, expense, allocation or payroll row only
+recomputes the months it touches, so long histories stay cheap to query.
+
+Projections depend on the current date (overdue invoices roll into the
+current month, future salaries use the latest payroll), so the engine is
+rebuilt when the month changes and deal projections are redone daily.
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from services.allocation_cost import PayrollMatrix, monthly_costs
+from services.currency_service import RateTable
+from services.finance_rows import (
+    Contribution, RowLedger, clean_money, parse_amount, payroll_by_associate, per_row, sheet_date,
+)
+
+logger = logging.getLogger(__name__)
+
+ACTUAL_IN, ACTUAL_OUT, PROJECTED_IN, PROJECTED_OUT = 0, 1, 2, 3
+MEASURES = ("actual_in", "actual_out", "projected_in", "projected_out")
+
+SOURCES = ("deals", "invoices", "expenses", "allocations", "payroll")
+
+YearMonth = Tuple[int, int]
+
+
+def month_index(year: int, month: int) -> int:
+    return year * 12 + month - 1
+
+
+def index_month(idx: int) -> YearMonth:
+    return idx // 12, idx % 12 + 1
+
+
+# --- Row fingerprints ---
+
+def _invoice_key(inv: Dict[str, Any]) -> Optional[Hashable]:
+    status = str(inv.get("Status", "")).lower().strip()
+    if status == "cancelled":
+        return None
+    return (
+        status,
+        str(inv.get("Deal Id", "")).strip(),
+        clean_money(inv.get("Invoice Total", inv.get("Total Amount"))),
+        str(inv.get("Currency", "USD") or "").strip().upper(),
+        str(inv.get("Payment Date") or inv.get("Issue Date") or ""),
+        str(inv.get("Due Date") or inv.get("Issue Date") or ""),
+        str(inv.get("Issue Date", "")),
+    )
+
+
+def _deal_key(d: Dict[str, Any]) -> Optional[Hashable]:
+    status = str(d.get("Status", "")).lower().strip()
+    if "lost" in status or "cancelled" in status:
+        return None
+    return (
+        str(d.get("Deal ID", "")).strip(),
+        str(d.get("End Date", "")),
+        clean_money(d.get("Value", "0")),
+        str(d.get("Currency", "USD") or "").strip().upper(),
+    )
+
+
+def _expense_key(exp: Dict[str, Any]) -> Optional[Hashable]:
+    if str(exp.get("Status", "")).upper().strip() not in ["APPROVED", "PAID"]:
+        return None
+    amount = exp.get("Total Amount INR") or exp.get("Total Amount") or exp.get("total_amount") or "0"
+    return (
+        str(amount).replace(",", "").replace("₹", "").strip(),
+        str(exp.get("Date", exp.get("Expense Date", ""))),
+    )
+
+
+def _allocation_key(al: Dict[str, Any]) -> Optional[Hashable]:
+    if str(al.get("Status", "")).upper().strip() in ["CANCELED", "REJECTED", "DRAFT"]:
+        return None
+    return (
+        str(al.get("Associate ID", "")).strip(),
+        str(al.get("Start Date", "")).strip(),
+        str(al.get("End Date", "")).strip(),
+        str(al.get("Allocation %", "")).replace("%", ""),
+    )
+
+
+class CashflowEngine:
+    def __init__(self):
+        self._lock = threading.RLock()
+        # cell (month index, rate month or None, source currency) -> [actual/projected in/out, rows]
+        self._ledger = RowLedger(len(MEASURES))
+        self._month_cells: Dict[int, Set[Hashable]] = {}
+        self._seen: Dict[str, Any] = {}
+        self._rates: Optional[RateTable] = None
+        self._rates_source: Any = None
+        self._today: Optional[datetime] = None
+        self._payroll: Dict[str, Dict[Tuple[str, str], float]] = {}
+        self._payroll_matrix = PayrollMatrix({})
+        self._invoiced_usd: Dict[str, float] = {}
+        self._series: Dict[str, np.ndarray] = {}  # currency -> (months, measures) over self._first..self._last
+        self._first = 0
+        self._last = -1
+        self._stats = {"rebuilds": 0, "refreshes": 0, "rows_applied": 0, "months_recomputed": 0}
+
+    # --- Contributions ---
+
+    @property
+    def _today_idx(self) -> int:
+        return month_index(self._today.year, self._today.month)
+
+    def _invoice_cells(self, key) -> List[Contribution]:
+        status, _, amount_str, currency, paid_on, due_on, _ = key
+        amount = parse_amount(amount_str, 0.0)
+        if amount <= 0:
+            return []
+        if status == "paid":
+            d = sheet_date(paid_on)
+            measure = ACTUAL_IN
+        else:
+            d = sheet_date(due_on)
+            measure = PROJECTED_IN
+            if d is not None and d < self._today:
+                # Overdue invoices are expected in the current month
+                d = self._today
+        if d is None:
+            return []
+        return [((month_index(d.year, d.month), (d.year, d.month), currency), measure, amount)]
+
+    def _deal_cells(self, key) -> List[Contribution]:
+        deal_id, end_on, value_str, currency = key
+        today = self._today
+        total_usd = self._rates.convert(parse_amount(value_str, 0.0), currency, "USD", today)
+        remaining_usd = max(0, total_usd - self._invoiced_usd.get(deal_id, 0.0))
+        end_date = sheet_date(end_on)
+        if remaining_usd <= 0 or end_date is None or end_date <= today:
+            return []
+        # Spread what is left over the months up to the deal's end, at today's rates
+        months = (end_date.year - today.year) * 12 + (end_date.month - today.month) + 1
+        per_month = remaining_usd / months
+        rate_month = (today.year, today.month)
+        return [((self._today_idx + i, rate_month, "USD"), PROJECTED_IN, per_month) for i in range(months)]
+
+    def _expense_cells(self, key) -> List[Contribution]:
+        amount_str, exp_on = key
+        amount = parse_amount(amount_str, 0.0)
+        d = sheet_date(exp_on)
+        if amount <= 0 or d is None:
+            return []
+        idx = month_index(d.year, d.month)
+        measure = ACTUAL_OUT if idx <= self._today_idx else PROJECTED_OUT
+        return [((idx, (d.year, d.month), "INR"), measure, amount)]
+
+    def _allocation_cells(self, keys) -> List[List[Contribution]]:
+        # Future months without payroll yet are projected at the associate's highest salary
+        today = (self._today.year, self._today.month)
+        costs = monthly_costs(keys, self._payroll_matrix, project_after=today)
+        return [
+            [((month_index(*month), month, "INR"), PROJECTED_OUT if month > today else ACTUAL_OUT, cost)
+             for month, cost in months]
+            for months in costs
+        ]
+
+    def _invoiced_by_deal(self) -> Dict[str, float]:
+        """Deal ID -> invoiced amount in USD (at each invoice's issue-month rate)."""
+        totals: Dict[str, float] = {}
+        for key, count in self._ledger.rows("invoices").items():
+            _, deal_id, amount_str, currency, _, _, issued_on = key
+            usd = self._rates.convert(parse_amount(amount_str, 0.0), currency, "USD", issued_on)
+            totals[deal_id] = totals.get(deal_id, 0.0) + usd * count
+        return totals
+
+    # --- Building ---
+
+    def refresh(self, sources: Dict[str, List[Dict[str, Any]]], rates: RateTable, rates_source: Any = None):
+        """Bring the engine up to date with the given sheets and rates, applying only what changed.
+
+        ``rates_source`` identifies the currency records ``rates`` was built from.
+        """
+        with self._lock:
+            now = datetime.now()
+            month_changed = self._today is None or (now.year, now.month) != (self._today.year, self._today.month)
+            if not self._seen or month_changed:
+                self._rebuild(sources, rates, rates_source, now)
+                return
+
+            changed = {name for name in SOURCES if sources[name] is not self._seen.get(name)}
+            rates_changed = rates_source is None or rates_source is not self._rates_source
+            day_changed = now.date() != self._today.date()
+            if not changed and not rates_changed and not day_changed:
+                return
+            self._today = now
+            self._rates = rates
+            self._rates_source = rates_source
+            applied = 0
+
+            changed_associates: Set[str] = set()
+            if "payroll" in changed:
+                new_payroll = payroll_by_associate(sources["payroll"])
+                changed_associates = {aid for aid in set(new_payroll) | set(self._payroll)
+                                      if new_payroll.get(aid) != self._payroll.get(aid)}
+                self._payroll = new_payroll
+                self._payroll_matrix = PayrollMatrix(new_payroll)
+
+            if "invoices" in changed:
+                applied += self._ledger.sync("invoices", sources["invoices"], _invoice_key,
+                                             per_row(self._invoice_cells))
+            if "expenses" in changed:
+                applied += self._ledger.sync("expenses", sources["expenses"], _expense_key,
+                                             per_row(self._expense_cells))
+            if changed_associates:
+                applied += self._ledger.recompute("allocations", self._allocation_cells,
+                                                  lambda k: k[0] in changed_associates)
+            if "allocations" in changed:
+                applied += self._ledger.sync("allocations", sources["allocations"], _allocation_key,
+                                             self._allocation_cells)
+
+            # Deal projections net off invoiced amounts and are valued at today's rates
+            invoiced = self._invoiced_by_deal()
+            if rates_changed or day_changed:
+                stale_deals = None
+            else:
+                stale_deals = {did for did in set(invoiced) | set(self._invoiced_usd)
+                               if invoiced.get(did) != self._invoiced_usd.get(did)}
+            self._invoiced_usd = invoiced
+            if stale_deals is None or stale_deals:
+                applied += self._ledger.recompute("deals", per_row(self._deal_cells),
+                                                  lambda k: stale_deals is None or k[0] in stale_deals)
+            if "deals" in changed:
+                applied += self._ledger.sync("deals", sources["deals"], _deal_key, per_row(self._deal_cells))
+
+            self._seen = {name: sources[name] for name in SOURCES}
+            if rates_changed:
+                self._series = {}
+            self._apply_touched()
+            self._stats["refreshes"] += 1
+            self._stats["rows_applied"] += applied
+
+    def _rebuild(self, sources: Dict[str, List[Dict[str, Any]]], rates: RateTable, rates_source: Any, now: datetime):
+        self._ledger.clear()
+        self._month_cells = {}
+        self._series = {}
+        self._today = now
+        self._rates = rates
+        self._rates_source = rates_source
+        self._payroll = payroll_by_associate(sources["payroll"])
+        self._payroll_matrix = PayrollMatrix(self._payroll)
+        rows = self._ledger.sync("invoices", sources["invoices"], _invoice_key, per_row(self._invoice_cells))
+        rows += self._ledger.sync("expenses", sources["expenses"], _expense_key, per_row(self._expense_cells))
+        rows += self._ledger.sync("allocations", sources["allocations"], _allocation_key, self._allocation_cells)
+        self._invoiced_usd = self._invoiced_by_deal()
+        rows += self._ledger.sync("deals", sources["deals"], _deal_key, per_row(self._deal_cells))
+        self._seen = {name: sources[name] for name in SOURCES}
+        self._apply_touched()
+        self._stats["rebuilds"] += 1
+        logger.info(f"Cashflow engine rebuilt: {len(self._ledger.cells)} cells from {rows} rows, "
+                    f"{len(self._month_cells)} months")
+
+    def _apply_touched(self):
+        """Re-index touched cells by month and recompute those months in the cached series."""
+        dirty: Set[int] = set()
+        for cell in self._ledger.touched:
+            idx = cell[0]
+            dirty.add(idx)
+            month = self._month_cells.setdefault(idx, set())
+            if cell in self._ledger.cells:
+                month.add(cell)
+            else:
+                month.discard(cell)
+                if not month:
+                    del self._month_cells[idx]
+        self._ledger.touched = set()
+        if not dirty:
+            return
+
+        first = min(self._month_cells) if self._month_cells else 0
+        last = max(self._month_cells) if self._month_cells else -1
+        if (first, last) != (self._first, self._last):
+            # The month range moved; cached series are rebuilt on their next use
+            self._first, self._last = first, last
+            self._series = {}
+            return
+        months = sorted(i for i in dirty if first <= i <= last)
+        for currency, series in self._series.items():
+            series[[i - first for i in months]] = 0.0
+            self._fill(series, currency, months)
+        self._stats["months_recomputed"] += len(months) * len(self._series)
+
+    def _fill(self, series: np.ndarray, currency: str, months: List[int]):
+        """Add the converted cells of ``months`` into ``series``."""
+        cells = [(cell, self._ledger.cells[cell]) for i in months for cell in self._month_cells.get(i, ())]
+        if not cells:
+            return
+        rows = np.array([cell[0] - self._first for cell, _ in cells], dtype=np.intp)
+        currencies = [cell[2] for cell, _ in cells]
+        dates = [datetime(cell[1][0], cell[1][1], 1) if cell[1] else None for cell, _ in cells]
+        for m in range(len(MEASURES)):
+            converted = self._rates.convert_many([values[m] for _, values in cells], currencies, dates, currency)
+            np.add.at(series[:, m], rows, converted)
+
+    def _series_for(self, currency: str) -> np.ndarray:
+        currency = currency.upper()
+        series = self._series.get(currency)
+        if series is None:
+            series = np.zeros((max(self._last - self._first + 1, 0), len(MEASURES)))
+            self._fill(series, currency, sorted(self._month_cells))
+            self._series[currency] = series
+        return series
+
+    # --- Queries ---
+
+    def query(self, currency: str, start: Optional[YearMonth] = None, end: Optional[YearMonth] = None,
+              granularity: str = "month") -> List[Dict[str, Any]]:
+        """Cashflow per month (or quarter) in [start, end], with the running cash balance.
+
+        The balance accumulates from the first month on record, so it is the
+        same whatever range is requested.
+        """
+        with self._lock:
+            if not self._month_cells:
+                return []
+            series = self._series_for(currency).copy()
+            first = self._first
+            present = np.array([i in self._month_cells for i in range(first, self._last + 1)])
+            today_idx = self._today_idx
+
+        idx = np.arange(first, first + len(series))
+        net_actual = series[:, ACTUAL_IN] - series[:, ACTUAL_OUT]
+        net_projected = series[:, PROJECTED_IN] - series[:, PROJECTED_OUT]
+        # Past months count actuals, future months projections, the current month both
+        delta = np.where(idx < today_idx, net_actual,
+                         np.where(idx == today_idx, net_actual + net_projected, net_projected))
+        cumulative = np.cumsum(delta)
+
+        lo = month_index(*start) if start else first
+        hi = month_index(*end) if end else idx[-1]
+        selected = [i for i in range(len(idx)) if present[i] and lo <= idx[i] <= hi]
+
+        if granularity == "quarter":
+            quarters: Dict[str, Dict[str, Any]] = {}
+            for i in selected:
+                year, month = index_month(int(idx[i]))
+                key = f"{year}-Q{(month - 1) // 3 + 1}"
+                entry = quarters.get(key)
+                if entry is None:
+                    entry = quarters[key] = {"quarter_key": key, "month_key": f"{year}-{month:02d}",
+                                             **{name: 0.0 for name in MEASURES}}
+                for m, name in enumerate(MEASURES):
+                    entry[name] += float(series[i, m])
+                entry["cumulative_cash"] = float(cumulative[i])
+            return list(quarters.values())
+
+        result = []
+        for i in selected:
+            year, month = index_month(int(idx[i]))
+            entry = {"month_key": f"{year}-{month:02d}"}
+            entry.update({name: float(series[i, m]) for m, name in enumerate(MEASURES)})
+            entry["cumulative_cash"] = float(cumulative[i])
+            result.append(entry)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "cells": len(self._ledger.cells),
+                "months": len(self._month_cells),
+                "cached_currencies": sorted(self._series),
+                "as_of": self._today.date().isoformat() if self._today else None,
+            }
+
+
+cashflow_engine = CashflowEngine()
@@ -0,0 +1,212 @@
+"""
+Currency conversion against the Currency sheet.
+
+Each Currency sheet row holds, for one (Year, Month), how many units of each
+currency make one USD. ``RateTable`` turns the rows into a dense
+(year, month, currency) NumPy array plus the latest known rate per currency,
+so a conversion is an array lookup rather than a scan of every row.
+
+A conversion goes through USD: the source amount is divided by the source
+currency's rate for the date's month (or its latest rate when that month
+has none) and multiplied by the target's. Amounts in a currency with no
+rates at all are returned unchanged.
+
+A table is built once per Currency snapshot and reused until the sheet
+changes; ``convert_many`` converts whole columns of amounts in one call.
+"""
+import logging
+import threading
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import settings
+from models.common.currency import get_month_order
+from services.google_sheets import sheets_service
+
+logger = logging.getLogger(__name__)
+
+BASE_CURRENCY = "USD"
+_MONTHS = get_month_order()
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(str(value).replace(",", "").strip()) if value not in (None, "") else 0.0
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def _to_int(value: Any) -> int:
+    try:
+        return int(float(str(value).strip())) if value not in (None, "") else 0
+    except (ValueError, TypeError):
+        return 0
+
+
+@lru_cache(maxsize=4096)
+def _parse_year_month(text: str) -> Optional[Tuple[int, int]]:
+    try:
+        dt = datetime.strptime(text[:10], "%Y-%m-%d")
+    except ValueError:
+        return None
+    return dt.year, dt.month
+
+
+def year_month(date: Any) -> Optional[Tuple[int, int]]:
+    """(year, month) of a datetime/date or an ISO date string; None if there is none."""
+    if not date:
+        return None
+    if hasattr(date, "year") and hasattr(date, "month"):
+        return date.year, date.month
+    return _parse_year_month(str(date))
+
+
+class RateTable:
+    def __init__(self, records: List[Dict[str, Any]]):
+        periods: Dict[Tuple[int, int], Dict[str, float]] = {}
+        currencies: List[str] = []
+        for r in records:
+            year = _to_int(r.get("Year"))
+            month_name = str(r.get("Month", "")).strip()
+            if not year or not month_name:
+                continue
+            # Unrecognised month names still count towards the latest rate, as month 0
+            month = _MONTHS.get(month_name[:3].capitalize(), 0)
+            rates = {}
+            for key, value in r.items():
+                if key in ("Year", "Month"):
+                    continue
+                code = str(key).strip().upper()
+                rate = _to_float(value)
+                if rate:
+                    rates[code] = rate
+                if code and code not in currencies:
+                    currencies.append(code)
+            periods[(year, month)] = rates
+
+        self.currencies = currencies
+        self._codes = {c: i for i, c in enumerate(currencies)}
+        self._periods = periods
+
+        # Latest non-zero rate per currency, used when a date's month has no rate
+        self._latest: Dict[str, float] = {}
+        for (year, month) in sorted(periods):
+            self._latest.update(periods[(year, month)])
+
+        years = [y for y, _ in periods]
+        self._first_year = min(years) if years else 0
+        span = (max(years) - self._first_year + 1) if years else 0
+        self._grid = np.full((span, 13, len(currencies)), np.nan)
+        for (year, month), rates in periods.items():
+            if month:
+                for code, rate in rates.items():
+                    self._grid[year - self._first_year, month, self._codes[code]] = rate
+        self._latest_arr = np.array([self._latest.get(c, np.nan) for c in currencies], dtype=float)
+
+    def rate(self, currency: str, date: Any = None) -> Optional[float]:
+        """Units of ``currency`` per USD for the date's month, else the latest; None if unknown."""
+        code = str(currency).strip().upper()
+        if code == BASE_CURRENCY:
+            return 1.0
+        ym = year_month(date)
+        if ym:
+            period_rate = self._periods.get(ym, {}).get(code)
+            if period_rate:
+                return period_rate
+        return self._latest.get(code)
+
+    def convert(self, value: float, record_currency: str, target_currency: str = BASE_CURRENCY, date: Any = None) -> float:
+        """Convert one amount; see ``convert_many`` for columns of amounts."""
+        if not record_currency or str(record_currency).upper() == str(target_currency).upper() or value == 0:
+            return value
+        source_rate = self.rate(record_currency, date)
+        if not source_rate:
+            return value  # Cannot convert
+        usd_value = value / source_rate
+        target_rate = self.rate(target_currency, date)
+        return usd_value * target_rate if target_rate else usd_value
+
+    def _rates(self, codes: np.ndarray, years: np.ndarray, months: np.ndarray) -> np.ndarray:
+        """Per-row rate for currency codes (-1 = unknown) at (year, month) (0 = no date)."""
+        out = np.full(codes.shape, np.nan)
+        known = codes >= 0
+        if not known.any():
+            return out
+        out[known] = self._latest_arr[codes[known]]
+        rows = years - self._first_year
+        in_grid = known & (months > 0) & (rows >= 0) & (rows < self._grid.shape[0])
+        if in_grid.any():
+            period = self._grid[rows[in_grid], months[in_grid], codes[in_grid]]
+            has_period = ~np.isnan(period)
+            idx = np.flatnonzero(in_grid)[has_period]
+            out[idx] = period[has_period]
+        return out
+
+    def convert_many(self, amounts: Sequence[float], currencies: Sequence[str], dates: Sequence[Any],
+                     target: str = BASE_CURRENCY) -> np.ndarray:
+        """Convert each ``amounts[i]`` from ``currencies[i]`` to ``target`` at ``dates[i]``'s rates."""
+        values = np.asarray(amounts, dtype=float)
+        n = len(values)
+        if n == 0:
+            return values
+        target = str(target).strip().upper()
+        names = [str(c).strip().upper() if c else "" for c in currencies]
+        codes = np.array([self._codes.get(c, -1) for c in names], dtype=np.intp)
+        is_usd = np.array([c == BASE_CURRENCY for c in names])
+        passthrough = np.array([not c or c == target for c in names]) | (values == 0)
+
+        years = np.zeros(n, dtype=np.intp)
+        months = np.zeros(n, dtype=np.intp)
+        for i, d in enumerate(dates):
+            ym = year_month(d)
+            if ym:
+                years[i], months[i] = ym
+
+        source = np.where(is_usd, 1.0, self._rates(codes, years, months))
+        convertible = ~passthrough & ~np.isnan(source)
+        result = values.copy()
+        usd = values[convertible] / source[convertible]
+        if target != BASE_CURRENCY:
+            target_code = self._codes.get(target, -1)
+            target_rates = self._rates(np.full(n, target_code, dtype=np.intp), years, months)[convertible]
+            usd = np.where(np.isnan(target_rates), usd, usd * target_rates)
+        result[convertible] = usd
+        return result
+
+
+class CurrencyService:
+    def __init__(self, service):
+        self._service = service
+        self._lock = threading.Lock()
+        self._built: Optional[Tuple[List[Dict[str, Any]], RateTable]] = None
+
+    def table_for(self, records: List[Dict[str, Any]]) -> RateTable:
+        """Rate table for a Currency records list, reused while the same list is served."""
+        with self._lock:
+            if self._built is not None and self._built[0] is records:
+                return self._built[1]
+        table = RateTable(records)
+        with self._lock:
+            self._built = (records, table)
+        return table
+
+    def table(self) -> RateTable:
+        """Rate table for the current Currency sheet (an empty table if it cannot be read)."""
+        try:
+            return self.table_for(self._service.get_all_records(settings.CURRENCY_SHEET))
+        except Exception as e:
+            logger.error(f"Failed to load currency rates: {e}")
+            return RateTable([])
+
+    def convert(self, value: float, record_currency: str, target_currency: str = BASE_CURRENCY, date: Any = None) -> float:
+        return self.table().convert(value, record_currency, target_currency, date)
+
+    def convert_many(self, amounts: Sequence[float], currencies: Sequence[str], dates: Sequence[Any],
+                     target: str = BASE_CURRENCY) -> np.ndarray:
+        return self.table().convert_many(amounts, currencies, dates, target)
+
+
+currency_service = CurrencyService(sheets_service)
@@ -0,0 +1,107 @@
+"""
+Expense report index over the Expenses sheet.
+
+An expense report is stored as one Expenses row per item, sharing an
+Expense Report ID. The index groups every row under its report in a single
+pass (keeping the sheet row numbers the write paths need), and keeps
+secondary indexes by associate, project and status for the list filters,
+so a lookup no longer rescans the sheet once per report.
+
+An index is built once per snapshot: ``expense_report_index(records)``
+reuses the index of the records list it was last built from, and the cache
+hands out the same list until the sheet actually changes.
+"""
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from models.hrms.expense_report import ExpenseReport, rows_to_report
+
+
+class ReportEntry:
+    __slots__ = ("report_id", "rows", "_report")
+
+    def __init__(self, report_id: Any):
+        self.report_id = report_id
+        self.rows: List[Tuple[int, Dict[str, Any]]] = []  # (sheet row number, record)
+        self._report: Optional[ExpenseReport] = None
+
+    @property
+    def first(self) -> Dict[str, Any]:
+        return self.rows[0][1]
+
+    @property
+    def row_numbers(self) -> List[int]:
+        return [row_number for row_number, _ in self.rows]
+
+    def report(self) -> ExpenseReport:
+        """The report model with its items, total and date range (built on first use)."""
+        if self._report is None:
+            self._report = rows_to_report(self.report_id, [record for _, record in self.rows])
+        return self._report
+
+    @property
+    def total(self) -> float:
+        return self.report().total_amount
+
+
+class ExpenseReportIndex:
+    def __init__(self, records: List[Dict[str, Any]]):
+        self._reports: Dict[Any, ReportEntry] = {}
+        self._by_associate: Dict[str, Set[Any]] = {}
+        self._by_project: Dict[str, Set[Any]] = {}
+        self._by_status: Dict[str, Set[Any]] = {}
+        # Rows (with or without a report) by their own Project ID, for the summary
+        self._rows_by_project: Dict[Any, List[Dict[str, Any]]] = {}
+
+        for pos, r in enumerate(records):
+            self._rows_by_project.setdefault(r.get("Project ID"), []).append(r)
+            report_id = r.get("Expense Report ID")
+            if not report_id:
+                continue
+            entry = self._reports.get(report_id)
+            if entry is None:
+                entry = self._reports[report_id] = ReportEntry(report_id)
+                # Report header fields come from its first row
+                self._by_associate.setdefault(str(r.get("Associate ID", "")), set()).add(report_id)
+                self._by_project.setdefault(str(r.get("Project ID", "")), set()).add(report_id)
+                self._by_status.setdefault(str(r.get("Status", "DRAFT")), set()).add(report_id)
+            entry.rows.append((pos + 2, r))  # 1-indexed, +1 for header
+
+        self.size = len(records)
+
+    def get(self, report_id: str) -> Optional[ReportEntry]:
+        return self._reports.get(report_id)
+
+    def reports(self, associate_id: Optional[str] = None, project_id: Optional[str] = None,
+                status: Optional[str] = None) -> List[ExpenseReport]:
+        """Reports matching every given filter, most recent (highest ID) first."""
+        selected: Optional[Set[Any]] = None
+        for ids, value in ((self._by_associate, associate_id), (self._by_project, project_id),
+                           (self._by_status, status)):
+            if value:
+                matches = ids.get(value, set())
+                selected = matches if selected is None else selected & matches
+        entries = self._reports.values() if selected is None else [self._reports[rid] for rid in selected]
+        reports = [entry.report() for entry in entries]
+        reports.sort(key=lambda x: x.expense_report_id, reverse=True)
+        return reports
+
+    def rows_for_project(self, project_id: Any) -> List[Dict[str, Any]]:
+        """Expense rows whose own Project ID is ``project_id``, in sheet order."""
+        return self._rows_by_project.get(project_id, [])
+
+
+_lock = threading.Lock()
+_built: Optional[Tuple[List[Dict[str, Any]], ExpenseReportIndex]] = None
+
+
+def expense_report_index(records: List[Dict[str, Any]]) -> ExpenseReportIndex:
+    """Index for an Expenses records list, reused while the same list is served."""
+    global _built
+    with _lock:
+        if _built is not None and _built[0] is records:
+            return _built[1]
+    index = ExpenseReportIndex(records)
+    with _lock:
+        _built = (records, index)
+    return index
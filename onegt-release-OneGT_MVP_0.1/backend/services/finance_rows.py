@@ -0,0 +1,164 @@
+"""
+Row parsing and incremental aggregation shared by the finance views.
+
+``RowLedger`` holds aggregated cell values built from sheet rows. Each row
+is reduced to a fingerprint of the fields its contribution depends on, so
+re-syncing a sheet only applies rows that were added, removed or edited,
+and rows whose outside inputs changed (payroll, project->deal mapping) can
+be recomputed selectively.
+"""
+import re
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from utils.date_utils import parse_date_from_sheet
+
+# (cell, measure index, amount)
+Contribution = Tuple[Hashable, int, float]
+# Fingerprints -> contributions of each, so a batch of rows can be computed together
+CellsFn = Callable[[List[Hashable]], List[List[Contribution]]]
+
+
+def parse_amount(value: Any, default: float = 0.0) -> float:
+    """Parse a sheet amount, ignoring currency symbols, commas and other non-numeric characters."""
+    try:
+        if value is None or value == "":
+            return default
+        if isinstance(value, (int, float)):
+            return float(value)
+        cleaned = re.sub(r'[^\d.-]', '', str(value))
+        return float(cleaned) if cleaned else default
+    except (ValueError, TypeError):
+        return default
+
+
+def clean_money(value: Any) -> str:
+    """Strip thousands separators and $/₹ from a money cell (empty -> "0")."""
+    return str(value or "0").replace(",", "").replace("$", "").replace("₹", "").strip()
+
+
+def payroll_by_associate(payroll: List[Dict[str, Any]]) -> Dict[str, Dict[Tuple[str, str], float]]:
+    """Associate ID -> {(year, month name or abbreviation): earnings}, falling back to Net Pay."""
+    result: Dict[str, Dict[Tuple[str, str], float]] = {}
+    for row in payroll:
+        aid = str(row.get("Employee Code") or row.get("Associate ID") or "").strip()
+        year = str(row.get("Year") or row.get("Payroll Year") or "").strip()
+        month = str(row.get("Month") or row.get("Payroll Month") or "").strip()
+        earnings_str = str(row.get("Earnings", "0")).replace(",", "").replace("₹", "").strip()
+        if not parse_amount(earnings_str, 0):
+            earnings_str = str(row.get("Net Pay", "0")).replace(",", "").replace("₹", "").strip()
+        earnings = parse_amount(earnings_str, 0.0)
+        if aid and year and month:
+            months = result.setdefault(aid, {})
+            months[(year, month[:3].capitalize())] = earnings
+            months[(year, month.capitalize())] = earnings
+    return result
+
+
+def monthly_salary(payroll: Dict[Tuple[str, str], float], when: datetime) -> Optional[float]:
+    """Payroll earnings of one associate for the month of ``when`` (None if there is no row)."""
+    year_str = str(when.year)
+    return payroll.get((year_str, when.strftime("%B"))) or payroll.get((year_str, when.strftime("%b")))
+
+
+def parse_allocation_dates(start_str: str, end_str: str) -> Optional[Tuple[datetime, datetime]]:
+    """Start and end of an allocation, or None if either is missing, unparseable or reversed."""
+    if not start_str or not end_str:
+        return None
+    try:
+        start = datetime.strptime(parse_date_from_sheet(start_str), "%Y-%m-%d")
+        end = datetime.strptime(parse_date_from_sheet(end_str), "%Y-%m-%d")
+    except ValueError:
+        return None
+    return (start, end) if end >= start else None
+
+
+def parse_month(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Parse a "YYYY-MM" filter into (year, month); ValueError if malformed."""
+    if not value:
+        return None
+    dt = datetime.strptime(value, "%Y-%m")
+    return dt.year, dt.month
+
+
+def sheet_date(value: Any) -> Optional[datetime]:
+    """Parse a sheet date the way the finance views do (None if empty or unparseable)."""
+    iso = parse_date_from_sheet(str(value or ""))
+    try:
+        return datetime.strptime(iso, "%Y-%m-%d") if iso else None
+    except ValueError:
+        return None
+
+
+def per_row(cells_fn: Callable[[Hashable], List[Contribution]]) -> CellsFn:
+    """Adapt a one-fingerprint contributions function to the batch form ``RowLedger`` takes."""
+    return lambda keys: [cells_fn(key) for key in keys]
+
+
+class RowLedger:
+    def __init__(self, measures: int):
+        self.measures = measures
+        self.cells: Dict[Hashable, List[float]] = {}  # cell -> [measure values..., contributing rows]
+        self.touched: Set[Hashable] = set()  # cells changed since the caller last cleared this
+        self._rows: Dict[str, Dict[Hashable, List[Any]]] = {}  # source -> fingerprint -> [row count, contributions]
+
+    def clear(self):
+        self.cells = {}
+        self.touched = set()
+        self._rows = {}
+
+    def _apply(self, contributions: List[Contribution], times: int):
+        count = self.measures
+        for cell, measure, amount in contributions:
+            values = self.cells.get(cell)
+            if values is None:
+                values = self.cells[cell] = [0.0] * count + [0]
+            values[measure] += amount * times
+            values[count] += times
+            if values[count] <= 0:
+                del self.cells[cell]
+            self.touched.add(cell)
+
+    def sync(self, source: str, records: List[Dict[str, Any]], key_fn: Callable[[Dict[str, Any]], Optional[Hashable]],
+             cells_fn: CellsFn) -> int:
+        """Apply the rows of ``records`` that differ from the last sync; returns rows applied.
+
+        ``key_fn`` returns a row's fingerprint (None to ignore the row) and
+        ``cells_fn`` the contributions of a list of fingerprints.
+        """
+        rows = self._rows.setdefault(source, {})
+        counts = Counter(k for k in (key_fn(r) for r in records) if k is not None)
+        new_keys = [key for key in counts if key not in rows]
+        for key, contributions in zip(new_keys, cells_fn(new_keys) if new_keys else []):
+            rows[key] = [0, contributions]
+        applied = 0
+        for key in set(rows) | set(counts):
+            entry = rows[key]
+            old = entry[0]
+            new = counts.get(key, 0)
+            if old == new:
+                continue
+            self._apply(entry[1], new - old)
+            entry[0] = new
+            if new == 0:
+                del rows[key]
+            applied += abs(new - old)
+        return applied
+
+    def recompute(self, source: str, cells_fn: CellsFn, match: Callable[[Hashable], bool]) -> int:
+        """Recompute the rows of ``source`` whose inputs outside the row changed."""
+        rows = self._rows.get(source, {})
+        keys = [key for key in rows if match(key)]
+        applied = 0
+        for key, contributions in zip(keys, cells_fn(keys) if keys else []):
+            entry = rows[key]
+            self._apply(entry[1], -entry[0])
+            entry[1] = contributions
+            self._apply(entry[1], entry[0])
+            applied += entry[0]
+        return applied
+
+    def rows(self, source: str) -> Dict[Hashable, int]:
+        """Fingerprint -> row count of a source."""
+        return {key: entry[0] for key, entry in self._rows.get(source, {}).items()}
@@ -1,27 +1,97 @@
 import gspread
+from gspread.utils import rowcol_to_a1
 from google.oauth2.service_account import Credentials
-from cachetools import TTLCache
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from config import settings
 import os
 import logging
 import traceback
-import queue
 import threading
 import time
+import weakref
 from utils.logging_utils import trace_exceptions
+from services.sheet_cache import SheetCache
+from services.shared_cache import open_shared_tier
+from services.cache_bus import APPEND, DELETE, RESET, UPDATE, CacheEvent, cache_bus
+from services.sheet_snapshot import SheetSnapshot
+from services.sheets_client_pool import ClientPool
+from services.sheet_write_buffer import WriteBuffer
+from services.sheet_sync import SheetSyncEngine
 
 # Configure logger
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
-# Cache for sheet data (TTL: 60 seconds)
-cache = TTLCache(maxsize=100, ttl=60)
+# Cache for sheet snapshots (records + ID indexes): fresh for SHEETS_CACHE_TTL_SECONDS, then served stale while refreshing in the background
+cache = SheetCache(
+    ttl=settings.SHEETS_CACHE_TTL_SECONDS,
+    max_stale=settings.SHEETS_CACHE_MAX_STALE_SECONDS,
+    maxsize=100,
+    # Shared with the other workers on this host when SHARED_CACHE_PATH is set
+    shared=open_shared_tier("sheets")
+)
+
+# Incremental refresh of cached snapshots (Drive modifiedTime check, tail-only fetch of appends)
+sync_engine = SheetSyncEngine(verify_seconds=settings.SHEETS_SYNC_VERIFY_SECONDS)
+
+
+def _sheet_of(cache_key: str) -> Optional[Tuple[str, str]]:
+    """(spreadsheet ID, sheet name) behind a snapshot cache key."""
+    if cache_key.startswith("crms_records_"):
+        return settings.CRMS_SPREADSHEET_ID, cache_key[len("crms_records_"):]
+    if cache_key.startswith("records_"):
+        return settings.SPREADSHEET_ID, cache_key[len("records_"):]
+    return None
+
+
+def _on_remote_change(event: CacheEvent):
+    """Expire the snapshot of a sheet that a worker on another host wrote to.
+
+    The old snapshot stays as the base of the reload, so an append costs a
+    tail fetch; other changes get a full, hash-verified fetch.
+    """
+    keys = cache.keys() if event.key is None else [event.key]
+    for key in keys:
+        sheet = _sheet_of(str(key))
+        if sheet is not None:
+            sync_engine.mark_changed(*sheet, in_place=event.op != APPEND)
+        cache.expire(key)
+
+
+cache_bus.subscribe("sheets", _on_remote_change)
+
+
+class _LeasedHandle:
+    """A worksheet or spreadsheet whose API calls each run on a client leased for the call.
+
+    gspread objects are bound to the client (and requests session) that opened
+    them, so the service keeps them per client and this handle looks up the one
+    belonging to whichever client the pool hands out.
+    """
+
+    def __init__(self, service: "GoogleSheetsService", key: Tuple[str, ...]):
+        self._service = service
+        self._key = key
+        # Resolve now so a missing sheet raises here, as it did before
+        with service._pool.lease() as client:
+            self._type = type(service._open(client, key))
+
+    def __getattr__(self, name: str):
+        if not callable(getattr(self._type, name, None)):
+            with self._service._pool.lease() as client:
+                return getattr(self._service._open(client, self._key), name)
+
+        def call(*args, **kwargs):
+            with self._service._pool.lease() as client:
+                return getattr(self._service._open(client, self._key), name)(*args, **kwargs)
+        return call
+
 
 class GoogleSheetsService:
     _instance = None
     _pool = None
-    _worksheets = {}  # Cache: (spreadsheet_id, sheet_name) -> Worksheet
+    # Client -> {(spreadsheet_id,) or (spreadsheet_id, sheet_name): Spreadsheet or Worksheet opened with it}
+    _opened: "weakref.WeakKeyDictionary[Any, Dict[Tuple[str, ...], Any]]" = weakref.WeakKeyDictionary()
     _lock = threading.Lock()
     
     def __new__(cls):
@@ -30,66 +100,75 @@ class GoogleSheetsService:
             cls._instance._initialize_pool()
         return cls._instance
     
-    def _initialize_pool(self, pool_size: int = 5):
-        """Initialize a pool of authorized gspread clients (lazy — no pre-warming)."""
-        self._pool = queue.Queue(maxsize=pool_size)
-        logger.info(f"Initialized Google Sheets client pool (lazy) with max size {pool_size}")
+    def _initialize_pool(self):
+        """Initialize the pool of authorized gspread clients, warming SHEETS_CLIENT_POOL_WARMUP of them."""
+        self._credentials = None
+        self._pool = ClientPool(
+            self._create_client,
+            size=settings.SHEETS_CLIENT_POOL_SIZE,
+            warmup=settings.SHEETS_CLIENT_POOL_WARMUP,
+            lease_timeout=settings.SHEETS_CLIENT_LEASE_TIMEOUT_SECONDS
+        )
+        self._write_buffer = WriteBuffer(
+            self._write_batch,
+            max_batch=settings.SHEETS_WRITE_BATCH_SIZE,
+            interval=settings.SHEETS_WRITE_FLUSH_SECONDS
+        )
+
+    def _get_credentials(self):
+        """Load service-account (or default) credentials once and share them across clients."""
+        with self._lock:
+            if self._credentials is not None:
+                return self._credentials
+        
+        scopes = [
+            'https://www.googleapis.com/auth/spreadsheets',
+            'https://www.googleapis.com/auth/drive'
+        ]
+        
+        creds_path = settings.GOOGLE_CREDENTIALS_FILE
+        
+        if creds_path and os.path.exists(creds_path):
+            credentials = Credentials.from_service_account_file(creds_path, scopes=scopes)
+        else:
+            from google.auth import default
+            credentials, project = default(scopes=scopes)
+        
+        with self._lock:
+            self._credentials = credentials
+        return credentials
 
     def _create_client(self):
-        """Create a single authorized gspread client."""
+        """Create a single authorized gspread client (its own keep-alive session, shared credentials)."""
         try:
-            scopes = [
-                'https://www.googleapis.com/auth/spreadsheets',
-                'https://www.googleapis.com/auth/drive'
-            ]
-            
-            creds_path = settings.GOOGLE_CREDENTIALS_FILE
-            
-            if creds_path and os.path.exists(creds_path):
-                from google.oauth2.service_account import Credentials
-                credentials = Credentials.from_service_account_file(creds_path, scopes=scopes)
-            else:
-                from google.auth import default
-                credentials, project = default(scopes=scopes)
-            
-            return gspread.authorize(credentials)
+            return gspread.authorize(self._get_credentials())
         except Exception as e:
             logger.error(f"Failed to create Google Sheets client: {e}")
             return None
 
-    def _get_client(self):
-        """Lease a client from the pool."""
-        try:
-            return self._pool.get(timeout=10)
-        except queue.Empty:
-            logger.warning("Client pool empty, creating a temporary client")
-            return self._create_client()
+    def _open(self, client, key: Tuple[str, ...]):
+        """The spreadsheet or worksheet behind ``key`` as opened with ``client`` (cached per client)."""
+        if client is None:
+            raise ConnectionError("No Google Sheets client available")
+        with self._lock:
+            opened = self._opened.setdefault(client, {})
+            if key in opened:
+                return opened[key]
+        if len(key) == 1:
+            obj = client.open_by_key(key[0])
+        else:
+            obj = self._open(client, key[:1]).worksheet(key[1])
+        with self._lock:
+            opened[key] = obj
+        return obj
 
-    def _release_client(self, client):
-        """Return a client to the pool."""
-        if client:
-            try:
-                self._pool.put_nowait(client)
-            except queue.Full:
-                pass # Already full, discard
+    def _get_worksheet(self, spreadsheet_id: str, sheet_name: str) -> _LeasedHandle:
+        """Get a worksheet handle (raises WorksheetNotFound if the sheet does not exist)."""
+        return _LeasedHandle(self, (spreadsheet_id, sheet_name))
 
-    def _get_worksheet(self, spreadsheet_id: str, sheet_name: str):
-        """Get a worksheet object, using cache if available."""
-        key = (spreadsheet_id, sheet_name)
-        
-        with self._lock:
-            if key in self._worksheets:
-                return self._worksheets[key]
-        
-        client = self._get_client()
-        try:
-            ss = client.open_by_key(spreadsheet_id)
-            ws = ss.worksheet(sheet_name)
-            with self._lock:
-                self._worksheets[key] = ws
-            return ws
-        finally:
-            self._release_client(client)
+    def _get_spreadsheet(self, spreadsheet_id: str) -> _LeasedHandle:
+        """Get a spreadsheet handle."""
+        return _LeasedHandle(self, (spreadsheet_id,))
 
     def get_sheet(self, sheet_name: str):
         """Get a worksheet by name from HRMS spreadsheet."""
@@ -103,126 +182,165 @@ class GoogleSheetsService:
             raise ValueError("CRMS Spreadsheet ID not configured")
         return self._get_worksheet(settings.CRMS_SPREADSHEET_ID, sheet_name)
     
+    def _load_snapshot(self, worksheet_getter, sheet_name: str) -> SheetSnapshot:
+        return SheetSnapshot.from_rows(worksheet_getter(sheet_name).get_all_values())
+    
+    def _refresh_snapshot(self, spreadsheet_id: str, cache_key: str, worksheet_getter, sheet_name: str) -> SheetSnapshot:
+        """Load a snapshot, incrementally from the cached one when delta sync is enabled."""
+        worksheet = worksheet_getter(sheet_name)
+        if not settings.SHEETS_DELTA_SYNC:
+            return SheetSnapshot.from_rows(worksheet.get_all_values())
+        return sync_engine.load(
+            self._get_spreadsheet(spreadsheet_id), sheet_name, cache.get(cache_key), worksheet.get_all_values
+        )
+    
+    def get_snapshot(self, sheet_name: str) -> SheetSnapshot:
+        """Get the cached snapshot (records + ID indexes) of a sheet."""
+        cache_key = f"records_{sheet_name}"
+        return cache.get_or_load(
+            cache_key, lambda: self._refresh_snapshot(settings.SPREADSHEET_ID, cache_key, self.get_sheet, sheet_name)
+        )
+    
+    def get_crms_snapshot(self, sheet_name: str) -> SheetSnapshot:
+        """Get the cached snapshot (records + ID indexes) of a CRMS sheet."""
+        cache_key = f"crms_records_{sheet_name}"
+        return cache.get_or_load(
+            cache_key, lambda: self._refresh_snapshot(settings.CRMS_SPREADSHEET_ID, cache_key, self.get_crms_sheet, sheet_name)
+        )
+    
     def get_all_records(self, sheet_name: str, use_cache: bool = True) -> List[Dict[str, Any]]:
         """Get all records from a sheet as list of dictionaries. Robust to empty headers."""
-        cache_key = f"records_{sheet_name}"
-        
-        if use_cache and cache_key in cache:
-            return cache[cache_key]
-        
-        sheet = self.get_sheet(sheet_name)
+        # Resolving the worksheet raises (configuration, missing sheet, auth); only a
+        # failed read of its values is reported as an empty sheet
+        self.get_sheet(sheet_name)
         try:
-            rows = sheet.get_all_values()
-        except Exception:
-            return []
-            
-        if not rows:
+            if not use_cache:
+                return self._load_snapshot(self.get_sheet, sheet_name).records
+            return self.get_snapshot(sheet_name).records
+        except Exception as e:
+            logger.error(f"Error fetching records from {sheet_name}: {e}")
             return []
-            
-        # First row is headers - strip whitespace and newlines
-        headers = [str(h).strip() for h in rows[0]]
-        
-        # Map indices to non-empty headers
-        header_map = {i: h for i, h in enumerate(headers) if h}
-        
-        records = []
-        for row in rows[1:]:
-            record = {}
-            for i, header in header_map.items():
-                val = row[i] if i < len(row) else ""
-                record[header] = val
-            records.append(record)
-        
-        if use_cache:
-            cache[cache_key] = records
-        
-        return records
     
     def get_crms_all_records(self, sheet_name: str, use_cache: bool = True) -> List[Dict[str, Any]]:
         """Get all records from a CRMS sheet as list of dictionaries."""
-        cache_key = f"crms_records_{sheet_name}"
-        
-        if use_cache and cache_key in cache:
-            return cache[cache_key]
-        
-        sheet = self.get_crms_sheet(sheet_name)
+        self.get_crms_sheet(sheet_name)
         try:
-            rows = sheet.get_all_values()
+            if not use_cache:
+                return self._load_snapshot(self.get_crms_sheet, sheet_name).records
+            return self.get_crms_snapshot(sheet_name).records
         except Exception as e:
             logger.error(f"Error fetching CRMS records from {sheet_name}: {e}")
             logger.error(traceback.format_exc())
             return []
-            
-        if not rows:
-            return []
-            
-        headers = [str(h).strip() for h in rows[0]]
-        header_map = {i: h for i, h in enumerate(headers) if h}
-        
-        records = []
-        for row in rows[1:]:
-            record = {}
-            for i, header in header_map.items():
-                val = row[i] if i < len(row) else ""
-                record[header] = val
-            records.append(record)
+    
+    def _batch_load_snapshots(self, spreadsheet_id: str, sheet_names: List[str]) -> Dict[str, SheetSnapshot]:
+        """Fetch several sheets of one spreadsheet with a single values.batchGet call."""
+        ss = self._get_spreadsheet(spreadsheet_id)
+        ranges = ["'" + name.replace("'", "''") + "'" for name in sheet_names]
+        response = ss.values_batch_get(ranges)
+        value_ranges = response.get("valueRanges", [])
+        if len(value_ranges) != len(sheet_names):
+            raise ValueError(f"batchGet returned {len(value_ranges)} ranges for {len(sheet_names)} sheets")
+        snapshots = {}
+        for name, vr in zip(sheet_names, value_ranges):
+            rows = vr.get("values", [])
+            sync_engine.prime(spreadsheet_id, name, rows)
+            snapshots[name] = SheetSnapshot.from_rows(rows)
+        return snapshots
+    
+    def _get_many(self, spreadsheet_id: str, key_prefix: str, sheet_names: List[str], get_one, worksheet_getter) -> Dict[str, List[Dict[str, Any]]]:
+        keys = {f"{key_prefix}{name}": name for name in sheet_names}
         
-        if use_cache:
-            cache[cache_key] = records
+        def load(missing_keys):
+            # Sheets refreshed from a cached snapshot sync incrementally; cold ones share one batchGet
+            loaded = {}
+            if settings.SHEETS_DELTA_SYNC:
+                for k in missing_keys:
+                    if cache.get(k) is not None:
+                        loaded[k] = self._refresh_snapshot(spreadsheet_id, k, worksheet_getter, keys[k])
+            cold = [k for k in missing_keys if k not in loaded]
+            if cold:
+                snapshots = self._batch_load_snapshots(spreadsheet_id, [keys[k] for k in cold])
+                loaded.update({k: snapshots[keys[k]] for k in cold})
+            return loaded
         
-        return records
+        try:
+            snapshots = cache.get_many_or_load(list(keys), load)
+        except Exception as e:
+            # One bad range fails the whole batch; fall back to per-sheet reads,
+            # which keep their usual error handling
+            logger.warning(f"Batched fetch of {sheet_names} failed, reading sheets one by one: {e}")
+            return {name: get_one(name) for name in sheet_names}
+        return {name: snapshots[key].records for key, name in keys.items()}
+    
+    def get_many_records(self, sheet_names: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Get records for several sheets, fetching all uncached ones in one batchGet call."""
+        if not settings.SPREADSHEET_ID:
+            raise ValueError("Spreadsheet ID not configured")
+        return self._get_many(settings.SPREADSHEET_ID, "records_", sheet_names, self.get_all_records, self.get_sheet)
+    
+    def get_crms_many_records(self, sheet_names: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Get records for several CRMS sheets, fetching all uncached ones in one batchGet call."""
+        if not settings.CRMS_SPREADSHEET_ID:
+            raise ValueError("CRMS Spreadsheet ID not configured")
+        return self._get_many(settings.CRMS_SPREADSHEET_ID, "crms_records_", sheet_names, self.get_crms_all_records, self.get_crms_sheet)
     
     def get_all_values(self, sheet_name: str) -> List[List[str]]:
         """Get all values from a sheet as 2D list."""
         sheet = self.get_sheet(sheet_name)
         return sheet.get_all_values()
     
+    def get_crms_all_values(self, sheet_name: str) -> List[List[str]]:
+        """Get all values from a CRMS sheet as 2D list."""
+        sheet = self.get_crms_sheet(sheet_name)
+        return sheet.get_all_values()
+    
     def get_row_by_id(self, sheet_name: str, id_column: str, id_value: str) -> Optional[Dict[str, Any]]:
-        """Get a single row by ID."""
-        records = self.get_all_records(sheet_name)
+        """Get a single row by ID (hash index lookup on the cached snapshot)."""
+        self.get_sheet(sheet_name)
+        try:
+            return self.get_snapshot(sheet_name).get(id_column, id_value)
+        except Exception as e:
+            logger.error(f"Error fetching records from {sheet_name}: {e}")
+            return None
+    
+    def _locate_row(self, spreadsheet_id: str, cache_key: str, worksheet_getter, snapshot: SheetSnapshot,
+                    sheet_name: str, id_column: str, id_value: str) -> Optional[int]:
+        """Row of an ID for a write: looked up on the cached snapshot, confirmed on the sheet.
+
+        The snapshot can be minutes old and miss rows inserted, deleted or sorted
+        in Sheets, and a write to a row that has moved would hit another record.
+        The ID cell at the resolved row is read back (one small read); if it no
+        longer holds the ID, or the snapshot does not know the ID, the sheet is
+        refetched and the cached snapshot replaced.
+        """
+        worksheet = worksheet_getter(sheet_name)
         search_val = str(id_value).strip()
-        for record in records:
-            if str(record.get(id_column, "")).strip() == search_val:
-                return record
-        return None
+        row = snapshot.row_number(id_column, id_value)
+        if row is not None:
+            col = snapshot.headers.index(id_column) + 1
+            if str(worksheet.cell(row, col).value or "").strip() == search_val:
+                return row
+            logger.info(f"{sheet_name} row {row} no longer holds {id_column}={search_val}, refetching the sheet")
+        rows = worksheet.get_all_values()
+        fresh = SheetSnapshot.from_rows(rows)
+        sync_engine.prime(spreadsheet_id, sheet_name, rows)
+        cache.set(cache_key, fresh)
+        return fresh.row_number(id_column, id_value)
     
     def find_row_index(self, sheet_name: str, id_column: str, id_value: str) -> Optional[int]:
-        """Find the row index (1-based) for a given ID."""
-        # Use get_all_records (cached and robust) to find the record
-        # BUT we need the exact index, and cache might be stale or filtered?
-        # Actually, get_all_records returns cleaner data. 
-        # If we use get_all_values, it matches the robust logic.
-        sheet = self.get_sheet(sheet_name)
-        rows = sheet.get_all_values()
-        
-        if not rows:
-             return None
-             
-        # Identify the column index for the ID
-        headers = [str(h).strip() for h in rows[0]]
-        try:
-            col_idx = headers.index(id_column)
-        except ValueError:
-            return None # Column not found
-            
-        search_val = str(id_value).strip()
-        
-        # Iterate rows (skip header)
-        for idx, row in enumerate(rows[1:]):
-            val = str(row[col_idx]).strip() if col_idx < len(row) else ""
-            if val == search_val:
-                return idx + 2  # +2 because row 1 is header, and index is 0-based
-        return None
+        """Find the row index (1-based) for a given ID, confirmed against the sheet (see _locate_row)."""
+        return self._locate_row(settings.SPREADSHEET_ID, f"records_{sheet_name}", self.get_sheet,
+                                self.get_snapshot(sheet_name), sheet_name, id_column, id_value)
     
     def append_row(self, sheet_name: str, values: List[Any]) -> Dict[str, Any]:
         """Append a new row to the sheet."""
         sheet = self.get_sheet(sheet_name)
         sheet.append_row(values, value_input_option='USER_ENTERED')
         
-        # Invalidate cache
-        cache_key = f"records_{sheet_name}"
-        if cache_key in cache:
-            del cache[cache_key]
+        # Apply to cached snapshot and its indexes
+        cache.update(f"records_{sheet_name}", lambda snap: snap.with_appended([values]))
+        cache_bus.publish("sheets", f"records_{sheet_name}", APPEND)
         
         return {"success": True, "message": "Row added successfully"}
     
@@ -239,10 +357,9 @@ class GoogleSheetsService:
         cell_range = f"A{row_index}:{end_col}{row_index}"
         sheet.update(cell_range, [values], value_input_option='USER_ENTERED')
         
-        # Invalidate cache
-        cache_key = f"records_{sheet_name}"
-        if cache_key in cache:
-            del cache[cache_key]
+        # Apply to cached snapshot and its indexes
+        cache.update(f"records_{sheet_name}", lambda snap: snap.with_updated(row_index, values))
+        cache_bus.publish("sheets", f"records_{sheet_name}", UPDATE, (row_index, row_index))
         
         return {"success": True, "message": "Row updated successfully"}
     
@@ -251,10 +368,9 @@ class GoogleSheetsService:
         sheet = self.get_sheet(sheet_name)
         sheet.delete_rows(row_index)
         
-        # Invalidate cache
-        cache_key = f"records_{sheet_name}"
-        if cache_key in cache:
-            del cache[cache_key]
+        # Apply to cached snapshot and its indexes
+        cache.update(f"records_{sheet_name}", lambda snap: snap.with_deleted(row_index))
+        cache_bus.publish("sheets", f"records_{sheet_name}", DELETE, (row_index, row_index))
         
         return {"success": True, "message": "Row deleted successfully"}
     
@@ -265,8 +381,8 @@ class GoogleSheetsService:
         
         # Invalidate cache
         cache_key = f"records_{sheet_name}"
-        if cache_key in cache:
-            del cache[cache_key]
+        cache.invalidate(cache_key)
+        cache_bus.publish("sheets", cache_key, RESET)
         
         return {"success": True, "message": "Sheet cleared successfully"}
     
@@ -277,8 +393,8 @@ class GoogleSheetsService:
         
         # Invalidate cache
         cache_key = f"records_{sheet_name}"
-        if cache_key in cache:
-            del cache[cache_key]
+        cache.invalidate(cache_key)
+        cache_bus.publish("sheets", cache_key, RESET)
         
         return {"success": True, "message": "Values updated successfully"}
     
@@ -286,10 +402,128 @@ class GoogleSheetsService:
         """Clear cache for a specific sheet or all sheets."""
         if sheet_name:
             cache_key = f"records_{sheet_name}"
-            if cache_key in cache:
-                del cache[cache_key]
+            cache.invalidate(cache_key)
+            cache_bus.publish("sheets", cache_key, RESET)
         else:
             cache.clear()
+            cache_bus.publish("sheets", None, RESET)
+    
+    def update_cells(self, sheet_name: str, cells: List[Tuple[int, int, Any]]) -> Dict[str, Any]:
+        """Update many single cells (row, col, value; 1-based) with one batch_update call."""
+        if not cells:
+            return {"success": True, "message": "No cells to update", "updated": 0}
+        sheet = self.get_sheet(sheet_name)
+        sheet.batch_update(
+            [{"range": rowcol_to_a1(row, col), "values": [[value]]} for row, col, value in cells],
+            value_input_option='USER_ENTERED'
+        )
+        
+        def apply_cells(snap):
+            for row, col, value in cells:
+                snap = snap.with_cell(row, col, value)
+            return snap
+        
+        # Apply to cached snapshot and its indexes
+        cache.update(f"records_{sheet_name}", apply_cells)
+        rows = [row for row, _, _ in cells]
+        cache_bus.publish("sheets", f"records_{sheet_name}", UPDATE, (min(rows), max(rows)))
+        
+        return {"success": True, "message": f"Updated {len(cells)} cells", "updated": len(cells)}
+    
+    # --- Write-behind batching ---
+    
+    def _write_batch(self, target, rows: List[List[Any]], updates: Dict[int, List[Any]]) -> Dict[str, Any]:
+        """Write one batch for a (scope, sheet): updates in one batch_update, appends in one append_rows."""
+        scope, sheet_name = target
+        if scope == "crms":
+            sheet = self.get_crms_sheet(sheet_name)
+            cache_key = f"crms_records_{sheet_name}"
+        else:
+            sheet = self.get_sheet(sheet_name)
+            cache_key = f"records_{sheet_name}"
+        
+        result = {"success": True, "sheet": sheet_name, "appended": 0, "updated": 0}
+        if updates:
+            sheet.batch_update(
+                [
+                    {"range": f"A{row_index}:{rowcol_to_a1(row_index, max(len(values), 1))}", "values": [values]}
+                    for row_index, values in updates.items()
+                ],
+                value_input_option='USER_ENTERED'
+            )
+            
+            def apply_updates(snap):
+                for row_index, values in updates.items():
+                    snap = snap.with_updated(row_index, values)
+                return snap
+            
+            cache.update(cache_key, apply_updates)
+            cache_bus.publish("sheets", cache_key, UPDATE, (min(updates), max(updates)))
+            result["updated"] = len(updates)
+        if rows:
+            response = sheet.append_rows(rows, value_input_option='USER_ENTERED')
+            cache.update(cache_key, lambda snap: snap.with_appended(rows))
+            cache_bus.publish("sheets", cache_key, APPEND)
+            result["appended"] = len(rows)
+            result["updated_range"] = (response or {}).get("updates", {}).get("updatedRange")
+        return result
+    
+    def queue_append(self, sheet_name: str, values: List[Any]):
+        """Queue a row append for the next batched write. Returns a Future with the batch result."""
+        return self._write_buffer.append(("hrms", sheet_name), values)
+    
+    def queue_crms_append(self, sheet_name: str, values: List[Any]):
+        """Queue a row append to a CRMS sheet for the next batched write."""
+        return self._write_buffer.append(("crms", sheet_name), values)
+    
+    def queue_update(self, sheet_name: str, row_index: int, values: List[Any]):
+        """Queue a row update (1-based) for the next batched write. Returns a Future with the batch result."""
+        return self._write_buffer.update(("hrms", sheet_name), row_index, values)
+    
+    def queue_crms_update(self, sheet_name: str, row_index: int, values: List[Any]):
+        """Queue a row update (1-based) to a CRMS sheet for the next batched write."""
+        return self._write_buffer.update(("crms", sheet_name), row_index, values)
+    
+    def flush_writes(self, sheet_name: Optional[str] = None, crms: bool = False) -> List[Dict[str, Any]]:
+        """Write queued mutations now (one sheet, or everything) and return the batch results."""
+        if sheet_name is None:
+            return self._write_buffer.flush()
+        return self._write_buffer.flush(("crms" if crms else "hrms", sheet_name))
+    
+    def _append_rows(self, sheet_name: str, rows: List[List[Any]], crms: bool) -> Dict[str, Any]:
+        queue_fn = self.queue_crms_append if crms else self.queue_append
+        futures = [queue_fn(sheet_name, values) for values in rows]
+        self.flush_writes(sheet_name, crms=crms)
+        batches = []
+        for future in futures:
+            result = future.result()  # Raises if the batch holding this row failed
+            if not any(result is b for b in batches):
+                batches.append(result)
+        return {"success": True, "message": f"Added {len(rows)} rows", "rows": len(rows), "batches": batches}
+    
+    def append_rows(self, sheet_name: str, rows: List[List[Any]]) -> Dict[str, Any]:
+        """Append many rows through the write buffer (one API call per batch)."""
+        return self._append_rows(sheet_name, rows, crms=False)
+    
+    def crms_append_rows(self, sheet_name: str, rows: List[List[Any]]) -> Dict[str, Any]:
+        """Append many rows to a CRMS sheet through the write buffer."""
+        return self._append_rows(sheet_name, rows, crms=True)
+    
+    def write_stats(self) -> Dict[str, Any]:
+        """Counters of the write-behind buffer."""
+        return self._write_buffer.stats()
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss/refresh counters of the sheet cache."""
+        return cache.stats()
+    
+    def sync_stats(self) -> Dict[str, Any]:
+        """Counters of the incremental sync engine (skipped / tail-only / full refreshes)."""
+        return sync_engine.stats()
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Size, wait-time and lease-duration gauges of the client pool."""
+        return self._pool.stats()
     
     def create_sheet_if_not_exists(self, sheet_name: str, headers: List[str]) -> bool:
         """Create a new sheet with headers if it doesn't exist."""
@@ -297,14 +531,11 @@ class GoogleSheetsService:
             self.get_sheet(sheet_name)
             return False  # Sheet already exists
         except gspread.exceptions.WorksheetNotFound:
-            client = self._get_client()
-            try:
-                ss = client.open_by_key(settings.SPREADSHEET_ID)
+            with self._pool.lease() as client:
+                ss = self._open(client, (settings.SPREADSHEET_ID,))
                 worksheet = ss.add_worksheet(title=sheet_name, rows=1000, cols=len(headers))
                 worksheet.append_row(headers)
                 return True
-            finally:
-                self._release_client(client)
         return False
     
     def get_headers(self, sheet_name: str) -> List[str]:
@@ -318,10 +549,9 @@ class GoogleSheetsService:
         sheet = self.get_sheet(sheet_name)
         sheet.update_cell(row, col, value)
         
-        # Invalidate cache
-        cache_key = f"records_{sheet_name}"
-        if cache_key in cache:
-            del cache[cache_key]
+        # Apply to cached snapshot and its indexes
+        cache.update(f"records_{sheet_name}", lambda snap: snap.with_cell(row, col, value))
+        cache_bus.publish("sheets", f"records_{sheet_name}", UPDATE, (row, row))
         
         return {"success": True, "message": "Cell updated successfully"}
     
@@ -333,10 +563,9 @@ class GoogleSheetsService:
             sheet = self.get_crms_sheet(sheet_name)
             sheet.append_row(values, value_input_option='USER_ENTERED')
             
-            # Invalidate cache
-            cache_key = f"crms_records_{sheet_name}"
-            if cache_key in cache:
-                del cache[cache_key]
+            # Apply to cached snapshot and its indexes
+            cache.update(f"crms_records_{sheet_name}", lambda snap: snap.with_appended([values]))
+            cache_bus.publish("sheets", f"crms_records_{sheet_name}", APPEND)
             
             return {"success": True, "message": "Row added successfully"}
         except Exception as e:
@@ -349,25 +578,8 @@ class GoogleSheetsService:
         """Find the row index (1-based) for a given ID in CRMS sheet."""
         try:
             logger.debug(f"crms_find_row_index: sheet={sheet_name}, column={id_column}, value={id_value}")
-            sheet = self.get_crms_sheet(sheet_name)
-            rows = sheet.get_all_values()
-            
-            if not rows:
-                return None
-                
-            headers = [str(h).strip() for h in rows[0]]
-            try:
-                col_idx = headers.index(id_column)
-            except ValueError:
-                return None
-                
-            search_val = str(id_value).strip()
-            
-            for idx, row in enumerate(rows[1:]):
-                val = str(row[col_idx]).strip() if col_idx < len(row) else ""
-                if val == search_val:
-                    return idx + 2
-            return None
+            return self._locate_row(settings.CRMS_SPREADSHEET_ID, f"crms_records_{sheet_name}", self.get_crms_sheet,
+                                    self.get_crms_snapshot(sheet_name), sheet_name, id_column, id_value)
         except Exception as e:
             logger.error(f"Error in crms_find_row_index: {str(e)}")
             logger.error(f"Stack trace:\n{traceback.format_exc()}")
@@ -388,10 +600,9 @@ class GoogleSheetsService:
             cell_range = f"A{row_index}:{end_col}{row_index}"
             sheet.update(cell_range, [values], value_input_option='USER_ENTERED')
             
-            # Invalidate cache
-            cache_key = f"crms_records_{sheet_name}"
-            if cache_key in cache:
-                del cache[cache_key]
+            # Apply to cached snapshot and its indexes
+            cache.update(f"crms_records_{sheet_name}", lambda snap: snap.with_updated(row_index, values))
+            cache_bus.publish("sheets", f"crms_records_{sheet_name}", UPDATE, (row_index, row_index))
             
             return {"success": True, "message": "Row updated successfully"}
         except Exception as e:
@@ -407,10 +618,9 @@ class GoogleSheetsService:
             sheet = self.get_crms_sheet(sheet_name)
             sheet.delete_rows(row_index)
             
-            # Invalidate cache
-            cache_key = f"crms_records_{sheet_name}"
-            if cache_key in cache:
-                del cache[cache_key]
+            # Apply to cached snapshot and its indexes
+            cache.update(f"crms_records_{sheet_name}", lambda snap: snap.with_deleted(row_index))
+            cache_bus.publish("sheets", f"crms_records_{sheet_name}", DELETE, (row_index, row_index))
             
             return {"success": True, "message": "Row deleted successfully"}
         except Exception as e:
@@ -419,14 +629,29 @@ class GoogleSheetsService:
             raise
     
     def crms_get_row_by_id(self, sheet_name: str, id_column: str, id_value: str) -> Optional[Dict[str, Any]]:
-        """Get a single row by ID from CRMS sheet."""
-        records = self.get_crms_all_records(sheet_name)
-        search_val = str(id_value).strip()
-        for record in records:
-            if str(record.get(id_column, "")).strip() == search_val:
-                return record
-        return None
+        """Get a single row by ID from CRMS sheet (hash index lookup on the cached snapshot)."""
+        self.get_crms_sheet(sheet_name)
+        try:
+            return self.get_crms_snapshot(sheet_name).get(id_column, id_value)
+        except Exception as e:
+            logger.error(f"Error fetching CRMS records from {sheet_name}: {e}")
+            return None
+
+
+def _build_sheets_service():
+    """Pick the storage backend configured by SHEETS_BACKEND (google | mirror | local)."""
+    backend = settings.SHEETS_BACKEND.strip().lower()
+    if backend in ("mirror", "local"):
+        from services.sql_sheets import SqlSheetsService
+        upstream = GoogleSheetsService() if backend == "mirror" else None
+        logger.info(f"Using SQL sheet mirror ({backend}) at {settings.SHEETS_MIRROR_URL}")
+        return SqlSheetsService(
+            settings.SHEETS_MIRROR_URL,
+            upstream=upstream,
+            sync_seconds=settings.SHEETS_MIRROR_SYNC_SECONDS
+        )
+    return GoogleSheetsService()
 
 
 # Singleton instance
-sheets_service = GoogleSheetsService()
+sheets_service = _build_sheets_service()
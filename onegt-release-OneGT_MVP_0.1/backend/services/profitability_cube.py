@@ -0,0 +1,332 @@
+"""
+Materialized profitability cube for the CRMS finance view.
+
+Income (invoices), salary cost (prorated allocations x payroll) and other
+expenses are kept pre-aggregated per (deal, month, source currency) cell, so
+the profitability endpoint is a lookup: filter the cells, convert each one
+with that month's rates and sum per deal. Conversion only depends on the
+month, so converting aggregated cells gives the same totals as converting
+every row.
+
+Each source row contributes a fixed set of cell amounts. Rows are tracked by
+a fingerprint of the fields they are computed from, so when a sheet changes
+only added/removed/edited rows are applied, and a changed payroll or
+project->deal mapping recomputes just the allocations and expenses of the
+affected associates and projects. ``rebuild`` recomputes everything from
+scratch and reports how long it took.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+from config import settings
+from services.allocation_cost import PayrollMatrix, monthly_costs
+from services.currency_service import RateTable, year_month
+from services.finance_rows import Contribution, RowLedger, clean_money, parse_amount, payroll_by_associate, per_row
+from services.google_sheets import sheets_service
+
+logger = logging.getLogger(__name__)
+
+INCOME, SALARY, OTHER = 0, 1, 2
+
+YearMonth = Tuple[int, int]
+Cell = Tuple[str, Optional[YearMonth], str]  # (deal id, month or None if undated, source currency)
+
+SOURCES = ("deals", "customers", "projects", "invoices", "expenses", "allocations", "payroll")
+
+
+def project_deal_map(projects: List[Dict[str, Any]], deals: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Project ID -> Deal ID, by the project's Deal ID or else a (Customer ID, value) match."""
+    deals_by_cust_val = {}
+    for d in deals:
+        c_id = str(d.get("Customer ID", "")).strip()
+        val_str = clean_money(d.get("Value", ""))
+        if c_id and val_str:
+            val = parse_amount(val_str)
+            if val > 0:
+                deals_by_cust_val[f"{c_id}_{val}"] = str(d.get("Deal ID", "")).strip()
+
+    mapping = {}
+    for p in projects:
+        pid = str(p.get("Project ID", "")).strip()
+        if not pid:
+            continue
+        did = str(p.get("Deal ID", "")).strip()
+        if did:
+            mapping[pid] = did
+            continue
+        c_id = str(p.get("Customer ID", "")).strip()
+        sow_val = clean_money(p.get("SOW Value", "0"))
+        if c_id and sow_val:
+            val = parse_amount(sow_val)
+            key = f"{c_id}_{val}"
+            if val > 0 and key in deals_by_cust_val:
+                mapping[pid] = deals_by_cust_val[key]
+    return mapping
+
+
+# --- Row fingerprints and contributions ---
+
+def _invoice_key(inv: Dict[str, Any]) -> Optional[Hashable]:
+    if str(inv.get("Status", "")).lower().strip() == "cancelled":
+        return None
+    return (
+        str(inv.get("Deal Id", "")).strip(),
+        clean_money(inv.get("Invoice Total", inv.get("Total Amount"))),
+        str(inv.get("Currency", "USD") or "").strip().upper(),
+        str(inv.get("Issue Date", "")),
+    )
+
+
+def _expense_key(exp: Dict[str, Any]) -> Optional[Hashable]:
+    if str(exp.get("Status", "")).upper().strip() not in ["APPROVED", "PAID", "SUBMITTED"]:
+        return None
+    amount = exp.get("Total Amount INR") or exp.get("Total Amount") or exp.get("total_amount") or "0"
+    return (
+        str(exp.get("Project ID", "")).strip(),
+        str(amount).replace(",", "").replace("₹", "").strip(),
+        str(exp.get("Date", exp.get("Expense Date", ""))),
+    )
+
+
+def _allocation_key(al: Dict[str, Any]) -> Optional[Hashable]:
+    if str(al.get("Status", "")).upper().strip() in ["CANCELED", "REJECTED", "DRAFT"]:
+        return None
+    return (
+        str(al.get("Project ID", "")).strip(),
+        str(al.get("Associate ID", "")).strip(),
+        str(al.get("Start Date", "")).strip(),
+        str(al.get("End Date", "")).strip(),
+        str(al.get("Allocation %", "")).replace("%", ""),
+    )
+
+
+class ProfitabilityCube:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._ledger = RowLedger(3)  # cell -> [income, salary, other, contributing rows]
+        self._seen: Dict[str, Any] = {}  # source -> records list last applied
+        self._deal_map: Dict[str, str] = {}
+        self._payroll: Dict[str, Dict[Tuple[str, str], float]] = {}
+        self._payroll_matrix = PayrollMatrix({})
+        self._names: Dict[str, Any] = {"deals": [], "customers": {}, "projects": {}}
+        self._stats = {
+            "rebuilds": 0,
+            "last_rebuild_ms": 0.0,
+            "last_rebuild_at": None,
+            "incremental_refreshes": 0,
+            "rows_applied": 0,
+            "last_refresh_ms": 0.0,
+        }
+
+    # --- Contributions ---
+
+    def _invoice_cells(self, key) -> List[Contribution]:
+        deal_id, amount_str, currency, issue_date = key
+        amount = parse_amount(amount_str, 0.0)
+        return [((deal_id, year_month(issue_date), currency), INCOME, amount)] if amount else []
+
+    def _expense_cells(self, key) -> List[Contribution]:
+        pid, amount_str, exp_date = key
+        amount = parse_amount(amount_str, 0.0)
+        deal_id = self._deal_map.get(pid) or pid
+        return [((deal_id, year_month(exp_date), "INR"), OTHER, amount)] if amount else []
+
+    def _allocation_cells(self, keys) -> List[List[Contribution]]:
+        costs = monthly_costs([key[1:] for key in keys], self._payroll_matrix)
+        cells = []
+        for key, months in zip(keys, costs):
+            deal_id = self._deal_map.get(key[0]) or key[0]
+            cells.append([((deal_id, month, "INR"), SALARY, cost) for month, cost in months if cost])
+        return cells
+
+    # --- Building ---
+
+    def rebuild(self, sources: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Recompute the whole cube from the source sheets; returns a timing report."""
+        start = time.perf_counter()
+        with self._lock:
+            self._ledger.clear()
+            self._seen = {}
+            self._deal_map = project_deal_map(sources["projects"], sources["deals"])
+            self._payroll = payroll_by_associate(sources["payroll"])
+            self._payroll_matrix = PayrollMatrix(self._payroll)
+            rows = self._ledger.sync("invoices", sources["invoices"], _invoice_key, per_row(self._invoice_cells))
+            rows += self._ledger.sync("expenses", sources["expenses"], _expense_key, per_row(self._expense_cells))
+            rows += self._ledger.sync("allocations", sources["allocations"], _allocation_key, self._allocation_cells)
+            self._seen = {name: sources[name] for name in SOURCES}
+            self._names = self._build_names(sources)
+            duration_ms = round((time.perf_counter() - start) * 1000, 2)
+            self._stats["rebuilds"] += 1
+            self._stats["last_rebuild_ms"] = duration_ms
+            self._stats["last_rebuild_at"] = datetime.now().isoformat(timespec="seconds")
+            report = {"cells": len(self._ledger.cells), "rows": rows, "duration_ms": duration_ms}
+        logger.info(f"Profitability cube rebuilt: {report['cells']} cells from {rows} rows in {duration_ms} ms")
+        return report
+
+    def refresh(self, sources: Dict[str, List[Dict[str, Any]]]):
+        """Bring the cube up to date with the given sheets, applying only what changed."""
+        with self._lock:
+            if not self._seen:
+                self.rebuild(sources)
+                return
+            changed = {name for name in SOURCES if sources[name] is not self._seen.get(name)}
+            if not changed:
+                return
+            start = time.perf_counter()
+            applied = 0
+
+            changed_projects: Set[str] = set()
+            if changed & {"projects", "deals"}:
+                new_map = project_deal_map(sources["projects"], sources["deals"])
+                changed_projects = {pid for pid in set(new_map) | set(self._deal_map)
+                                    if new_map.get(pid) != self._deal_map.get(pid)}
+                self._deal_map = new_map
+            changed_associates: Set[str] = set()
+            if "payroll" in changed:
+                new_payroll = payroll_by_associate(sources["payroll"])
+                changed_associates = {aid for aid in set(new_payroll) | set(self._payroll)
+                                      if new_payroll.get(aid) != self._payroll.get(aid)}
+                self._payroll = new_payroll
+                self._payroll_matrix = PayrollMatrix(new_payroll)
+
+            if "invoices" in changed:
+                applied += self._ledger.sync("invoices", sources["invoices"], _invoice_key,
+                                             per_row(self._invoice_cells))
+            if changed_projects:
+                applied += self._ledger.recompute("expenses", per_row(self._expense_cells),
+                                                  lambda k: k[0] in changed_projects)
+            if "expenses" in changed:
+                applied += self._ledger.sync("expenses", sources["expenses"], _expense_key,
+                                             per_row(self._expense_cells))
+            if changed_projects or changed_associates:
+                applied += self._ledger.recompute(
+                    "allocations", self._allocation_cells,
+                    lambda k: k[0] in changed_projects or k[1] in changed_associates
+                )
+            if "allocations" in changed:
+                applied += self._ledger.sync("allocations", sources["allocations"], _allocation_key, self._allocation_cells)
+
+            self._seen = {name: sources[name] for name in SOURCES}
+            if changed & {"deals", "customers", "projects"}:
+                self._names = self._build_names(sources)
+            self._stats["incremental_refreshes"] += 1
+            self._stats["rows_applied"] += applied
+            self._stats["last_refresh_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    @staticmethod
+    def _build_names(sources: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        return {
+            "deals": [(str(d.get("Deal ID", "")).strip(), d.get("Deal Name", ""), str(d.get("Customer ID", "")).strip())
+                      for d in sources["deals"]],
+            "customers": {str(c.get("Customer ID", "")).strip(): c.get("Customer Name", "") for c in sources["customers"]},
+            "projects": {str(p.get("Project ID", "")).strip(): p for p in sources["projects"]
+                         if str(p.get("Project ID", "")).strip()},
+        }
+
+    # --- Queries ---
+
+    def totals(self, rates: RateTable, currency: str, start: Optional[YearMonth] = None,
+               end: Optional[YearMonth] = None) -> Dict[str, List[float]]:
+        """Deal ID -> [income, salary, other] in ``currency``, for months in [start, end] if given."""
+        with self._lock:
+            cells = [
+                (cell, values[:3]) for cell, values in self._ledger.cells.items()
+                if (start is None and end is None) or (
+                    cell[1] is not None and (start is None or cell[1] >= start) and (end is None or cell[1] <= end)
+                )
+            ]
+        currencies = [cell[2] for cell, _ in cells]
+        dates = [datetime(cell[1][0], cell[1][1], 1) if cell[1] else None for cell, _ in cells]
+        converted = [
+            rates.convert_many([values[m] for _, values in cells], currencies, dates, currency).tolist()
+            for m in (INCOME, SALARY, OTHER)
+        ]
+        totals: Dict[str, List[float]] = {}
+        for i, (cell, _) in enumerate(cells):
+            deal = totals.setdefault(cell[0], [0.0, 0.0, 0.0])
+            for m in (INCOME, SALARY, OTHER):
+                deal[m] += converted[m][i]
+        return totals
+
+    def lookup(self, rates: RateTable, currency: str, start: Optional[YearMonth] = None,
+               end: Optional[YearMonth] = None) -> List[Dict[str, Any]]:
+        """Profitability rows per deal, then per unmapped project (internal/investment)."""
+        totals = self.totals(rates, currency, start, end)
+        with self._lock:
+            names = self._names
+
+        def row(key, name, cust_id, customer_name):
+            income, salary_exp, other_exp = totals.get(key, (0.0, 0.0, 0.0))
+            if income == 0 and salary_exp == 0 and other_exp == 0:
+                return None
+            net_profit = income - salary_exp - other_exp
+            return {
+                "deal_id": key,
+                "deal_name": name,
+                "customer_id": cust_id,
+                "customer_name": customer_name,
+                "income": income,
+                "salary_expense": salary_exp,
+                "other_expense": other_exp,
+                "net_profit": net_profit,
+                "margin_percentage": (net_profit / income * 100) if income > 0 else 0.0
+            }
+
+        profitability = []
+        processed_deal_ids = set()
+        for deal_id, name, cust_id in names["deals"]:
+            if deal_id:
+                processed_deal_ids.add(deal_id)
+            entry = row(deal_id, name, cust_id, names["customers"].get(cust_id, "Unknown Customer"))
+            if entry:
+                profitability.append(entry)
+
+        # Projects with costs or income that map to no deal (e.g. internal/investment projects)
+        for key in sorted(set(totals) - processed_deal_ids):
+            if not key:
+                continue
+            p = names["projects"].get(key, {})
+            cust_id = str(p.get("Customer ID", "")).strip()
+            entry = row(key, p.get("Project Name", key) + " (Investment/Internal)", cust_id,
+                        names["customers"].get(cust_id, "Internal" if not cust_id else "Unknown Customer"))
+            if entry:
+                profitability.append(entry)
+        return profitability
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "cells": len(self._ledger.cells), "built": bool(self._seen)}
+
+
+profitability_cube = ProfitabilityCube()
+
+
+def load_sources() -> Dict[str, List[Dict[str, Any]]]:
+    """Fetch the sheets the cube is built from (one batchGet per spreadsheet)."""
+    crms = sheets_service.get_crms_many_records([
+        settings.CRMS_DEALS_SHEET, settings.CRMS_CUSTOMERS_SHEET, settings.CRMS_INVOICES_SHEET
+    ])
+    hrms = sheets_service.get_many_records([
+        settings.PAYROLL_SHEET, settings.PROJECTS_SHEET, settings.ALLOCATIONS_SHEET, settings.EXPENSES_SHEET
+    ])
+    return {
+        "deals": crms[settings.CRMS_DEALS_SHEET],
+        "customers": crms[settings.CRMS_CUSTOMERS_SHEET],
+        "invoices": crms[settings.CRMS_INVOICES_SHEET],
+        "payroll": hrms[settings.PAYROLL_SHEET],
+        "projects": hrms[settings.PROJECTS_SHEET],
+        "allocations": hrms[settings.ALLOCATIONS_SHEET],
+        "expenses": hrms[settings.EXPENSES_SHEET],
+    }
+
+
+def rebuild_profitability_cube() -> Dict[str, Any]:
+    """Cold-rebuild job: fetch the source sheets and rebuild the cube, timing both steps."""
+    start = time.perf_counter()
+    sources = load_sources()
+    fetch_ms = round((time.perf_counter() - start) * 1000, 2)
+    report = profitability_cube.rebuild(sources)
+    return {**report, "fetch_ms": fetch_ms, "total_ms": round((time.perf_counter() - start) * 1000, 2)}
@@ -0,0 +1,209 @@
+"""
+Sequence allocator for business IDs (GTLD00001, GTINV000001, 100001, ...).
+
+Each ID family is a named sequence holding its high-water mark. Handing out
+the next number is one atomic increment instead of a scan of every record
+for the highest suffix. Sequences live in a small SQL table (SQLite or
+PostgreSQL) so that several workers share them and never hand out the same
+number; with no store configured they are kept in process memory.
+
+The first time a process uses a sequence it reseeds it from one scan of the
+sheet (the stored mark is raised to the sheet's highest number, never
+lowered), so restarts and rows added outside the application are picked up.
+IDs created without the allocator (a caller-supplied ID or invoice number)
+are reported with ``observe`` so the mark stays ahead of them.
+
+A seed must raise when the sheet cannot be read (see ``seed_records``): a
+failed scan that looked like an empty sheet would leave a fresh store
+handing out numbers that are already taken. A sequence counts as seeded
+only after a scan succeeded, so the next allocation retries it.
+"""
+import logging
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from config import settings
+from services.sheet_snapshot import SheetSnapshot
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """CREATE TABLE IF NOT EXISTS id_sequences (
+    name TEXT PRIMARY KEY,
+    value BIGINT NOT NULL
+)"""
+
+
+def max_suffix(values: Iterable[Any], prefix: str, digits: Optional[int] = None) -> int:
+    """Highest integer suffix of the values starting with ``prefix`` (0 if there is none).
+
+    With ``digits`` only that many characters after the prefix are read, and
+    values too short to hold them are skipped.
+    """
+    highest = 0
+    for value in values:
+        text = str(value)
+        if not text.startswith(prefix):
+            continue
+        suffix = text[len(prefix):]
+        if digits is not None:
+            if len(suffix) < digits:
+                continue
+            suffix = suffix[:digits]
+        try:
+            highest = max(highest, int(suffix))
+        except ValueError:
+            continue
+    return highest
+
+
+def seed_records(values: List[List[Any]]) -> List[Dict[str, Any]]:
+    """Records of a sheet read for seeding, from ``get_all_values``/``get_crms_all_values``.
+
+    Those reads raise on failure, where ``get_all_records`` reports an empty sheet.
+    """
+    return SheetSnapshot.from_rows(values).records
+
+
+class _MemoryStore:
+    """Process-local high-water marks."""
+
+    def __init__(self):
+        self._values: Dict[str, int] = {}
+
+    def raise_to(self, name: str, value: int):
+        self._values[name] = max(self._values.get(name, 0), value)
+
+    def increment(self, name: str) -> int:
+        self._values[name] = self._values.get(name, 0) + 1
+        return self._values[name]
+
+    def get(self, name: str) -> int:
+        return self._values.get(name, 0)
+
+
+class _SqlStore:
+    """High-water marks in an ``id_sequences`` table; each change is one atomic statement."""
+
+    def __init__(self, url: str):
+        self._url = url
+        self._disconnect_errors: tuple = ()
+        if url.startswith("postgres"):
+            import psycopg2
+            self._disconnect_errors = (psycopg2.OperationalError, psycopg2.InterfaceError)
+            self._placeholder = "%s"
+            self._greatest = "GREATEST"
+        else:
+            self._placeholder = "?"
+            self._greatest = "MAX"
+        self._conn = self._connect()
+        self._execute(SCHEMA)
+
+    def _connect(self):
+        if self._url.startswith("postgres"):
+            import psycopg2
+            return psycopg2.connect(self._url)
+        path = self._url.split("sqlite:///", 1)[-1] or ":memory:"
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _run(self, statement: str, params: tuple) -> list:
+        with self._conn:
+            cur = self._conn.cursor()
+            cur.execute(statement, params)
+            return cur.fetchall() if cur.description else []
+
+    def _execute(self, statement: str, params: tuple = ()) -> list:
+        statement = statement if self._placeholder == "?" else statement.replace("?", self._placeholder)
+        if getattr(self._conn, "closed", 0):
+            self._conn = self._connect()
+        try:
+            return self._run(statement, params)
+        except self._disconnect_errors as e:
+            # A dropped PostgreSQL connection: reconnect once and retry. An increment
+            # lost with the connection only leaves a gap, never a duplicate
+            logger.warning(f"ID sequence store connection lost, reconnecting: {e}")
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = self._connect()
+            return self._run(statement, params)
+
+    def raise_to(self, name: str, value: int):
+        self._execute(
+            "INSERT INTO id_sequences (name, value) VALUES (?, ?) ON CONFLICT (name) "
+            f"DO UPDATE SET value = {self._greatest}(id_sequences.value, excluded.value)",
+            (name, value)
+        )
+
+    def increment(self, name: str) -> int:
+        rows = self._execute("UPDATE id_sequences SET value = value + 1 WHERE name = ? RETURNING value", (name,))
+        if not rows:
+            self.raise_to(name, 0)
+            rows = self._execute("UPDATE id_sequences SET value = value + 1 WHERE name = ? RETURNING value", (name,))
+        return int(rows[0][0])
+
+    def get(self, name: str) -> int:
+        rows = self._execute("SELECT value FROM id_sequences WHERE name = ?", (name,))
+        return int(rows[0][0]) if rows else 0
+
+
+class SequenceAllocator:
+    def __init__(self, url: str = ""):
+        self._url = url
+        self._store = None
+        self._lock = threading.Lock()
+        self._seeded: Set[str] = set()
+
+    def _get_store(self):
+        if self._store is None:
+            if self._url:
+                try:
+                    self._store = _SqlStore(self._url)
+                    logger.info(f"ID sequences stored at {self._url}")
+                except Exception as e:
+                    logger.error(f"Failed to open ID sequence store {self._url}, using process memory: {e}")
+                    self._store = _MemoryStore()
+            else:
+                self._store = _MemoryStore()
+        return self._store
+
+    def _ensure_seeded(self, name: str, seed: Callable[[], int]):
+        """Raise the mark to the sheet's highest number, once per sequence per process.
+
+        If ``seed`` raises, the sequence stays unseeded and the error propagates.
+        """
+        with self._lock:
+            if name in self._seeded:
+                return
+        # The scan runs outside the lock; seeding twice is harmless since marks only go up
+        highest = seed()
+        with self._lock:
+            self._get_store().raise_to(name, highest)
+            self._seeded.add(name)
+
+    def allocate(self, name: str, seed: Callable[[], int]) -> int:
+        """Reserve and return the next number of sequence ``name``.
+
+        ``seed`` returns the highest number currently used in the sheet, and
+        raises if the sheet cannot be read.
+        """
+        self._ensure_seeded(name, seed)
+        with self._lock:
+            return self._get_store().increment(name)
+
+    def peek(self, name: str, seed: Callable[[], int]) -> int:
+        """The number ``allocate`` would return next, without reserving it."""
+        self._ensure_seeded(name, seed)
+        with self._lock:
+            return self._get_store().get(name) + 1
+
+    def observe(self, name: str, value: int):
+        """Record that ``value`` was used without being allocated (e.g. entered by hand)."""
+        with self._lock:
+            self._get_store().raise_to(name, value)
+
+
+sequence_allocator = SequenceAllocator(settings.ID_SEQUENCES_URL)
@@ -0,0 +1,258 @@
+"""
+Shared cache tier for running several workers on one host.
+
+Each worker process keeps its own in-memory caches. With
+``SHARED_CACHE_PATH`` set, they also share a SQLite file (WAL mode, memory
+mapped), which gives them three things:
+
+* Values loaded by one worker are published to the file, and the other
+  workers adopt them instead of fetching again. N workers then cost about
+  the same Google quota as one.
+* A load lease per key: when several workers miss the same key at once, one
+  loads it and the others wait for its result.
+* An invalidation log: a write or invalidation in one worker is appended to
+  it, and every other worker drops its local copy on its next read.
+
+Every key carries a version that is bumped on invalidation. A load that
+started before an invalidation is not published, so a stale value cannot
+overwrite a newer write. The tier covers one host only. Workers on several
+hosts each need their own file, or an external cache.
+"""
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS shared_cache_entries (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        loaded_at REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS shared_cache_versions (
+        key TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS shared_cache_leases (
+        key TEXT PRIMARY KEY,
+        holder TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS shared_cache_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        namespace TEXT NOT NULL,
+        key TEXT,
+        origin TEXT NOT NULL,
+        at REAL NOT NULL
+    )""",
+]
+
+# Invalidation events older than this are trimmed; workers poll far more often
+EVENT_RETENTION_SECONDS = 3600
+
+
+class SharedCacheTier:
+    """One namespace (e.g. "sheets") of the shared cache file.
+
+    Keys are strings. ``key=None`` in an invalidation means the whole namespace.
+    """
+
+    def __init__(self, path: str, namespace: str, lease_seconds: float = 30):
+        self.path = path
+        self.namespace = namespace
+        self.lease_seconds = lease_seconds
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA mmap_size=268435456")
+        for statement in SCHEMA:
+            self._conn.execute(statement)
+        self._cursor = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM shared_cache_events").fetchone()[0]
+        self._published = 0
+        self._stats = {"hits": 0, "published": 0, "stale_skipped": 0, "invalidations_sent": 0,
+                       "invalidations_received": 0, "lease_waits": 0, "lease_timeouts": 0}
+
+    def _key(self, key: Optional[str]) -> str:
+        return f"{self.namespace}:{'' if key is None else key}"
+
+    def _namespace_range(self) -> Tuple[str, str]:
+        """Bounds of every stored key in this namespace ("ns:" up to "ns;")."""
+        return f"{self.namespace}:", f"{self.namespace};"
+
+    def _count(self, name: str, amount: int = 1):
+        self._stats[name] += amount
+
+    # --- Values ---
+
+    def version(self, key: str) -> Tuple[int, int]:
+        """(namespace version, key version); a load publishes only if this is unchanged."""
+        with self._lock:
+            rows = dict(self._conn.execute(
+                "SELECT key, version FROM shared_cache_versions WHERE key IN (?, ?)",
+                (self._key(None), self._key(key))
+            ).fetchall())
+        return rows.get(self._key(None), 0), rows.get(self._key(key), 0)
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """(value, wall-clock load time) of a published entry, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, loaded_at FROM shared_cache_entries WHERE key = ?", (self._key(key),)
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            value = pickle.loads(row[0])
+        except Exception as e:
+            logger.warning(f"Dropping unreadable shared cache entry {key}: {e}")
+            self.invalidate(key)
+            return None
+        with self._lock:
+            self._count("hits")
+        return value, row[1]
+
+    def put(self, key: str, value: Any, loaded_at: float, version: Optional[Tuple[int, int]] = None) -> bool:
+        """Publish a loaded value; skipped if ``version`` shows an invalidation since the load began."""
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.debug(f"Not publishing {key} to the shared cache: {e}")
+            return False
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if version is not None:
+                    rows = dict(self._conn.execute(
+                        "SELECT key, version FROM shared_cache_versions WHERE key IN (?, ?)",
+                        (self._key(None), self._key(key))
+                    ).fetchall())
+                    if (rows.get(self._key(None), 0), rows.get(self._key(key), 0)) != version:
+                        self._conn.execute("COMMIT")
+                        self._count("stale_skipped")
+                        return False
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO shared_cache_entries (key, value, loaded_at) VALUES (?, ?, ?)",
+                    (self._key(key), blob, loaded_at)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._count("published")
+        return True
+
+    def invalidate(self, key: Optional[str] = None):
+        """Drop ``key`` (or the whole namespace) here and in every other worker."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO shared_cache_versions (key, version) VALUES (?, 1) "
+                    "ON CONFLICT (key) DO UPDATE SET version = version + 1",
+                    (self._key(key),)
+                )
+                if key is None:
+                    self._conn.execute("DELETE FROM shared_cache_entries WHERE key >= ? AND key < ?",
+                                       self._namespace_range())
+                else:
+                    self._conn.execute("DELETE FROM shared_cache_entries WHERE key = ?", (self._key(key),))
+                self._conn.execute(
+                    "INSERT INTO shared_cache_events (namespace, key, origin, at) VALUES (?, ?, ?, ?)",
+                    (self.namespace, key, self.origin, now)
+                )
+                self._published += 1
+                if self._published % 256 == 0:
+                    self._conn.execute("DELETE FROM shared_cache_events WHERE at < ?", (now - EVENT_RETENTION_SECONDS,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._count("invalidations_sent")
+
+    def poll(self) -> List[Optional[str]]:
+        """Keys invalidated by other workers since the last poll (None = everything)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, namespace, key, origin FROM shared_cache_events WHERE id > ? ORDER BY id", (self._cursor,)
+            ).fetchall()
+            if not rows:
+                return []
+            self._cursor = rows[-1][0]
+            keys = [key for _, namespace, key, origin in rows if namespace == self.namespace and origin != self.origin]
+            self._count("invalidations_received", len(keys))
+        return keys
+
+    # --- Load leases ---
+
+    def acquire(self, key: str) -> bool:
+        """Take the load lease of ``key`` unless another live worker holds it."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM shared_cache_leases WHERE key = ? AND expires_at < ?",
+                                   (self._key(key), now))
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO shared_cache_leases (key, holder, expires_at) VALUES (?, ?, ?)",
+                    (self._key(key), self.origin, now + self.lease_seconds)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return cur.rowcount == 1
+
+    def release(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM shared_cache_leases WHERE key = ? AND holder = ?",
+                               (self._key(key), self.origin))
+
+    def wait_for(self, keys: List[str], since: float) -> Dict[str, Tuple[Any, float]]:
+        """Wait (up to the lease time) for other workers to publish ``keys`` loaded after ``since``."""
+        found: Dict[str, Tuple[Any, float]] = {}
+        deadline = time.monotonic() + self.lease_seconds
+        with self._lock:
+            self._count("lease_waits", len(keys))
+        while len(found) < len(keys) and time.monotonic() < deadline:
+            time.sleep(0.05)
+            for key in keys:
+                if key not in found:
+                    entry = self.get(key)
+                    if entry is not None and entry[1] >= since:
+                        found[key] = entry
+        if len(found) < len(keys):
+            with self._lock:
+                self._count("lease_timeouts", len(keys) - len(found))
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute(
+                "SELECT COUNT(*) FROM shared_cache_entries WHERE key >= ? AND key < ?", self._namespace_range()
+            ).fetchone()[0]
+            return {**self._stats, "entries": entries, "path": self.path, "origin": self.origin}
+
+
+def open_shared_tier(namespace: str) -> Optional[SharedCacheTier]:
+    """The configured shared tier for ``namespace``, or None when SHARED_CACHE_PATH is unset."""
+    path = settings.SHARED_CACHE_PATH.strip()
+    if not path:
+        return None
+    try:
+        tier = SharedCacheTier(path, namespace, lease_seconds=settings.SHARED_CACHE_LEASE_SECONDS)
+    except Exception as e:
+        logger.error(f"Could not open shared cache {path}, caching per worker only: {e}")
+        return None
+    logger.info(f"Shared cache tier '{namespace}' at {path}")
+    return tier
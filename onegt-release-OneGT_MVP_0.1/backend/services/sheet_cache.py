@@ -0,0 +1,392 @@
+"""
+Stale-while-revalidate cache for sheet snapshots.
+
+Fresh entries are served directly. Once an entry passes its TTL it is still
+served while a single background task refreshes it, so readers never wait on
+Google at minute boundaries. Concurrent misses for the same key coalesce onto
+one in-flight load (single-flight) instead of each issuing their own fetch.
+
+With a shared tier (several workers on one host), loads first adopt values
+another worker already published and otherwise publish their own; the
+single-flight extends across workers through the tier's load leases, and
+writes/invalidations are broadcast so other workers drop their copies.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from services.shared_cache import SharedCacheTier
+
+logger = logging.getLogger(__name__)
+
+
+class SheetCache:
+    def __init__(self, ttl: float = 60, max_stale: float = 600, maxsize: int = 100, refresh_workers: int = 4,
+                 shared: Optional[SharedCacheTier] = None):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (value, loaded_at)
+        self._inflight: Dict[Hashable, Future] = {}
+        self._generation: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="sheet-refresh")
+        self.shared = shared
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "load_errors": 0,
+            "shared_hits": 0,
+        }
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for ``key``, loading it with ``loader`` when needed."""
+        self._sync_shared()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, loaded_at = entry
+                age = time.monotonic() - loaded_at
+                if age < self.ttl:
+                    self._stats["hits"] += 1
+                    self._entries.move_to_end(key)
+                    return value
+                if age < self.max_stale:
+                    self._stats["stale_hits"] += 1
+                    if key not in self._inflight:
+                        self._start_load(key, loader, background=True)
+                    return value
+            future = self._inflight.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                owner = False
+            else:
+                self._stats["misses"] += 1
+                future = self._start_load(key, loader, background=False)
+                owner = True
+        if not owner:
+            return future.result()
+        return self._run_load(key, loader, future)
+
+    def get_many_or_load(self, keys: List[Hashable], loader: Callable[[List[Hashable]], Dict[Hashable, Any]]) -> Dict[Hashable, Any]:
+        """Return values for several keys, loading every missing one with a single ``loader`` call.
+
+        ``loader`` receives a list of keys and returns a dict for them. Stale
+        entries are served as-is and refreshed together by one background call,
+        so only entries that are absent or past max_stale block on ``loader``.
+        """
+        results: Dict[Hashable, Any] = {}
+        waiting: Dict[Hashable, Future] = {}
+        owned: Dict[Hashable, Future] = {}
+        refreshing: Dict[Hashable, Future] = {}
+        generations: Dict[Hashable, int] = {}
+        self._sync_shared()
+        with self._lock:
+            now = time.monotonic()
+            for key in dict.fromkeys(keys):
+                entry = self._entries.get(key)
+                if entry is not None and now - entry[1] < self.max_stale:
+                    if now - entry[1] < self.ttl:
+                        self._stats["hits"] += 1
+                        self._entries.move_to_end(key)
+                    else:
+                        self._stats["stale_hits"] += 1
+                        if key not in self._inflight:
+                            refreshing[key] = self._inflight[key] = Future()
+                            generations[key] = self._generation.get(key, 0)
+                    results[key] = entry[0]
+                    continue
+                future = self._inflight.get(key)
+                if future is not None:
+                    self._stats["coalesced"] += 1
+                    waiting[key] = future
+                else:
+                    self._stats["misses"] += 1
+                    owned[key] = self._inflight[key] = Future()
+                    generations[key] = self._generation.get(key, 0)
+            if refreshing:
+                self._stats["refreshes"] += len(refreshing)
+                self._executor.submit(self._run_batch_load, refreshing, generations, loader, True)
+
+        if owned:
+            results.update(self._run_batch_load(owned, generations, loader))
+        for key, future in waiting.items():
+            results[key] = future.result()
+        return results
+
+    def _run_batch_load(self, futures: Dict[Hashable, Future], generations: Dict[Hashable, int],
+                        loader: Callable[[List[Hashable]], Dict[Hashable, Any]], background: bool = False) -> Dict[Hashable, Any]:
+        try:
+            fetched = self._fetch(list(futures), loader, background)
+            loaded = {key: value for key, (value, _) in fetched.items()}
+            missing = [key for key in futures if key not in loaded]
+            if missing:
+                raise KeyError(f"Batch load returned no value for {missing}")
+        except Exception as e:
+            with self._lock:
+                self._stats["refresh_errors" if background else "load_errors"] += 1
+                for key, future in futures.items():
+                    if self._inflight.get(key) is future:
+                        del self._inflight[key]
+            for future in futures.values():
+                future.set_exception(e)
+            if background:
+                logger.warning(f"Background refresh of {list(futures)} failed: {e}")
+                return {}
+            raise
+        with self._lock:
+            for key, future in futures.items():
+                if self._generation.get(key, 0) == generations[key]:
+                    self._store(key, loaded[key], fetched[key][1])
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+        for key, future in futures.items():
+            future.set_result(loaded[key])
+        return {key: loaded[key] for key in futures}
+
+    def _start_load(self, key: Hashable, loader: Callable[[], Any], background: bool) -> Future:
+        """Register an in-flight load (caller holds the lock)."""
+        future: Future = Future()
+        self._inflight[key] = future
+        if background:
+            self._stats["refreshes"] += 1
+            self._executor.submit(self._run_load, key, loader, future, True)
+        return future
+
+    def _run_load(self, key: Hashable, loader: Callable[[], Any], future: Future, background: bool = False) -> Any:
+        with self._lock:
+            generation = self._generation.get(key, 0)
+        try:
+            value, loaded_at = self._fetch([key], lambda keys: {key: loader()}, background)[key]
+        except Exception as e:
+            with self._lock:
+                self._stats["refresh_errors" if background else "load_errors"] += 1
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+            future.set_exception(e)
+            if background:
+                # Keep serving the last good snapshot; the next stale read retries
+                logger.warning(f"Background refresh of {key} failed: {e}")
+                return None
+            raise
+        with self._lock:
+            # An invalidation while loading means the value may predate a write
+            if self._generation.get(key, 0) == generation:
+                self._store(key, value, loaded_at)
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        future.set_result(value)
+        return value
+
+    def _store(self, key: Hashable, value: Any, loaded_at: Optional[float] = None):
+        self._entries[key] = (value, time.monotonic() if loaded_at is None else loaded_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value regardless of age, without loading."""
+        self._sync_shared()
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[0] if entry is not None else default
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._generation[key] = self._generation.get(key, 0) + 1
+            self._store(key, value)
+        self._invalidate_shared(key)
+        if self.shared is not None:
+            try:
+                self.shared.put(str(key), value, time.time())
+            except Exception as e:
+                logger.warning(f"Could not publish {key} to the shared cache: {e}")
+
+    def update(self, key: Hashable, fn: Callable[[Any], Any]):
+        """Apply a write to the cached value in place of invalidating it.
+
+        The entry keeps its original load time, so it is still re-validated
+        against the source once its TTL passes. Loads already in flight are
+        discarded because they may predate the write.
+        """
+        with self._lock:
+            self._generation[key] = self._generation.get(key, 0) + 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                try:
+                    self._entries[key] = (fn(entry[0]), entry[1])
+                except Exception as e:
+                    logger.debug(f"Could not apply write to cached {key}, dropping it: {e}")
+                    del self._entries[key]
+        # Other workers cannot apply the write to their copies, so they reload
+        self._invalidate_shared(key)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._generation[key] = self._generation.get(key, 0) + 1
+            self._entries.pop(key, None)
+        self._invalidate_shared(key)
+
+    def expire(self, key: Hashable):
+        """Stop serving ``key`` but keep it: the next read reloads, and the loader can
+        still use the old value (``get``) as the base of an incremental refresh."""
+        with self._lock:
+            self._generation[key] = self._generation.get(key, 0) + 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], float("-inf"))
+        self._invalidate_shared(key)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries.keys()) + list(self._inflight.keys()):
+                self._generation[key] = self._generation.get(key, 0) + 1
+            self._entries.clear()
+        self._invalidate_shared(None)
+
+    # --- Shared tier ---
+
+    def _sync_shared(self):
+        """Drop local entries that another worker wrote to or invalidated."""
+        if self.shared is None:
+            return
+        try:
+            keys = self.shared.poll()
+        except Exception as e:
+            logger.warning(f"Could not poll shared cache invalidations: {e}")
+            return
+        if not keys:
+            return
+        with self._lock:
+            if None in keys:
+                keys = list(self._entries) + list(self._inflight)
+            for key in keys:
+                self._generation[key] = self._generation.get(key, 0) + 1
+                self._entries.pop(key, None)
+
+    def _invalidate_shared(self, key: Optional[Hashable]):
+        if self.shared is None:
+            return
+        try:
+            self.shared.invalidate(None if key is None else str(key))
+        except Exception as e:
+            logger.warning(f"Could not broadcast invalidation of {key}: {e}")
+
+    def _adopt(self, key: Hashable, background: bool) -> Optional[Tuple[Any, float]]:
+        """A value another worker published for ``key``, with its load time on this clock."""
+        try:
+            entry = self.shared.get(str(key))
+        except Exception as e:
+            logger.warning(f"Could not read {key} from the shared cache: {e}")
+            return None
+        if entry is None:
+            return None
+        age = max(0.0, time.time() - entry[1])
+        with self._lock:
+            # A refresh only takes a fresh value; a miss also takes one that is still servable
+            limit = self.ttl if background or key in self._entries else self.max_stale
+            if age >= limit:
+                return None
+            self._stats["shared_hits"] += 1
+        return entry[0], time.monotonic() - age
+
+    def _fetch(self, keys: List[Hashable], loader: Callable[[List[Hashable]], Dict[Hashable, Any]],
+               background: bool) -> Dict[Hashable, Tuple[Any, float]]:
+        """Load ``keys`` as {key: (value, loaded_at)}, going through the shared tier if there is one."""
+        if self.shared is None:
+            loaded = loader(keys)
+            now = time.monotonic()
+            return {key: (loaded[key], now) for key in keys if key in loaded}
+
+        result: Dict[Hashable, Tuple[Any, float]] = {}
+        pending = []
+        for key in keys:
+            adopted = self._adopt(key, background)
+            if adopted is not None:
+                result[key] = adopted
+            else:
+                pending.append(key)
+        if not pending:
+            return result
+
+        # One worker loads each key; the others wait for it to be published
+        since = time.time()
+        owned = [key for key in pending if self._acquire(key)]
+        waiting = [key for key in pending if key not in owned]
+        try:
+            if owned:
+                result.update(self._load_and_publish(owned, loader))
+        finally:
+            for key in owned:
+                try:
+                    self.shared.release(str(key))
+                except Exception as e:
+                    logger.warning(f"Could not release shared cache lease of {key}: {e}")
+        if waiting:
+            try:
+                found = self.shared.wait_for([str(key) for key in waiting], since)
+            except Exception as e:
+                logger.warning(f"Could not wait for shared cache loads: {e}")
+                found = {}
+            now_wall, now = time.time(), time.monotonic()
+            late = []
+            for key in waiting:
+                entry = found.get(str(key))
+                if entry is not None:
+                    result[key] = (entry[0], now - max(0.0, now_wall - entry[1]))
+                else:
+                    late.append(key)
+            if late:
+                result.update(self._load_and_publish(late, loader))
+        return result
+
+    def _acquire(self, key: Hashable) -> bool:
+        try:
+            return self.shared.acquire(str(key))
+        except Exception as e:
+            logger.warning(f"Could not take shared cache lease of {key}, loading it anyway: {e}")
+            return True
+
+    def _load_and_publish(self, keys: List[Hashable], loader: Callable[[List[Hashable]], Dict[Hashable, Any]]
+                          ) -> Dict[Hashable, Tuple[Any, float]]:
+        versions = {}
+        for key in keys:
+            try:
+                versions[key] = self.shared.version(str(key))
+            except Exception as e:
+                logger.warning(f"Could not read shared cache version of {key}: {e}")
+        loaded = loader(keys)
+        now_wall, now = time.time(), time.monotonic()
+        for key in keys:
+            if key in loaded and key in versions:
+                try:
+                    self.shared.put(str(key), loaded[key], now_wall, versions[key])
+                except Exception as e:
+                    logger.warning(f"Could not publish {key} to the shared cache: {e}")
+        return {key: (loaded[key], now) for key in keys if key in loaded}
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "inflight": len(self._inflight),
+                "ttl_seconds": self.ttl,
+                "max_stale_seconds": self.max_stale,
+                "shared": self.shared.stats() if self.shared is not None else None,
+            }
@@ -0,0 +1,164 @@
+"""
+Cached snapshot of one sheet with hash indexes on its ID columns.
+
+An index is declared the first time a column is looked up and is then kept
+up to date as rows are appended, updated or deleted, so single-record reads
+and row-number lookups cost a dict access instead of a scan (or an extra
+Google round trip). Snapshots are copy-on-write: a mutation returns a new
+snapshot and never changes a records list a request may still be iterating.
+"""
+import threading
+from typing import Any, Dict, List, Optional
+
+
+def cell_text(value: Any) -> str:
+    """Render a written value the way Sheets returns it on the next read."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class SheetSnapshot:
+    def __init__(self, headers: List[str], records: List[Dict[str, Any]], indexes: Optional[Dict[str, Dict[str, int]]] = None):
+        self.headers = headers
+        self.header_map = {i: h for i, h in enumerate(headers) if h}
+        self.records = records
+        self._indexes: Dict[str, Dict[str, int]] = indexes or {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Snapshots are pickled into the shared cache tier; the lock is per process
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows: List[List[str]]) -> "SheetSnapshot":
+        """Build a snapshot from raw sheet values (header row first). Robust to empty headers."""
+        if not rows:
+            return cls([], [])
+
+        # First row is headers - strip whitespace and newlines
+        headers = [str(h).strip() for h in rows[0]]
+        header_map = {i: h for i, h in enumerate(headers) if h}
+
+        records = []
+        for row in rows[1:]:
+            record = {}
+            for i, header in header_map.items():
+                record[header] = row[i] if i < len(row) else ""
+            records.append(record)
+        return cls(headers, records)
+
+    # --- Lookups ---
+
+    def index(self, column: str) -> Dict[str, int]:
+        """Return (building on first use) the id -> position index for a column."""
+        idx = self._indexes.get(column)
+        if idx is not None:
+            return idx
+        with self._lock:
+            idx = self._indexes.get(column)
+            if idx is None:
+                idx = {}
+                for pos, record in enumerate(self.records):
+                    # First occurrence wins, like the linear scans this replaces
+                    idx.setdefault(str(record.get(column, "")).strip(), pos)
+                self._indexes[column] = idx
+        return idx
+
+    def position(self, column: str, value: Any) -> Optional[int]:
+        """0-based position of the first record whose column equals value."""
+        return self.index(column).get(str(value).strip())
+
+    def get(self, column: str, value: Any) -> Optional[Dict[str, Any]]:
+        pos = self.position(column, value)
+        return self.records[pos] if pos is not None else None
+
+    def row_number(self, column: str, value: Any) -> Optional[int]:
+        """1-based sheet row of the first record whose column equals value."""
+        if column not in self.headers:
+            return None
+        pos = self.position(column, value)
+        return pos + 2 if pos is not None else None  # +2: header row and 0-based position
+
+    # --- Copy-on-write mutations ---
+
+    def _record_from(self, values: List[Any], base: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        record = dict(base) if base else {h: "" for h in self.header_map.values()}
+        for i, header in self.header_map.items():
+            if i < len(values):
+                record[header] = cell_text(values[i])
+        return record
+
+    def _derive(self, records: List[Dict[str, Any]]) -> "SheetSnapshot":
+        with self._lock:
+            indexes = {col: dict(idx) for col, idx in self._indexes.items()}
+        return SheetSnapshot(self.headers, records, indexes)
+
+    def with_appended(self, values_list: List[List[Any]]) -> "SheetSnapshot":
+        new_records = [self._record_from(values) for values in values_list]
+        snap = self._derive(self.records + new_records)
+        for offset, record in enumerate(new_records):
+            pos = len(self.records) + offset
+            for column, idx in snap._indexes.items():
+                idx.setdefault(str(record.get(column, "")).strip(), pos)
+        return snap
+
+    def with_record(self, row_index: int, record: Dict[str, Any]) -> "SheetSnapshot":
+        pos = row_index - 2
+        if pos < 0 or pos >= len(self.records):
+            raise IndexError(f"Row {row_index} is outside the cached snapshot")
+        old = self.records[pos]
+        records = list(self.records)
+        records[pos] = record
+        snap = self._derive(records)
+        for column in list(snap._indexes):
+            idx = snap._indexes[column]
+            old_key = str(old.get(column, "")).strip()
+            new_key = str(record.get(column, "")).strip()
+            if old_key == new_key:
+                continue
+            if idx.get(old_key) == pos:
+                # The old key may still exist further down; let the index rebuild lazily
+                del snap._indexes[column]
+                continue
+            if new_key not in idx or idx[new_key] > pos:
+                idx[new_key] = pos
+        return snap
+
+    def with_updated(self, row_index: int, values: List[Any]) -> "SheetSnapshot":
+        pos = row_index - 2
+        base = self.records[pos] if 0 <= pos < len(self.records) else None
+        return self.with_record(row_index, self._record_from(values, base))
+
+    def with_cell(self, row_index: int, col: int, value: Any) -> "SheetSnapshot":
+        pos = row_index - 2
+        header = self.header_map.get(col - 1)
+        if header is None or not (0 <= pos < len(self.records)):
+            raise IndexError(f"Cell ({row_index}, {col}) is outside the cached snapshot")
+        record = dict(self.records[pos])
+        record[header] = cell_text(value)
+        return self.with_record(row_index, record)
+
+    def with_deleted(self, row_index: int) -> "SheetSnapshot":
+        pos = row_index - 2
+        if pos < 0 or pos >= len(self.records):
+            raise IndexError(f"Row {row_index} is outside the cached snapshot")
+        removed = self.records[pos]
+        snap = self._derive(self.records[:pos] + self.records[pos + 1:])
+        for column in list(snap._indexes):
+            idx = snap._indexes[column]
+            if idx.get(str(removed.get(column, "")).strip()) == pos:
+                del snap._indexes[column]
+                continue
+            snap._indexes[column] = {k: (p - 1 if p > pos else p) for k, p in idx.items()}
+        return snap
@@ -0,0 +1,198 @@
+"""
+Incremental refresh of cached sheet snapshots.
+
+A refresh of a sheet that already has a cached snapshot goes through these
+steps in order, stopping at the first that applies:
+
+1. If the spreadsheet's Drive ``modifiedTime`` matches the last verified
+   sync, the cached snapshot is reused (one cheap metadata call, no values).
+2. Otherwise one batchGet fetches the header row, column A and only the rows
+   after the cached tail. If there are new rows and the header and column A
+   of the known rows are unchanged, the new rows are added to the snapshot.
+   Column A only serves to notice inserted, deleted or reordered rows; it
+   need not hold the ID.
+3. Anything else falls back to a full fetch: no new rows (the change was an
+   edit somewhere), moved rows or header edits, or a verification that is
+   due. A per-row content hash then tells whether anything actually
+   changed, so an unchanged sheet keeps its snapshot (and its built indexes).
+
+Step 2 reads none of the known rows, so it does not record the new
+``modifiedTime`` as verified: the refresh after it checks again, and once
+the appends stop it falls through to a hash-verified full fetch, which
+catches edits made alongside the appends. Append-heavy sheets such as
+Timesheets, Expenses and Notifications therefore refresh mostly in
+proportion to their churn rather than their size, without missing edits made
+in Sheets. Writes made through the service patch the cache directly.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.sheet_snapshot import SheetSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+def _row_hash(row: List[Any]) -> str:
+    # Trailing blanks depend on how wide the fetch was, so ignore them
+    cells = _trim([str(c) for c in row])
+    return hashlib.blake2b(json.dumps(cells).encode(), digest_size=8).hexdigest()
+
+
+def _trim(cells: List[str]) -> List[str]:
+    cells = list(cells)
+    while cells and cells[-1] == "":
+        cells.pop()
+    return cells
+
+
+def _quote(sheet_name: str) -> str:
+    return "'" + sheet_name.replace("'", "''") + "'"
+
+
+class _SyncState:
+    def __init__(self):
+        self.modified: Optional[str] = None
+        self.verified_at: float = 0.0
+        self.row_hashes: List[str] = []
+
+
+class SheetSyncEngine:
+    def __init__(self, verify_seconds: float = 600, modified_ttl: float = 2):
+        self.verify_seconds = verify_seconds
+        self.modified_ttl = modified_ttl
+        self._states: Dict[Tuple[str, str], _SyncState] = {}
+        self._modified: Dict[str, Tuple[str, float]] = {}  # spreadsheet_id -> (modifiedTime, checked_at)
+        self._lock = threading.Lock()
+        self._stats = {"skipped": 0, "appended": 0, "full": 0, "unchanged_full": 0, "rows_fetched": 0}
+
+    def _modified_time(self, spreadsheet) -> Optional[str]:
+        """Drive modifiedTime of the spreadsheet, shared by sheets refreshing together."""
+        with self._lock:
+            cached = self._modified.get(spreadsheet.id)
+            if cached and time.monotonic() - cached[1] < self.modified_ttl:
+                return cached[0]
+        try:
+            modified = spreadsheet.get_lastUpdateTime()
+        except Exception as e:
+            logger.warning(f"Could not read modifiedTime of {spreadsheet.id}: {e}")
+            return None
+        with self._lock:
+            self._modified[spreadsheet.id] = (modified, time.monotonic())
+        return modified
+
+    def load(self, spreadsheet, sheet_name: str, base: Optional[SheetSnapshot],
+             fetch_all: Callable[[], List[List[str]]]) -> SheetSnapshot:
+        """Return an up-to-date snapshot of ``sheet_name``, reusing ``base`` where possible.
+
+        ``fetch_all`` returns every value of the sheet and is used for full fetches.
+        """
+        key = (spreadsheet.id, sheet_name)
+        with self._lock:
+            state = self._states.setdefault(key, _SyncState())
+        modified = self._modified_time(spreadsheet)
+        verify_due = time.monotonic() - state.verified_at >= self.verify_seconds
+
+        if base is not None and not verify_due:
+            if modified is not None and modified == state.modified:
+                self._count("skipped")
+                return base
+            snapshot = self._load_tail(spreadsheet, sheet_name, base, state)
+            if snapshot is not None:
+                # state.modified stays put: only the new rows were read, not the known ones
+                return snapshot
+
+        return self._load_full(fetch_all, base, state, modified)
+
+    def _load_tail(self, spreadsheet, sheet_name: str, base: SheetSnapshot,
+                   state: _SyncState) -> Optional[SheetSnapshot]:
+        """Fetch only header, column A and new rows; None unless rows were just appended."""
+        first_header = base.headers[0] if base.headers else ""
+        if not first_header:
+            return None
+        known = len(base.records)
+        quoted = _quote(sheet_name)
+        try:
+            # The tail range starts at the last known row, which always exists in the grid
+            response = spreadsheet.values_batch_get([
+                f"{quoted}!1:1",
+                f"{quoted}!A2:A",
+                f"{quoted}!A{known + 1}:ZZZ",
+            ])
+            header_range, id_range, tail_range = (vr.get("values", []) for vr in response["valueRanges"])
+        except Exception as e:
+            logger.debug(f"Tail fetch of {sheet_name} failed, doing a full fetch: {e}")
+            return None
+
+        header = [str(h).strip() for h in (header_range[0] if header_range else [])]
+        if _trim(header) != _trim(base.headers):
+            return None
+        new_rows = tail_range[1:]  # First row is the last known one (or the header)
+        if not new_rows:
+            # The change was made in place: only a full fetch can tell what it was
+            return None
+        column_a = [row[0] if row else "" for row in id_range]
+        if column_a[:known] != [str(r.get(first_header, "")) for r in base.records]:
+            return None
+
+        self._count("appended")
+        self._count("rows_fetched", len(new_rows))
+        if len(state.row_hashes) == known + 1:
+            # Keep the hashes in step, so a later full fetch of an unchanged sheet keeps this snapshot
+            state.row_hashes = state.row_hashes + [_row_hash(row) for row in new_rows]
+        return base.with_appended(new_rows)
+
+    def _load_full(self, fetch_all: Callable[[], List[List[str]]], base: Optional[SheetSnapshot],
+                   state: _SyncState, modified: Optional[str]) -> SheetSnapshot:
+        rows = fetch_all()
+        hashes = [_row_hash(row) for row in rows]
+        self._count("full")
+        self._count("rows_fetched", len(rows))
+        unchanged = base is not None and hashes == state.row_hashes
+        state.row_hashes = hashes
+        state.modified = modified
+        state.verified_at = time.monotonic()
+        if unchanged:
+            # Keep the cached snapshot and the indexes already built on it
+            self._count("unchanged_full")
+            return base
+        return SheetSnapshot.from_rows(rows)
+
+    def prime(self, spreadsheet_id: str, sheet_name: str, rows: List[List[Any]]):
+        """Record a full fetch made elsewhere (e.g. a batched cold load) as verified."""
+        with self._lock:
+            state = self._states.setdefault((spreadsheet_id, sheet_name), _SyncState())
+        state.row_hashes = [_row_hash(row) for row in rows]
+        state.verified_at = time.monotonic()
+
+    def mark_changed(self, spreadsheet_id: str, sheet_name: str, in_place: bool):
+        """Record a change made elsewhere, so the next load fetches instead of trusting modifiedTime.
+
+        Appended rows are picked up by the tail fetch; ``in_place`` edits need
+        a full (hash-verified) fetch.
+        """
+        with self._lock:
+            self._modified.pop(spreadsheet_id, None)
+            state = self._states.get((spreadsheet_id, sheet_name))
+            if state is not None:
+                state.modified = None
+                if in_place:
+                    state.verified_at = 0.0
+
+    def forget(self, spreadsheet_id: Optional[str] = None, sheet_name: Optional[str] = None):
+        """Drop sync state so the next load of the sheet(s) is a full fetch."""
+        with self._lock:
+            for key in list(self._states):
+                if (spreadsheet_id is None or key[0] == spreadsheet_id) and (sheet_name is None or key[1] == sheet_name):
+                    del self._states[key]
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "tracked_sheets": len(self._states), "verify_seconds": self.verify_seconds}
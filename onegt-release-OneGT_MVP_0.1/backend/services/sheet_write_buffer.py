@@ -0,0 +1,144 @@
+"""
+Write-behind buffer for sheet mutations.
+
+Appends and row updates are queued per sheet and written in batches: all
+queued appends in one ``append_rows`` call and all queued updates in one
+``batch_update`` call. A sheet is flushed when it reaches ``max_batch``
+pending writes, when its oldest write has waited ``interval`` seconds, or
+on an explicit ``flush``. Every queued write gets a Future that resolves
+to the result of the batch it was written in.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Pending:
+    def __init__(self):
+        self.appends: List[Tuple[List[Any], Future]] = []
+        self.updates: List[Tuple[int, List[Any], Future]] = []
+        self.since = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.appends) + len(self.updates)
+
+
+class WriteBuffer:
+    def __init__(self, writer: Callable[[Hashable, List[List[Any]], Dict[int, List[Any]]], Dict[str, Any]],
+                 max_batch: int = 200, interval: float = 2.0):
+        """``writer(target, rows, updates)`` performs one batch and returns its result dict."""
+        self._writer = writer
+        self.max_batch = max_batch
+        self.interval = interval
+        self._pending: Dict[Hashable, _Pending] = {}
+        self._lock = threading.Lock()
+        self._flush_locks: Dict[Hashable, threading.Lock] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"queued": 0, "batches": 0, "rows_written": 0, "failed_batches": 0}
+
+    def append(self, target: Hashable, values: List[Any]) -> Future:
+        """Queue a row append; the Future resolves to the batch result."""
+        future: Future = Future()
+        with self._lock:
+            self._queue(target).appends.append((values, future))
+        self._after_queue(target)
+        return future
+
+    def update(self, target: Hashable, row_index: int, values: List[Any]) -> Future:
+        """Queue a row update (1-based row); the Future resolves to the batch result."""
+        future: Future = Future()
+        with self._lock:
+            self._queue(target).updates.append((row_index, values, future))
+        self._after_queue(target)
+        return future
+
+    def _queue(self, target: Hashable) -> _Pending:
+        """Pending writes for a target (caller holds the lock)."""
+        self._stats["queued"] += 1
+        pending = self._pending.get(target)
+        if pending is None:
+            pending = self._pending[target] = _Pending()
+            self._flush_locks.setdefault(target, threading.Lock())
+        return pending
+
+    def _after_queue(self, target: Hashable):
+        with self._lock:
+            pending = self._pending.get(target)
+            full = pending is not None and len(pending) >= self.max_batch
+        if full:
+            self.flush(target)
+        else:
+            self._ensure_timer()
+
+    def flush(self, target: Optional[Hashable] = None) -> List[Dict[str, Any]]:
+        """Write pending batches now (one target, or all) and return their results."""
+        with self._lock:
+            targets = [target] if target is not None else list(self._pending)
+        results = []
+        for t in targets:
+            result = self._flush_target(t)
+            if result is not None:
+                results.append(result)
+        return results
+
+    def _flush_target(self, target: Hashable) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            flush_lock = self._flush_locks.get(target)
+        if flush_lock is None:
+            return None
+        # One batch per sheet at a time keeps appends in the order they were queued
+        with flush_lock:
+            with self._lock:
+                pending = self._pending.pop(target, None)
+            if not pending:
+                return None
+
+            rows = [values for values, _ in pending.appends]
+            updates: Dict[int, List[Any]] = {}
+            for row_index, values, _ in pending.updates:
+                updates[row_index] = values  # Last write to a row wins
+            futures = [f for _, f in pending.appends] + [f for _, _, f in pending.updates]
+            try:
+                result = self._writer(target, rows, updates)
+            except Exception as e:
+                logger.error(f"Batched write to {target} failed ({len(rows)} appends, {len(updates)} updates): {e}")
+                with self._lock:
+                    self._stats["failed_batches"] += 1
+                result = {"success": False, "target": target, "appended": 0, "updated": 0, "error": str(e)}
+                for future in futures:
+                    future.set_exception(e)
+                return result
+
+            with self._lock:
+                self._stats["batches"] += 1
+                self._stats["rows_written"] += len(rows) + len(updates)
+            for future in futures:
+                future.set_result(result)
+            return result
+
+    def _ensure_timer(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run_timer, name="sheet-write-flush", daemon=True)
+            self._thread.start()
+
+    def _run_timer(self):
+        while True:
+            time.sleep(self.interval / 2)
+            now = time.monotonic()
+            with self._lock:
+                due = [t for t, p in self._pending.items() if now - p.since >= self.interval]
+            for target in due:
+                try:
+                    self._flush_target(target)
+                except Exception as e:
+                    logger.error(f"Interval flush of {target} failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "pending": sum(len(p) for p in self._pending.values())}
@@ -0,0 +1,139 @@
+"""
+Pool of authorized gspread clients.
+
+Each client wraps its own requests session, so connections stay alive
+between calls, and all clients share a single set of credentials (read from
+disk once). The pool is warmed at start-up. A lease never blocks while the
+pool can still grow: it takes an idle client, or creates one up to ``size``,
+and only waits (briefly) once every client is in use. A client is held for
+the length of each Sheets API call, so the lease gauges time the calls.
+"""
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class ClientPool:
+    def __init__(self, factory: Callable[[], Any], size: int = 5, warmup: int = 1, lease_timeout: float = 2.0):
+        self._factory = factory
+        self.size = size
+        self.lease_timeout = lease_timeout
+        self._idle: "queue.LifoQueue" = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._leased_at: Dict[int, float] = {}
+        self._temporary: Set[int] = set()
+        self._lock = threading.Lock()
+        self._stats = {
+            "leases": 0,
+            "releases": 0,
+            "waits": 0,
+            "temporary_clients": 0,
+            "create_errors": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "lease_ms_total": 0.0,
+            "lease_ms_max": 0.0,
+        }
+        self.warm(warmup)
+
+    def warm(self, count: int):
+        """Create up to ``count`` idle clients ahead of the first request."""
+        for _ in range(min(count, self.size)):
+            client = self._create()
+            if client is None:
+                break
+            self._idle.put_nowait(client)
+        logger.info(f"Google Sheets client pool ready: {self._idle.qsize()} warm, max {self.size}")
+
+    def _create(self) -> Optional[Any]:
+        """Create a pooled client, or return None once the pool is at size."""
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+        client = self._factory()
+        if client is None:
+            with self._lock:
+                self._stats["create_errors"] += 1
+                self._created -= 1
+        return client
+
+    def acquire(self) -> Any:
+        """Lease a client: idle one, else a new one while under size, else wait then go temporary."""
+        start = time.monotonic()
+        try:
+            client = self._idle.get_nowait()
+        except queue.Empty:
+            client = self._create()
+            if client is None:
+                with self._lock:
+                    self._stats["waits"] += 1
+                try:
+                    client = self._idle.get(timeout=self.lease_timeout)
+                except queue.Empty:
+                    logger.warning("Client pool exhausted, creating a temporary client")
+                    client = self._factory()
+                    with self._lock:
+                        self._stats["temporary_clients"] += 1
+                        if client is not None:
+                            self._temporary.add(id(client))
+        waited_ms = (time.monotonic() - start) * 1000
+        with self._lock:
+            self._stats["leases"] += 1
+            self._stats["wait_ms_total"] += waited_ms
+            self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], waited_ms)
+            if client is not None:
+                self._leased_at[id(client)] = time.monotonic()
+        return client
+
+    def release(self, client: Any):
+        """Return a leased client to the pool; temporary clients are dropped."""
+        if client is None:
+            return
+        with self._lock:
+            leased_at = self._leased_at.pop(id(client), None)
+            if leased_at is not None:
+                lease_ms = (time.monotonic() - leased_at) * 1000
+                self._stats["releases"] += 1
+                self._stats["lease_ms_total"] += lease_ms
+                self._stats["lease_ms_max"] = max(self._stats["lease_ms_max"], lease_ms)
+            if id(client) in self._temporary:
+                self._temporary.discard(id(client))
+                return
+        try:
+            self._idle.put_nowait(client)
+        except queue.Full:
+            pass  # Already full, discard
+
+    @contextmanager
+    def lease(self) -> Iterator[Any]:
+        """Hold a client for the duration of a ``with`` block."""
+        client = self.acquire()
+        try:
+            yield client
+        finally:
+            self.release(client)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            leases = self._stats["leases"]
+            releases = self._stats["releases"]
+            return {
+                "size": self._created,
+                "max_size": self.size,
+                "idle": self._idle.qsize(),
+                "in_use": len(self._leased_at) - len(self._temporary),
+                "leases": leases,
+                "waits": self._stats["waits"],
+                "temporary_clients": self._stats["temporary_clients"],
+                "create_errors": self._stats["create_errors"],
+                "wait_ms_avg": round(self._stats["wait_ms_total"] / leases, 2) if leases else 0.0,
+                "wait_ms_max": round(self._stats["wait_ms_max"], 2),
+                "lease_ms_avg": round(self._stats["lease_ms_total"] / releases, 2) if releases else 0.0,
+                "lease_ms_max": round(self._stats["lease_ms_max"], 2),
+            }
@@ -0,0 +1,590 @@
+"""
+SQL mirror for Google Sheets.
+
+Every spreadsheet tab is mirrored row-by-row into a local SQL table (SQLite or
+PostgreSQL) so reads and ID lookups never leave the process. ``SqlSheetsService``
+exposes the same method surface as ``GoogleSheetsService``; in "mirror" mode it
+syncs from Google and writes through to it, in "local" mode the SQL store is the
+only source of truth (offline development / testing stand-in).
+
+Decoded records are kept per sheet as a ``SheetSnapshot`` (the same type the
+Google service caches), so repeated reads return the same records list and
+cost no SQL or JSON decoding. Writes patch the snapshot the way the Google
+service patches its cache; a re-sync replaces it.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Dict, Any, Optional, Tuple
+
+import gspread
+
+from services.sheet_snapshot import SheetSnapshot, cell_text
+
+logger = logging.getLogger(__name__)
+
+HRMS_SCOPE = "hrms"
+CRMS_SCOPE = "crms"
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS sheet_meta (
+        scope TEXT NOT NULL,
+        sheet TEXT NOT NULL,
+        row_count INTEGER NOT NULL DEFAULT 0,
+        synced_at DOUBLE PRECISION NOT NULL DEFAULT 0,
+        PRIMARY KEY (scope, sheet)
+    )""",
+    """CREATE TABLE IF NOT EXISTS sheet_rows (
+        scope TEXT NOT NULL,
+        sheet TEXT NOT NULL,
+        row_index INTEGER NOT NULL,
+        cells TEXT NOT NULL,
+        PRIMARY KEY (scope, sheet, row_index)
+    )""",
+    """CREATE TABLE IF NOT EXISTS sheet_key_columns (
+        scope TEXT NOT NULL,
+        sheet TEXT NOT NULL,
+        column_name TEXT NOT NULL,
+        PRIMARY KEY (scope, sheet, column_name)
+    )""",
+    """CREATE TABLE IF NOT EXISTS sheet_keys (
+        scope TEXT NOT NULL,
+        sheet TEXT NOT NULL,
+        column_name TEXT NOT NULL,
+        key_value TEXT NOT NULL,
+        row_index INTEGER NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_sheet_keys_lookup ON sheet_keys (scope, sheet, column_name, key_value)",
+    "CREATE INDEX IF NOT EXISTS idx_sheet_keys_row ON sheet_keys (scope, sheet, row_index)",
+]
+
+
+def _done(sheet_name: str) -> Future:
+    """A completed write result for the offline store, which has nothing to batch."""
+    future: Future = Future()
+    future.set_result({"success": True, "sheet": sheet_name})
+    return future
+
+
+class SqlSheetStore:
+    """Raw row storage for mirrored sheets, keyed by (scope, sheet, row_index).
+
+    Row 1 holds the header, matching the 1-based row numbers used by Sheets.
+    ID lookups go through ``sheet_keys``, which is populated for every column
+    that has been looked up at least once (declared in ``sheet_key_columns``).
+    """
+
+    def __init__(self, url: str):
+        self._lock = threading.RLock()
+        self._snapshots: Dict[Tuple[str, str], SheetSnapshot] = {}
+        if url.startswith("postgres"):
+            import psycopg2
+            self._conn = psycopg2.connect(url)
+            self._placeholder = "%s"
+        else:
+            path = url.split("sqlite:///", 1)[-1] or ":memory:"
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._placeholder = "?"
+        with self._lock, self._conn:
+            cur = self._conn.cursor()
+            for statement in SCHEMA:
+                cur.execute(statement)
+
+    def _sql(self, statement: str) -> str:
+        return statement if self._placeholder == "?" else statement.replace("?", self._placeholder)
+
+    def _fetchall(self, statement: str, params: tuple = ()) -> list:
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute(self._sql(statement), params)
+            return cur.fetchall()
+
+    # --- Reads ---
+
+    def synced_at(self, scope: str, sheet: str) -> Optional[float]:
+        rows = self._fetchall("SELECT synced_at FROM sheet_meta WHERE scope = ? AND sheet = ?", (scope, sheet))
+        return rows[0][0] if rows else None
+
+    def read(self, scope: str, sheet: str) -> List[List[str]]:
+        rows = self._fetchall(
+            "SELECT cells FROM sheet_rows WHERE scope = ? AND sheet = ? ORDER BY row_index",
+            (scope, sheet)
+        )
+        return [json.loads(r[0]) for r in rows]
+
+    def snapshot(self, scope: str, sheet: str) -> SheetSnapshot:
+        """Decoded records of a sheet, built once and kept until the sheet is replaced."""
+        with self._lock:
+            snap = self._snapshots.get((scope, sheet))
+            if snap is None:
+                snap = SheetSnapshot.from_rows(self.read(scope, sheet))
+                self._snapshots[(scope, sheet)] = snap
+            return snap
+
+    def read_row(self, scope: str, sheet: str, row_index: int) -> Optional[List[str]]:
+        rows = self._fetchall(
+            "SELECT cells FROM sheet_rows WHERE scope = ? AND sheet = ? AND row_index = ?",
+            (scope, sheet, row_index)
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    def headers(self, scope: str, sheet: str) -> List[str]:
+        header = self.read_row(scope, sheet, 1)
+        return [str(h).strip() for h in header] if header else []
+
+    def find_row(self, scope: str, sheet: str, column: str, value: str) -> Optional[int]:
+        """Return the first 1-based row whose ``column`` equals ``value`` (stripped)."""
+        with self._lock:
+            self._declare_key_column(scope, sheet, column)
+            rows = self._fetchall(
+                "SELECT MIN(row_index) FROM sheet_keys WHERE scope = ? AND sheet = ? AND column_name = ? AND key_value = ?",
+                (scope, sheet, column, str(value).strip())
+            )
+        return rows[0][0] if rows and rows[0][0] is not None else None
+
+    # --- Writes ---
+
+    def replace(self, scope: str, sheet: str, rows: List[List[Any]]):
+        """Replace the mirrored copy of a sheet with a fresh snapshot."""
+        with self._lock, self._conn:
+            cur = self._conn.cursor()
+            cur.execute(self._sql("DELETE FROM sheet_rows WHERE scope = ? AND sheet = ?"), (scope, sheet))
+            cur.execute(self._sql("DELETE FROM sheet_keys WHERE scope = ? AND sheet = ?"), (scope, sheet))
+            cur.executemany(
+                self._sql("INSERT INTO sheet_rows (scope, sheet, row_index, cells) VALUES (?, ?, ?, ?)"),
+                [(scope, sheet, idx + 1, json.dumps([cell_text(v) for v in row])) for idx, row in enumerate(rows)]
+            )
+            self._set_meta(cur, scope, sheet, len(rows))
+            for column in self._key_columns(cur, scope, sheet):
+                self._index_column(cur, scope, sheet, column, rows)
+            self._snapshots.pop((scope, sheet), None)
+
+    def append(self, scope: str, sheet: str, values: List[Any]) -> int:
+        with self._lock:
+            with self._conn:
+                cur = self._conn.cursor()
+                cur.execute(self._sql("SELECT COALESCE(MAX(row_index), 0) FROM sheet_rows WHERE scope = ? AND sheet = ?"), (scope, sheet))
+                row_index = cur.fetchone()[0] + 1
+                self._write_row(cur, scope, sheet, row_index, [cell_text(v) for v in values])
+                cur.execute(self._sql("UPDATE sheet_meta SET row_count = ? WHERE scope = ? AND sheet = ?"), (row_index, scope, sheet))
+            self._patch(scope, sheet, row_index, lambda snap: snap.with_appended([values]))
+            return row_index
+
+    def update(self, scope: str, sheet: str, row_index: int, values: List[Any]):
+        with self._lock:
+            with self._conn:
+                cur = self._conn.cursor()
+                current = self.read_row(scope, sheet, row_index) or []
+                cells = [cell_text(v) for v in values]
+                # Sheets leaves cells beyond the written range untouched
+                cells += current[len(cells):]
+                self._write_row(cur, scope, sheet, row_index, cells)
+            self._patch(scope, sheet, row_index, lambda snap: snap.with_updated(row_index, values))
+
+    def update_cell(self, scope: str, sheet: str, row_index: int, col: int, value: Any):
+        with self._lock:
+            with self._conn:
+                cur = self._conn.cursor()
+                cells = self.read_row(scope, sheet, row_index) or []
+                if len(cells) < col:
+                    cells += [""] * (col - len(cells))
+                cells[col - 1] = cell_text(value)
+                self._write_row(cur, scope, sheet, row_index, cells)
+            self._patch(scope, sheet, row_index, lambda snap: snap.with_cell(row_index, col, value))
+
+    def delete(self, scope: str, sheet: str, row_index: int):
+        with self._lock:
+            with self._conn:
+                cur = self._conn.cursor()
+                params = (scope, sheet, row_index)
+                cur.execute(self._sql("DELETE FROM sheet_rows WHERE scope = ? AND sheet = ? AND row_index = ?"), params)
+                cur.execute(self._sql("DELETE FROM sheet_keys WHERE scope = ? AND sheet = ? AND row_index = ?"), params)
+                # Shift following rows up in two steps so the primary key never collides mid-update
+                for table in ("sheet_rows", "sheet_keys"):
+                    cur.execute(self._sql(f"UPDATE {table} SET row_index = -(row_index - 1) WHERE scope = ? AND sheet = ? AND row_index > ?"), params)
+                    cur.execute(self._sql(f"UPDATE {table} SET row_index = -row_index WHERE scope = ? AND sheet = ? AND row_index < 0"), (scope, sheet))
+                cur.execute(self._sql("UPDATE sheet_meta SET row_count = row_count - 1 WHERE scope = ? AND sheet = ? AND row_count > 0"), (scope, sheet))
+            self._patch(scope, sheet, row_index, lambda snap: snap.with_deleted(row_index))
+
+    def drop(self, scope: Optional[str] = None, sheet: Optional[str] = None):
+        """Forget the synced state of one sheet (or all) so the next read re-syncs."""
+        with self._lock, self._conn:
+            cur = self._conn.cursor()
+            if sheet:
+                cur.execute(self._sql("UPDATE sheet_meta SET synced_at = 0 WHERE scope = ? AND sheet = ?"), (scope, sheet))
+            else:
+                cur.execute("UPDATE sheet_meta SET synced_at = 0")
+
+    # --- Helpers (caller holds the lock) ---
+
+    def _patch(self, scope: str, sheet: str, row_index: int, fn: Callable[[SheetSnapshot], SheetSnapshot]):
+        """Apply a committed row write to the decoded snapshot, or drop it if the write is outside it."""
+        snap = self._snapshots.get((scope, sheet))
+        if snap is None:
+            return
+        try:
+            if row_index == 1:
+                raise IndexError("Header row changed")
+            self._snapshots[(scope, sheet)] = fn(snap)
+        except IndexError:
+            del self._snapshots[(scope, sheet)]
+
+    def _set_meta(self, cur, scope: str, sheet: str, row_count: int):
+        cur.execute(
+            self._sql(
+                """INSERT INTO sheet_meta (scope, sheet, row_count, synced_at) VALUES (?, ?, ?, ?)
+                   ON CONFLICT (scope, sheet) DO UPDATE SET row_count = excluded.row_count, synced_at = excluded.synced_at"""
+            ),
+            (scope, sheet, row_count, time.time())
+        )
+
+    def _write_row(self, cur, scope: str, sheet: str, row_index: int, cells: List[str]):
+        cur.execute(
+            self._sql(
+                """INSERT INTO sheet_rows (scope, sheet, row_index, cells) VALUES (?, ?, ?, ?)
+                   ON CONFLICT (scope, sheet, row_index) DO UPDATE SET cells = excluded.cells"""
+            ),
+            (scope, sheet, row_index, json.dumps(cells))
+        )
+        cur.execute(self._sql("DELETE FROM sheet_keys WHERE scope = ? AND sheet = ? AND row_index = ?"), (scope, sheet, row_index))
+        if row_index == 1:
+            # Header changed: column positions may have moved, rebuild every declared index
+            rows = self.read(scope, sheet)
+            cur.execute(self._sql("DELETE FROM sheet_keys WHERE scope = ? AND sheet = ?"), (scope, sheet))
+            for column in self._key_columns(cur, scope, sheet):
+                self._index_column(cur, scope, sheet, column, rows)
+            return
+        headers = self.headers(scope, sheet)
+        for column in self._key_columns(cur, scope, sheet):
+            if column in headers:
+                col_idx = headers.index(column)
+                value = str(cells[col_idx]).strip() if col_idx < len(cells) else ""
+                cur.execute(
+                    self._sql("INSERT INTO sheet_keys (scope, sheet, column_name, key_value, row_index) VALUES (?, ?, ?, ?, ?)"),
+                    (scope, sheet, column, value, row_index)
+                )
+
+    def _key_columns(self, cur, scope: str, sheet: str) -> List[str]:
+        cur.execute(self._sql("SELECT column_name FROM sheet_key_columns WHERE scope = ? AND sheet = ?"), (scope, sheet))
+        return [r[0] for r in cur.fetchall()]
+
+    def _declare_key_column(self, scope: str, sheet: str, column: str):
+        with self._conn:
+            cur = self._conn.cursor()
+            if column in self._key_columns(cur, scope, sheet):
+                return
+            cur.execute(
+                self._sql("INSERT INTO sheet_key_columns (scope, sheet, column_name) VALUES (?, ?, ?)"),
+                (scope, sheet, column)
+            )
+            self._index_column(cur, scope, sheet, column, self.read(scope, sheet))
+
+    def _index_column(self, cur, scope: str, sheet: str, column: str, rows: List[List[Any]]):
+        if not rows:
+            return
+        headers = [str(h).strip() for h in rows[0]]
+        if column not in headers:
+            return
+        col_idx = headers.index(column)
+        cur.executemany(
+            self._sql("INSERT INTO sheet_keys (scope, sheet, column_name, key_value, row_index) VALUES (?, ?, ?, ?, ?)"),
+            [
+                (scope, sheet, column, str(row[col_idx]).strip() if col_idx < len(row) else "", idx + 2)
+                for idx, row in enumerate(rows[1:])
+            ]
+        )
+
+
+class SqlSheetsService:
+    """Sheets service backed by the local SQL mirror.
+
+    With an ``upstream`` GoogleSheetsService, each sheet is pulled into the mirror
+    on first use and re-synced once older than ``sync_seconds``; writes go to
+    Google first and are then applied to the mirror. Without an upstream the
+    mirror is the only store, which lets the whole API run offline.
+    """
+
+    def __init__(self, url: str, upstream=None, sync_seconds: int = 60):
+        self.store = SqlSheetStore(url)
+        self.upstream = upstream
+        self.sync_seconds = sync_seconds
+
+    def _ensure_synced(self, scope: str, sheet_name: str, force: bool = False):
+        if self.upstream is None:
+            # Offline the store is the spreadsheet: a sheet it never held does not exist
+            if self.store.synced_at(scope, sheet_name) is None:
+                raise gspread.exceptions.WorksheetNotFound(sheet_name)
+            return
+        synced_at = self.store.synced_at(scope, sheet_name)
+        if not force and synced_at and time.time() - synced_at < self.sync_seconds:
+            return
+        try:
+            if scope == CRMS_SCOPE:
+                rows = self.upstream.get_crms_all_values(sheet_name)
+            else:
+                rows = self.upstream.get_all_values(sheet_name)
+        except Exception as e:
+            if synced_at is None:
+                raise
+            # Keep serving the last mirrored copy while Google is unreachable
+            logger.warning(f"Mirror sync failed for {scope}/{sheet_name}, serving last copy: {e}")
+            return
+        self.store.replace(scope, sheet_name, rows)
+
+    def _require_sheet(self, scope: str, sheet_name: str):
+        """Offline, a write to a sheet the store never held fails the way it does on Google."""
+        if self.upstream is None:
+            self._ensure_synced(scope, sheet_name)
+
+    # --- Reads ---
+
+    def get_all_values(self, sheet_name: str) -> List[List[str]]:
+        """Get all values from a sheet as 2D list."""
+        self._ensure_synced(HRMS_SCOPE, sheet_name)
+        return self.store.read(HRMS_SCOPE, sheet_name)
+
+    def get_crms_all_values(self, sheet_name: str) -> List[List[str]]:
+        """Get all values from a CRMS sheet as 2D list."""
+        self._ensure_synced(CRMS_SCOPE, sheet_name)
+        return self.store.read(CRMS_SCOPE, sheet_name)
+
+    def get_all_records(self, sheet_name: str, use_cache: bool = True) -> List[Dict[str, Any]]:
+        """Get all records from a sheet as list of dictionaries."""
+        self._ensure_synced(HRMS_SCOPE, sheet_name, force=not use_cache)
+        return self.store.snapshot(HRMS_SCOPE, sheet_name).records
+
+    def get_crms_all_records(self, sheet_name: str, use_cache: bool = True) -> List[Dict[str, Any]]:
+        """Get all records from a CRMS sheet as list of dictionaries."""
+        self._ensure_synced(CRMS_SCOPE, sheet_name, force=not use_cache)
+        return self.store.snapshot(CRMS_SCOPE, sheet_name).records
+
+    def get_many_records(self, sheet_names: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Get records for several sheets (local reads, so no batching needed)."""
+        return {name: self.get_all_records(name) for name in sheet_names}
+
+    def get_crms_many_records(self, sheet_names: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Get records for several CRMS sheets (local reads, so no batching needed)."""
+        return {name: self.get_crms_all_records(name) for name in sheet_names}
+
+    def _get_row_by_id(self, scope: str, sheet_name: str, id_column: str, id_value: str) -> Optional[Dict[str, Any]]:
+        self._ensure_synced(scope, sheet_name)
+        return self.store.snapshot(scope, sheet_name).get(id_column, id_value)
+
+    def get_row_by_id(self, sheet_name: str, id_column: str, id_value: str) -> Optional[Dict[str, Any]]:
+        """Get a single row by ID."""
+        return self._get_row_by_id(HRMS_SCOPE, sheet_name, id_column, id_value)
+
+    def crms_get_row_by_id(self, sheet_name: str, id_column: str, id_value: str) -> Optional[Dict[str, Any]]:
+        """Get a single row by ID from CRMS sheet."""
+        return self._get_row_by_id(CRMS_SCOPE, sheet_name, id_column, id_value)
+
+    def _find_row_index(self, scope: str, sheet_name: str, id_column: str, id_value: str) -> Optional[int]:
+        """Row number of an ID, taken from Google when mirroring.
+
+        Callers write to the returned row, and the mirror can lag the sheet by
+        up to ``sync_seconds``: rows inserted, deleted or sorted in Google since
+        would send the write to the wrong row. Upstream the row is confirmed
+        against the sheet itself; if the mirror disagrees it is re-synced, so
+        the local write lands on the same row as Google's.
+        """
+        self._ensure_synced(scope, sheet_name)
+        local = self.store.find_row(scope, sheet_name, id_column, id_value)
+        if self.upstream is None:
+            return local
+        if scope == CRMS_SCOPE:
+            row = self.upstream.crms_find_row_index(sheet_name, id_column, id_value)
+        else:
+            row = self.upstream.find_row_index(sheet_name, id_column, id_value)
+        if row != local:
+            self._ensure_synced(scope, sheet_name, force=True)
+        return row
+
+    def find_row_index(self, sheet_name: str, id_column: str, id_value: str) -> Optional[int]:
+        """Find the row index (1-based) for a given ID."""
+        return self._find_row_index(HRMS_SCOPE, sheet_name, id_column, id_value)
+
+    def crms_find_row_index(self, sheet_name: str, id_column: str, id_value: str) -> Optional[int]:
+        """Find the row index (1-based) for a given ID in CRMS sheet."""
+        return self._find_row_index(CRMS_SCOPE, sheet_name, id_column, id_value)
+
+    def get_headers(self, sheet_name: str) -> List[str]:
+        """Get the header row (first row) of a sheet."""
+        self._ensure_synced(HRMS_SCOPE, sheet_name)
+        return self.store.read_row(HRMS_SCOPE, sheet_name, 1) or []
+
+    # --- Writes (Google first, then the mirror) ---
+
+    def append_row(self, sheet_name: str, values: List[Any]) -> Dict[str, Any]:
+        """Append a new row to the sheet."""
+        self._ensure_synced(HRMS_SCOPE, sheet_name)
+        if self.upstream:
+            self.upstream.append_row(sheet_name, values)
+        self.store.append(HRMS_SCOPE, sheet_name, values)
+        return {"success": True, "message": "Row added successfully"}
+
+    def crms_append_row(self, sheet_name: str, values: List[Any]) -> Dict[str, Any]:
+        """Append a new row to a CRMS sheet."""
+        self._ensure_synced(CRMS_SCOPE, sheet_name)
+        if self.upstream:
+            self.upstream.crms_append_row(sheet_name, values)
+        self.store.append(CRMS_SCOPE, sheet_name, values)
+        return {"success": True, "message": "Row added successfully"}
+
+    def _append_rows(self, scope: str, sheet_name: str, rows: List[List[Any]]) -> Dict[str, Any]:
+        self._ensure_synced(scope, sheet_name)
+        result = {"success": True, "message": f"Added {len(rows)} rows", "rows": len(rows), "batches": []}
+        if self.upstream:
+            upstream_append = self.upstream.crms_append_rows if scope == CRMS_SCOPE else self.upstream.append_rows
+            result = upstream_append(sheet_name, rows)
+        for values in rows:
+            self.store.append(scope, sheet_name, values)
+        return result
+
+    def append_rows(self, sheet_name: str, rows: List[List[Any]]) -> Dict[str, Any]:
+        """Append many rows (batched upstream)."""
+        return self._append_rows(HRMS_SCOPE, sheet_name, rows)
+
+    def crms_append_rows(self, sheet_name: str, rows: List[List[Any]]) -> Dict[str, Any]:
+        """Append many rows to a CRMS sheet (batched upstream)."""
+        return self._append_rows(CRMS_SCOPE, sheet_name, rows)
+
+    def queue_append(self, sheet_name: str, values: List[Any]) -> Future:
+        """Queue a row append: stored locally now, written to Google with the next upstream batch."""
+        self._ensure_synced(HRMS_SCOPE, sheet_name)
+        self.store.append(HRMS_SCOPE, sheet_name, values)
+        return self.upstream.queue_append(sheet_name, values) if self.upstream else _done(sheet_name)
+
+    def queue_crms_append(self, sheet_name: str, values: List[Any]) -> Future:
+        """Queue a row append to a CRMS sheet (see queue_append)."""
+        self._ensure_synced(CRMS_SCOPE, sheet_name)
+        self.store.append(CRMS_SCOPE, sheet_name, values)
+        return self.upstream.queue_crms_append(sheet_name, values) if self.upstream else _done(sheet_name)
+
+    def queue_update(self, sheet_name: str, row_index: int, values: List[Any]) -> Future:
+        """Queue a row update: stored locally now, written to Google with the next upstream batch."""
+        self._require_sheet(HRMS_SCOPE, sheet_name)
+        self.store.update(HRMS_SCOPE, sheet_name, row_index, values)
+        return self.upstream.queue_update(sheet_name, row_index, values) if self.upstream else _done(sheet_name)
+
+    def queue_crms_update(self, sheet_name: str, row_index: int, values: List[Any]) -> Future:
+        """Queue a row update to a CRMS sheet (see queue_update)."""
+        self._require_sheet(CRMS_SCOPE, sheet_name)
+        self.store.update(CRMS_SCOPE, sheet_name, row_index, values)
+        return self.upstream.queue_crms_update(sheet_name, row_index, values) if self.upstream else _done(sheet_name)
+
+    def flush_writes(self, sheet_name: Optional[str] = None, crms: bool = False) -> List[Dict[str, Any]]:
+        """Flush the upstream write buffer (local writes are never deferred)."""
+        return self.upstream.flush_writes(sheet_name, crms=crms) if self.upstream else []
+
+    def update_row(self, sheet_name: str, row_index: int, values: List[Any]) -> Dict[str, Any]:
+        """Update a row at the given index (1-based)."""
+        self._require_sheet(HRMS_SCOPE, sheet_name)
+        if self.upstream:
+            self.upstream.update_row(sheet_name, row_index, values)
+        self.store.update(HRMS_SCOPE, sheet_name, row_index, values)
+        return {"success": True, "message": "Row updated successfully"}
+
+    def crms_update_row(self, sheet_name: str, row_index: int, values: List[Any]) -> Dict[str, Any]:
+        """Update a row at the given index (1-based) in CRMS sheet."""
+        self._require_sheet(CRMS_SCOPE, sheet_name)
+        if self.upstream:
+            self.upstream.crms_update_row(sheet_name, row_index, values)
+        self.store.update(CRMS_SCOPE, sheet_name, row_index, values)
+        return {"success": True, "message": "Row updated successfully"}
+
+    def update_cell(self, sheet_name: str, row: int, col: int, value: Any) -> Dict[str, Any]:
+        """Update a single cell at the given row and column (1-based)."""
+        self._require_sheet(HRMS_SCOPE, sheet_name)
+        if self.upstream:
+            self.upstream.update_cell(sheet_name, row, col, value)
+        self.store.update_cell(HRMS_SCOPE, sheet_name, row, col, value)
+        return {"success": True, "message": "Cell updated successfully"}
+
+    def update_cells(self, sheet_name: str, cells: List[Tuple[int, int, Any]]) -> Dict[str, Any]:
+        """Update many single cells (row, col, value; 1-based) in one upstream batch."""
+        self._require_sheet(HRMS_SCOPE, sheet_name)
+        result = {"success": True, "message": f"Updated {len(cells)} cells", "updated": len(cells)}
+        if self.upstream:
+            result = self.upstream.update_cells(sheet_name, cells)
+        for row, col, value in cells:
+            self.store.update_cell(HRMS_SCOPE, sheet_name, row, col, value)
+        return result
+
+    def delete_row(self, sheet_name: str, row_index: int) -> Dict[str, Any]:
+        """Delete a row at the given index (1-based)."""
+        self._require_sheet(HRMS_SCOPE, sheet_name)
+        if self.upstream:
+            self.upstream.delete_row(sheet_name, row_index)
+        self.store.delete(HRMS_SCOPE, sheet_name, row_index)
+        return {"success": True, "message": "Row deleted successfully"}
+
+    def crms_delete_row(self, sheet_name: str, row_index: int) -> Dict[str, Any]:
+        """Delete a row at the given index (1-based) in CRMS sheet."""
+        self._require_sheet(CRMS_SCOPE, sheet_name)
+        if self.upstream:
+            self.upstream.crms_delete_row(sheet_name, row_index)
+        self.store.delete(CRMS_SCOPE, sheet_name, row_index)
+        return {"success": True, "message": "Row deleted successfully"}
+
+    def clear_sheet(self, sheet_name: str) -> Dict[str, Any]:
+        """Clear all content from a sheet."""
+        self._require_sheet(HRMS_SCOPE, sheet_name)
+        if self.upstream:
+            self.upstream.clear_sheet(sheet_name)
+        self.store.replace(HRMS_SCOPE, sheet_name, [])
+        return {"success": True, "message": "Sheet cleared successfully"}
+
+    def update_values(self, sheet_name: str, values: List[List[Any]]) -> Dict[str, Any]:
+        """Update multiple rows starting from A1."""
+        self._require_sheet(HRMS_SCOPE, sheet_name)
+        if self.upstream:
+            self.upstream.update_values(sheet_name, values)
+        rows = self.store.read(HRMS_SCOPE, sheet_name)
+        for idx, row in enumerate(values):
+            cells = [cell_text(v) for v in row]
+            if idx < len(rows):
+                cells += rows[idx][len(cells):]
+                rows[idx] = cells
+            else:
+                rows.append(cells)
+        self.store.replace(HRMS_SCOPE, sheet_name, rows)
+        return {"success": True, "message": "Values updated successfully"}
+
+    def create_sheet_if_not_exists(self, sheet_name: str, headers: List[str]) -> bool:
+        """Create a new sheet with headers if it doesn't exist."""
+        if self.upstream:
+            created = self.upstream.create_sheet_if_not_exists(sheet_name, headers)
+            if created:
+                self.store.replace(HRMS_SCOPE, sheet_name, [headers])
+            return created
+        if self.store.synced_at(HRMS_SCOPE, sheet_name) is not None:
+            return False
+        self.store.replace(HRMS_SCOPE, sheet_name, [headers])
+        return True
+
+    def clear_cache(self, sheet_name: Optional[str] = None):
+        """Force a re-sync of a specific sheet or all sheets on next read."""
+        if self.upstream is None:
+            return
+        self.store.drop(HRMS_SCOPE, sheet_name)
+        self.upstream.clear_cache(sheet_name)
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Cache counters of the upstream Google service (empty when running offline)."""
+        return self.upstream.cache_stats() if self.upstream else {}
+
+    def sync_stats(self) -> Dict[str, Any]:
+        """Delta sync counters of the upstream Google service (empty when running offline)."""
+        return self.upstream.sync_stats() if self.upstream else {}
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Client pool gauges of the upstream Google service (empty when running offline)."""
+        return self.upstream.pool_stats() if self.upstream else {}
+
+    def write_stats(self) -> Dict[str, Any]:
+        """Write buffer counters of the upstream Google service (empty when running offline)."""
+        return self.upstream.write_stats() if self.upstream else {}
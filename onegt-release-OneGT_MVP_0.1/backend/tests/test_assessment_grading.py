@@ -0,0 +1,98 @@
+import pytest
+
+from services.assessment_grading import grade_submission, index_answers
+
+SINGLE = [
+    {"id": "q1", "correct_option_id": "a", "explanation": "A is right"},
+    {"id": "q2", "correct_option_id": "b"},
+    {"id": "q3", "correct_option_id": "c"},
+    {"id": "q4", "correct_option_id": "d"},
+]
+
+
+def test_single_choice_scores_percentage_of_correct_answers():
+    graded = grade_submission(SINGLE, [
+        {"question_id": "q1", "option_id": "a"},
+        {"question_id": "q2", "option_id": "x"},
+        {"question_id": "q3", "option_id": "c"},
+        {"question_id": "q4", "option_id": "d"},
+    ])
+    assert graded.score == 75.0
+    assert graded.correct_count == 3
+    assert (graded.points_awarded, graded.points_possible) == (3.0, 4.0)
+    assert graded.detailed[0] == {
+        "question_id": "q1", "submitted": "a", "correct": "a", "is_correct": True,
+        "points_awarded": 1.0, "points_possible": 1.0, "explanation": "A is right",
+    }
+    assert graded.detailed[1]["is_correct"] is False
+
+
+def test_unanswered_questions_score_nothing():
+    graded = grade_submission(SINGLE, [{"question_id": "q2", "option_id": "b"}])
+    assert graded.score == 25.0
+    assert [d["submitted"] for d in graded.detailed] == ["", "b", "", ""]
+    assert grade_submission(SINGLE, []).score == 0.0
+
+
+def test_answers_to_unknown_questions_and_malformed_entries_are_ignored():
+    graded = grade_submission(SINGLE[:1], [
+        "junk", {"option_id": "a"}, {"question_id": "q9", "option_id": "a"}, {"question_id": "q1", "option_id": "a"},
+    ])
+    assert graded.score == 100.0
+
+
+def test_first_answer_to_a_question_counts():
+    answers = [{"question_id": "q1", "option_id": "a"}, {"question_id": "q1", "option_id": "z"}]
+    assert index_answers(answers)["q1"]["option_id"] == "a"
+    assert grade_submission(SINGLE[:1], answers).correct_count == 1
+    assert grade_submission(SINGLE[:1], list(reversed(answers))).correct_count == 0
+
+
+def test_points_weight_questions():
+    questions = [
+        {"id": "q1", "correct_option_id": "a", "points": 3},
+        {"id": "q2", "correct_option_id": "b", "points": 1},
+        {"id": "q3", "correct_option_id": "c", "points": 0},
+    ]
+    graded = grade_submission(questions, [
+        {"question_id": "q1", "option_id": "a"},
+        {"question_id": "q3", "option_id": "c"},
+    ])
+    assert (graded.points_awarded, graded.points_possible) == (3.0, 4.0)
+    assert graded.score == 75.0
+    assert graded.correct_count == 2
+
+
+def test_select_all_that_apply_gets_partial_credit():
+    questions = [{"id": "q1", "correct_option_ids": ["a", "b", "c", "d"], "points": 2}]
+
+    def score(option_ids):
+        return grade_submission(questions, [{"question_id": "q1", "option_ids": option_ids}])
+
+    assert score(["a", "b", "c", "d"]).score == 100.0
+    assert score(["a", "b", "c", "d"]).correct_count == 1
+    half = score(["a", "b"])
+    assert (half.points_awarded, half.score, half.correct_count) == (1.0, 50.0, 0)
+    # Wrong picks take credit away, never below zero
+    assert score(["a", "b", "x"]).points_awarded == 0.5
+    assert score(["x", "y", "z"]).points_awarded == 0.0
+    assert score([]).points_awarded == 0.0
+
+
+def test_select_all_that_apply_accepts_a_single_option_id():
+    questions = [{"id": "q1", "correct_option_ids": ["a", "b"]}]
+    graded = grade_submission(questions, [{"question_id": "q1", "option_id": "a"}])
+    assert graded.score == 50.0
+    assert graded.detailed[0]["submitted"] == ["a"]
+
+
+@pytest.mark.parametrize("option_ids", ["ab", {"a": 1}, 7, [["a"]]])
+def test_option_ids_must_be_a_list_of_ids(option_ids):
+    questions = [{"id": "q1", "correct_option_ids": ["a", "b"]}]
+    with pytest.raises(ValueError):
+        grade_submission(questions, [{"question_id": "q1", "option_ids": option_ids}])
+
+
+def test_no_questions_scores_zero():
+    graded = grade_submission([], [{"question_id": "q1", "option_id": "a"}])
+    assert (graded.score, graded.correct_count, graded.points_possible, graded.detailed) == (0.0, 0, 0.0, [])
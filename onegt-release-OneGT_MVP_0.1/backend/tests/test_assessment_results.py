@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+from config import settings
+import utils.assessment_db as adb
+
+
+def _database_url(tmp_path_factory):
+    url = os.environ.get("ASSESSMENT_TEST_DATABASE_URL")
+    if url:
+        return url
+    pgserver = pytest.importorskip("pgserver", reason="set ASSESSMENT_TEST_DATABASE_URL or install pgserver")
+    return pgserver.get_server(str(tmp_path_factory.mktemp("pgdata"))).get_uri()
+
+
+@pytest.fixture(scope="module")
+def database_url(tmp_path_factory):
+    return _database_url(tmp_path_factory)
+
+
+@pytest.fixture
+def legacy_results(database_url, monkeypatch):
+    """A results table from before the attempt columns, holding the given rows."""
+    conn = psycopg2.connect(database_url)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public")
+        cur.execute("CREATE TABLE assessments (assessment_id TEXT PRIMARY KEY, retake_permissions TEXT[])")
+        cur.execute(
+            "CREATE TABLE results (id SERIAL PRIMARY KEY, assessment_id TEXT, user_id TEXT, result JSONB, timestamp TEXT)"
+        )
+    monkeypatch.setattr(settings, "ASSESSMENT_DATABASE_URL", database_url)
+    monkeypatch.setattr(adb, "_pool", None)
+    monkeypatch.setattr(adb, "_attempt_columns", None)
+
+    def insert(*results):
+        with conn.cursor() as cur:
+            for result in results:
+                cur.execute(
+                    "INSERT INTO results (assessment_id, user_id, result, timestamp) VALUES (%s, %s, %s::jsonb, now()::text)",
+                    (result["assessment_id"], result["user_id"], json.dumps(result)),
+                )
+
+    yield insert
+    adb.get_pool().closeall()
+    conn.close()
+
+
+def _result(user_id, score, total_questions=5, **analytics):
+    return {
+        "assessment_id": "a1", "user_id": user_id, "score": score, "max_score": 10,
+        "total_questions": total_questions, "analytics": analytics,
+    }
+
+
+def test_analytics_skip_non_numeric_legacy_values(legacy_results):
+    legacy_results(
+        _result("u1", 8, time_taken_seconds=30),
+        _result("u2", "N/A", time_taken_seconds=""),
+        _result("u3", "", total_questions="abc"),
+        _result("u4", 4, time_taken_seconds="soon", avg_time_per_question_seconds=2),
+    )
+    adb.init_db()
+
+    [stats] = adb.get_result_analytics(["a1"])
+    assert (stats["attempts"], stats["unique_users"]) == (3, 3)
+    assert stats["score_sum"] == 12.0
+    assert (stats["score_min"], stats["score_max"]) == (0.0, 8.0)
+    assert stats["time_sum"] == 30.0
+    assert adb.get_user_attempt_count("a1", "u3") == 0
+
+
+def test_analytics_build_when_the_migration_falls_back(legacy_results, monkeypatch):
+    legacy_results(_result("u1", "N/A"), _result("u2", 6))
+    monkeypatch.setattr(adb, "RESULT_COLUMNS_MIGRATION", adb.RESULT_COLUMNS_MIGRATION + ["SELECT 1 / 0"])
+    adb.init_db()
+
+    assert adb._attempt_columns is False
+    [stats] = adb.get_result_analytics(["a1"])
+    assert (stats["attempts"], stats["score_sum"]) == (2, 6.0)
+    assert adb.get_user_attempt_count("a1", "u1") == 1
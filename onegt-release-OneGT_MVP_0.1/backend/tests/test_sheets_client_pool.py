@@ -0,0 +1,98 @@
+import threading
+
+import gspread
+import pytest
+
+from services.google_sheets import GoogleSheetsService
+from services.sheets_client_pool import ClientPool
+
+
+class FakeWorksheet:
+    def __init__(self, client, title):
+        self.client = client
+        self.title = title
+
+    def get_all_values(self):
+        # Every API call must run on a client its caller holds
+        assert self.client.leased, "worksheet used outside a lease"
+        assert threading.get_ident() == self.client.leased
+        return [["ID"], ["L1"]]
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, sheets):
+        self.client = client
+        self.sheets = sheets
+        self.id = "ss"
+
+    def worksheet(self, title):
+        if title not in self.sheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        self.client.opened.append(title)
+        return FakeWorksheet(self.client, title)
+
+
+class FakeClient:
+    def __init__(self):
+        self.leased = None
+        self.opened = []
+
+    def open_by_key(self, key):
+        self.opened.append(key)
+        return FakeSpreadsheet(self, {"Leads"})
+
+
+class TrackingPool(ClientPool):
+    def acquire(self):
+        client = super().acquire()
+        assert client.leased is None, "client leased twice"
+        client.leased = threading.get_ident()
+        return client
+
+    def release(self, client):
+        client.leased = None
+        super().release(client)
+
+
+@pytest.fixture
+def service():
+    svc = object.__new__(GoogleSheetsService)
+    svc._pool = TrackingPool(FakeClient, size=2, warmup=0)
+    svc._opened.clear()
+    yield svc
+    svc._opened.clear()
+
+
+def test_worksheet_calls_run_on_a_leased_client(service):
+    sheet = service._get_worksheet("ss", "Leads")
+    assert sheet.get_all_values() == [["ID"], ["L1"]]
+    assert sheet.title == "Leads"
+    stats = service._pool.stats()
+    assert stats["in_use"] == 0
+    assert stats["leases"] == 3
+
+
+def test_worksheets_are_opened_once_per_client(service):
+    sheet = service._get_worksheet("ss", "Leads")
+    barrier = threading.Barrier(2)
+
+    def read():
+        with service._pool.lease():
+            barrier.wait()  # both clients held at once
+        for _ in range(5):
+            sheet.get_all_values()
+
+    threads = [threading.Thread(target=read) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    clients = list(service._opened)
+    assert len(clients) == 2
+    assert all(client.opened == ["ss", "Leads"] for client in clients)
+
+
+def test_missing_worksheet_raises_on_lookup(service):
+    with pytest.raises(gspread.exceptions.WorksheetNotFound):
+        service._get_worksheet("ss", "Nope")
+    assert service._pool.stats()["in_use"] == 0
@@ -0,0 +1,178 @@
+import gspread
+import pytest
+
+from services.sql_sheets import SqlSheetsService
+
+HEADERS = ["ID", "Name", "Status", "Amount"]
+
+
+@pytest.fixture
+def service():
+    svc = SqlSheetsService("sqlite:///:memory:")
+    svc.create_sheet_if_not_exists("Leads", HEADERS)
+    svc.append_row("Leads", ["L1", "Acme", "DRAFT", 10])
+    svc.append_row("Leads", ["L2", "Globex", "DRAFT", 2.5])
+    svc.append_row("Leads", ["L3", "Initech", "APPROVED", 7.0])
+    return svc
+
+
+class FakeUpstream:
+    def __init__(self, sheets):
+        self.sheets = sheets
+        self.fetches = 0
+        self.fail = False
+
+    def get_all_values(self, sheet_name):
+        self.fetches += 1
+        if self.fail:
+            raise ConnectionError("Google unreachable")
+        if sheet_name not in self.sheets:
+            raise gspread.exceptions.WorksheetNotFound(sheet_name)
+        return [list(row) for row in self.sheets[sheet_name]]
+
+    def find_row_index(self, sheet_name, id_column, id_value):
+        rows = self.sheets[sheet_name]
+        col = rows[0].index(id_column)
+        for idx, row in enumerate(rows[1:], start=2):
+            if row[col] == id_value:
+                return idx
+        return None
+
+    def update_row(self, sheet_name, row_index, values):
+        self.sheets[sheet_name][row_index - 1] = [str(v) for v in values]
+
+    def delete_row(self, sheet_name, row_index):
+        del self.sheets[sheet_name][row_index - 1]
+
+
+def test_reads_records_with_sheets_cell_text(service):
+    assert service.get_all_records("Leads") == [
+        {"ID": "L1", "Name": "Acme", "Status": "DRAFT", "Amount": "10"},
+        {"ID": "L2", "Name": "Globex", "Status": "DRAFT", "Amount": "2.5"},
+        {"ID": "L3", "Name": "Initech", "Status": "APPROVED", "Amount": "7"},
+    ]
+    assert service.get_all_values("Leads")[0] == HEADERS
+    assert service.get_headers("Leads") == HEADERS
+
+
+def test_repeated_reads_return_the_same_records(service):
+    first = service.get_all_records("Leads")
+    assert service.get_all_records("Leads") is first
+
+
+def test_find_row_index_and_get_row_by_id(service):
+    assert service.find_row_index("Leads", "ID", "L2") == 3
+    assert service.find_row_index("Leads", "ID", " L3 ") == 4
+    assert service.find_row_index("Leads", "ID", "L9") is None
+    assert service.find_row_index("Leads", "Missing", "L1") is None
+    assert service.get_row_by_id("Leads", "ID", "L1")["Name"] == "Acme"
+    assert service.get_row_by_id("Leads", "ID", "L9") is None
+
+
+def test_append_is_visible_to_reads_and_lookups(service):
+    before = service.get_all_records("Leads")
+    service.append_row("Leads", ["L4", "Umbrella", True, None])
+    records = service.get_all_records("Leads")
+    assert records is not before
+    assert len(before) == 3
+    assert records[-1] == {"ID": "L4", "Name": "Umbrella", "Status": "TRUE", "Amount": ""}
+    assert service.find_row_index("Leads", "ID", "L4") == 5
+
+
+def test_update_row_keeps_cells_beyond_the_written_range(service):
+    service.get_all_records("Leads")
+    service.update_row("Leads", 3, ["L2", "Globex Corp"])
+    assert service.get_row_by_id("Leads", "ID", "L2") == {
+        "ID": "L2", "Name": "Globex Corp", "Status": "DRAFT", "Amount": "2.5"
+    }
+    assert service.get_all_values("Leads")[2] == ["L2", "Globex Corp", "DRAFT", "2.5"]
+
+
+def test_update_cell_and_changed_id(service):
+    service.get_all_records("Leads")
+    service.update_cell("Leads", 2, 3, "APPROVED")
+    service.update_row("Leads", 4, ["L30"])
+    assert service.get_row_by_id("Leads", "ID", "L1")["Status"] == "APPROVED"
+    assert service.find_row_index("Leads", "ID", "L3") is None
+    assert service.find_row_index("Leads", "ID", "L30") == 4
+    assert service.get_row_by_id("Leads", "ID", "L30")["Name"] == "Initech"
+
+
+def test_delete_row_shifts_later_rows_up(service):
+    service.get_all_records("Leads")
+    service.delete_row("Leads", 2)
+    assert [r["ID"] for r in service.get_all_records("Leads")] == ["L2", "L3"]
+    assert service.find_row_index("Leads", "ID", "L1") is None
+    assert service.find_row_index("Leads", "ID", "L3") == 3
+    service.append_row("Leads", ["L5", "Hooli", "DRAFT", 1])
+    assert service.find_row_index("Leads", "ID", "L5") == 4
+
+
+def test_crms_sheets_are_separate(service):
+    service.store.replace("crms", "Leads", [HEADERS, ["C1", "Crm", "OPEN", "1"]])
+    assert [r["ID"] for r in service.get_crms_all_records("Leads")] == ["C1"]
+    service.crms_append_row("Leads", ["C2", "Crm 2", "OPEN", 2])
+    assert service.crms_find_row_index("Leads", "ID", "C2") == 3
+    assert service.crms_get_row_by_id("Leads", "ID", "L1") is None
+    assert len(service.get_all_records("Leads")) == 3
+
+
+def test_missing_sheet_raises_worksheet_not_found(service):
+    with pytest.raises(gspread.exceptions.WorksheetNotFound):
+        service.get_all_records("Nope")
+    with pytest.raises(gspread.exceptions.WorksheetNotFound):
+        service.get_crms_all_records("Nope")
+    with pytest.raises(gspread.exceptions.WorksheetNotFound):
+        service.find_row_index("Nope", "ID", "L1")
+    with pytest.raises(gspread.exceptions.WorksheetNotFound):
+        service.append_row("Nope", ["X"])
+    with pytest.raises(gspread.exceptions.WorksheetNotFound):
+        service.update_row("Nope", 2, ["X"])
+    with pytest.raises(gspread.exceptions.WorksheetNotFound):
+        service.delete_row("Nope", 2)
+
+
+def test_create_sheet_if_not_exists(service):
+    assert service.create_sheet_if_not_exists("Leads", HEADERS) is False
+    assert service.create_sheet_if_not_exists("Notes", ["ID", "Text"]) is True
+    assert service.get_all_records("Notes") == []
+
+
+def test_mirror_syncs_from_upstream_and_serves_last_copy_when_unreachable():
+    upstream = FakeUpstream({"Leads": [HEADERS, ["L1", "Acme", "DRAFT", "10"]]})
+    svc = SqlSheetsService("sqlite:///:memory:", upstream=upstream, sync_seconds=60)
+    records = svc.get_all_records("Leads")
+    assert records[0]["Status"] == "DRAFT"
+    assert svc.get_all_records("Leads") is records
+    assert upstream.fetches == 1
+
+    upstream.sheets["Leads"][1][2] = "APPROVED"
+    assert svc.get_all_records("Leads", use_cache=False)[0]["Status"] == "APPROVED"
+    assert upstream.fetches == 2
+
+    upstream.fail = True
+    assert svc.get_all_records("Leads", use_cache=False)[0]["Status"] == "APPROVED"
+    with pytest.raises(gspread.exceptions.WorksheetNotFound):
+        upstream.fail = False
+        svc.get_all_records("Nope")
+
+
+def test_mirror_writes_to_the_row_google_holds_after_rows_shift():
+    upstream = FakeUpstream({"Leads": [HEADERS, ["L1", "Acme", "DRAFT", "10"], ["L2", "Globex", "DRAFT", "2.5"]]})
+    svc = SqlSheetsService("sqlite:///:memory:", upstream=upstream, sync_seconds=60)
+    assert svc.find_row_index("Leads", "ID", "L2") == 3
+
+    # Another replica inserts a row above L2 before the mirror re-syncs
+    upstream.sheets["Leads"].insert(1, ["L0", "Umbrella", "DRAFT", "1"])
+    row = svc.find_row_index("Leads", "ID", "L2")
+    assert row == 4
+    svc.update_row("Leads", row, ["L2", "Globex", "APPROVED", "2.5"])
+    assert upstream.sheets["Leads"][1] == ["L0", "Umbrella", "DRAFT", "1"]
+    assert upstream.sheets["Leads"][3] == ["L2", "Globex", "APPROVED", "2.5"]
+    assert svc.get_row_by_id("Leads", "ID", "L2")["Status"] == "APPROVED"
+    assert svc.get_row_by_id("Leads", "ID", "L0")["Status"] == "DRAFT"
+
+    svc.delete_row("Leads", svc.find_row_index("Leads", "ID", "L0"))
+    assert [r[0] for r in upstream.sheets["Leads"][1:]] == ["L1", "L2"]
+    assert [r["ID"] for r in svc.get_all_records("Leads")] == ["L1", "L2"]
+    assert upstream.fetches == 2
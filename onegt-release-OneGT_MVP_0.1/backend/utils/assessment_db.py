@@ -6,6 +6,10 @@ import os
 import json
 import uuid
 import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
 from datetime import datetime, timezone
 from typing import Any, List, Optional, Dict
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
@@ -14,6 +18,7 @@ import psycopg2
 import psycopg2.extras
 from psycopg2 import pool as pg_pool
 from config import settings
+from services.cache_bus import cache_bus
 
 logger = logging.getLogger("chrms.assessment.db")
 
@@ -38,7 +43,7 @@ def get_pool() -> pg_pool.ThreadedConnectionPool:
         kwargs = {}
         if schema:
             kwargs["options"] = f"-c search_path={schema},public"
-        _pool = pg_pool.ThreadedConnectionPool(2, 20, url, **kwargs)
+        _pool = pg_pool.ThreadedConnectionPool(2, settings.ASSESSMENT_DB_POOL_SIZE, url, **kwargs)
     return _pool
 
 def get_conn():
@@ -47,6 +52,237 @@ def get_conn():
 def put_conn(conn):
     get_pool().putconn(conn)
 
+def connect():
+    """A connection outside the pool, for long-lived sessions such as LISTEN."""
+    url, schema = _get_clean_url_and_schema(settings.ASSESSMENT_DATABASE_URL)
+    kwargs = {}
+    if schema:
+        kwargs["options"] = f"-c search_path={schema},public"
+    return psycopg2.connect(url, **kwargs)
+
+# Numbers read from the JSON payload; values that are not numbers read as NULL
+_JSON_INT = "CASE WHEN {0} ~ '^\\s*-?\\d+\\s*$' THEN ({0})::int END"
+_JSON_FLOAT = "CASE WHEN {0} ~ '^\\s*-?(\\d+\\.?\\d*|\\.\\d+)([eE][-+]?\\d+)?\\s*$' THEN ({0})::float END"
+_SCORE = _JSON_FLOAT.format("result->>'score'")
+_TOTAL_QUESTIONS = "COALESCE(" + _JSON_INT.format("result->>'total_questions'") + ", 0)"
+
+# Hot queries, prepared once per pooled connection and then run with EXECUTE
+PREPARED_STATEMENTS = {
+    "get_user_by_id": "SELECT * FROM users WHERE id = $1",
+    "get_assessment": "SELECT * FROM assessments WHERE assessment_id = $1",
+    # Index-only on results_attempts_idx
+    "count_attempts": (
+        "SELECT COUNT(*) FROM results WHERE assessment_id = $1 AND user_id = $2 AND status = 'graded'"
+    ),
+    # Turn the started placeholder (if any) into the graded attempt
+    "complete_started_result": (
+        "UPDATE results SET result = $3::jsonb, timestamp = $4, status = $5, attempt_number = $6, score = $7 "
+        "WHERE assessment_id = $1 AND user_id = $2 AND status = 'started' RETURNING id"
+    ),
+    "insert_result": (
+        "INSERT INTO results (assessment_id, user_id, result, timestamp, status, attempt_number, score) "
+        "VALUES ($1, $2, $3::jsonb, $4, $5, $6, $7)"
+    ),
+    # The same, reading attempts from the JSON payload, for a results table without the attempt columns
+    "count_attempts_json": (
+        "SELECT COUNT(*) FROM results WHERE assessment_id = $1 AND user_id = $2 "
+        f"AND {_TOTAL_QUESTIONS} > 0"
+    ),
+    "find_placeholder_result_json": (
+        "SELECT id FROM results WHERE assessment_id = $1 AND user_id = $2 "
+        f"AND {_TOTAL_QUESTIONS} = 0"
+    ),
+    "update_result_json": "UPDATE results SET result = $1::jsonb, timestamp = $2 WHERE id = $3",
+    "insert_result_json": "INSERT INTO results (assessment_id, user_id, result, timestamp) VALUES ($1, $2, $3::jsonb, $4)",
+}
+
+# Connection -> names prepared on it (entries go away with closed connections)
+_prepared: "weakref.WeakKeyDictionary[Any, set]" = weakref.WeakKeyDictionary()
+
+def _execute_prepared(cur, name: str, params: tuple):
+    """Run a statement of PREPARED_STATEMENTS, preparing it on this connection first if needed."""
+    prepared = _prepared.setdefault(cur.connection, set())
+    if name not in prepared:
+        cur.execute(f"PREPARE {name} AS {PREPARED_STATEMENTS[name]}")
+        prepared.add(name)
+    cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+
+# Attempt bookkeeping as columns of results, so attempt checks do not parse the JSON:
+# status is 'started' for the placeholder written when an attempt begins and 'graded' once
+# submitted ('duplicate' for extra placeholders found by the migration), attempt_number numbers
+# a user's graded attempts (0 while started). At most one started row per (assessment, user),
+# which makes starting an attempt a single upsert.
+#
+# A one-time migration: init_db runs it in one transaction, under a lock, only while the
+# columns or indexes are missing (see _results_migrated). Until it has succeeded, attempts
+# keep being read from the JSON payload.
+RESULT_COLUMNS_MIGRATION = [
+    "ALTER TABLE results ADD COLUMN IF NOT EXISTS status TEXT",
+    "ALTER TABLE results ADD COLUMN IF NOT EXISTS attempt_number INTEGER",
+    "ALTER TABLE results ADD COLUMN IF NOT EXISTS score DOUBLE PRECISION",
+    # Backfill rows written before the columns existed (graded ones have total_questions > 0)
+    f"""UPDATE results r SET status = b.status, attempt_number = b.attempt_number, score = b.score
+       FROM (
+           SELECT id,
+                  CASE WHEN graded THEN 'graded' ELSE 'started' END AS status,
+                  CASE WHEN graded THEN ROW_NUMBER() OVER (PARTITION BY assessment_id, user_id, graded ORDER BY timestamp, id)
+                       ELSE 0 END AS attempt_number,
+                  CASE WHEN graded THEN COALESCE({_SCORE}, 0) END AS score
+           FROM (SELECT *, {_TOTAL_QUESTIONS} > 0 AS graded FROM results) t
+       ) b
+       WHERE r.id = b.id AND r.status IS NULL""",
+    # Concurrent starts may have left several placeholders; keep the first as the started one
+    """UPDATE results r SET status = 'duplicate'
+       FROM results o
+       WHERE r.status = 'started' AND o.status = 'started'
+         AND r.assessment_id = o.assessment_id AND r.user_id = o.user_id AND r.id > o.id""",
+    "ALTER TABLE results ALTER COLUMN status SET DEFAULT 'started'",
+    "ALTER TABLE results ALTER COLUMN status SET NOT NULL",
+    "ALTER TABLE results ALTER COLUMN attempt_number SET DEFAULT 0",
+    "ALTER TABLE results ALTER COLUMN attempt_number SET NOT NULL",
+    "CREATE INDEX IF NOT EXISTS results_attempts_idx ON results (assessment_id, user_id, status)",
+    """CREATE UNIQUE INDEX IF NOT EXISTS results_started_idx ON results (assessment_id, user_id)
+       WHERE status = 'started'""",
+]
+
+def _results_migrated(cur) -> bool:
+    """Whether results has the attempt columns and their indexes."""
+    cur.execute(
+        """SELECT COUNT(*) FROM information_schema.columns
+           WHERE table_name = 'results' AND table_schema = ANY(current_schemas(false))
+             AND column_name IN ('status', 'attempt_number', 'score')"""
+    )
+    if cur.fetchone()[0] < 3:
+        return False
+    return not _missing_tables(cur, ["results_attempts_idx", "results_started_idx"])
+
+# Whether the attempt columns are in use (None until checked on a connection)
+_attempt_columns: Optional[bool] = None
+
+def _use_attempt_columns(cur) -> bool:
+    global _attempt_columns
+    if _attempt_columns is None:
+        _attempt_columns = _results_migrated(cur)
+    return _attempt_columns
+
+def migrate_results(conn) -> bool:
+    """Add the attempt columns to results if they are missing; True once they are in place.
+
+    Every worker runs this at start-up, so it only checks unless the migration
+    is still due, and an advisory lock lets one worker run it while the others
+    wait. A failure rolls the whole migration back and is logged; attempts
+    are then read from the JSON payload as before the migration.
+    """
+    global _attempt_columns
+    try:
+        with conn.cursor() as cur:
+            if not _results_migrated(cur):
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext('assessment:migrate_results'))")
+                if not _results_migrated(cur):
+                    logger.info("Migrating results to attempt columns (one-time)")
+                    for statement in RESULT_COLUMNS_MIGRATION:
+                        cur.execute(statement)
+            conn.commit()
+        _attempt_columns = True
+    except Exception as e:
+        conn.rollback()
+        _attempt_columns = False
+        logger.error(f"❌ Results migration to attempt columns failed, attempt checks keep reading the JSON payload: {e}")
+    return _attempt_columns
+
+# Result analytics kept up to date by save_graded_result, so reading them does not scan results:
+# per-assessment totals, per-(assessment, user) attempt counts and a score histogram (for the median)
+RESULT_STATS_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS assessment_result_stats (
+        assessment_id TEXT PRIMARY KEY,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        unique_users INTEGER NOT NULL DEFAULT 0,
+        score_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        score_percent_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        score_min DOUBLE PRECISION,
+        score_max DOUBLE PRECISION,
+        time_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        time_per_question_sum DOUBLE PRECISION NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS assessment_result_users (
+        assessment_id TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (assessment_id, user_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS assessment_score_counts (
+        assessment_id TEXT NOT NULL,
+        score DOUBLE PRECISION NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (assessment_id, score)
+    )""",
+]
+
+# Graded results only, not the placeholders written when an attempt starts
+_MAX_SCORE = _JSON_FLOAT.format("result->>'max_score'")
+_TIME_TAKEN = _JSON_FLOAT.format("result->'analytics'->>'time_taken_seconds'")
+_TIME_PER_QUESTION = _JSON_FLOAT.format("result->'analytics'->>'avg_time_per_question_seconds'")
+_GRADED_RESULTS = f"""SELECT assessment_id::text AS assessment_id, user_id::text AS user_id,
+        COALESCE({_SCORE}, 0) AS score,
+        COALESCE({_SCORE}, 0) * 100 / GREATEST(COALESCE({_MAX_SCORE}, 100), 1) AS score_percent,
+        COALESCE({_TIME_TAKEN}, 0) AS time_taken,
+        COALESCE({_TIME_PER_QUESTION}, 0) AS time_per_question
+    FROM results WHERE {{graded}}"""
+
+def _graded_filter(cur) -> str:
+    return "status = 'graded'" if _use_attempt_columns(cur) else f"{_TOTAL_QUESTIONS} > 0"
+
+def rebuild_result_stats(cur) -> None:
+    """Recompute the result analytics tables from the results table."""
+    graded_results = _GRADED_RESULTS.format(graded=_graded_filter(cur))
+    cur.execute("DELETE FROM assessment_result_stats")
+    cur.execute("DELETE FROM assessment_result_users")
+    cur.execute("DELETE FROM assessment_score_counts")
+    cur.execute(f"""INSERT INTO assessment_result_users (assessment_id, user_id, attempts)
+        SELECT assessment_id, user_id, COUNT(*) FROM ({graded_results}) g GROUP BY assessment_id, user_id""")
+    cur.execute(f"""INSERT INTO assessment_score_counts (assessment_id, score, attempts)
+        SELECT assessment_id, score, COUNT(*) FROM ({graded_results}) g GROUP BY assessment_id, score""")
+    cur.execute(f"""INSERT INTO assessment_result_stats
+        (assessment_id, attempts, unique_users, score_sum, score_percent_sum, score_min, score_max, time_sum, time_per_question_sum)
+        SELECT assessment_id, COUNT(*), COUNT(DISTINCT user_id), SUM(score), SUM(score_percent), MIN(score), MAX(score),
+               SUM(time_taken), SUM(time_per_question)
+        FROM ({graded_results}) g GROUP BY assessment_id""")
+
+def _record_result_stats(cur, result: dict) -> None:
+    """Add one graded result to the analytics tables (same transaction as the result)."""
+    aid, uid = str(result["assessment_id"]), str(result["user_id"])
+    score = float(result.get("score") or 0)
+    score_percent = score * 100 / max(float(result.get("max_score") or 100), 1)
+    analytics = result.get("analytics") or {}
+    cur.execute(
+        """INSERT INTO assessment_result_users (assessment_id, user_id, attempts) VALUES (%s, %s, 1)
+           ON CONFLICT (assessment_id, user_id) DO UPDATE SET attempts = assessment_result_users.attempts + 1
+           RETURNING attempts""",
+        (aid, uid)
+    )
+    new_user = 1 if cur.fetchone()[0] == 1 else 0
+    cur.execute(
+        """INSERT INTO assessment_score_counts (assessment_id, score, attempts) VALUES (%s, %s, 1)
+           ON CONFLICT (assessment_id, score) DO UPDATE SET attempts = assessment_score_counts.attempts + 1""",
+        (aid, score)
+    )
+    cur.execute(
+        """INSERT INTO assessment_result_stats AS s
+           (assessment_id, attempts, unique_users, score_sum, score_percent_sum, score_min, score_max, time_sum, time_per_question_sum)
+           VALUES (%s, 1, %s, %s, %s, %s, %s, %s, %s)
+           ON CONFLICT (assessment_id) DO UPDATE SET
+               attempts = s.attempts + 1,
+               unique_users = s.unique_users + excluded.unique_users,
+               score_sum = s.score_sum + excluded.score_sum,
+               score_percent_sum = s.score_percent_sum + excluded.score_percent_sum,
+               score_min = LEAST(s.score_min, excluded.score_min),
+               score_max = GREATEST(s.score_max, excluded.score_max),
+               time_sum = s.time_sum + excluded.time_sum,
+               time_per_question_sum = s.time_per_question_sum + excluded.time_per_question_sum""",
+        (aid, new_user, score, score_percent, score, score,
+         float(analytics.get("time_taken_seconds") or 0), float(analytics.get("avg_time_per_question_seconds") or 0))
+    )
+
 def init_db():
     """Run assessment_schema.sql to create tables if they don't exist."""
     schema_path = os.path.join(
@@ -65,9 +301,26 @@ def init_db():
     except Exception as e:
         conn.rollback()
         logger.error(f"❌ Assessment schema init error: {e}")
+    migrate_results(conn)
+    try:
+        with conn.cursor() as cur:
+            created = _missing_tables(cur, ["assessment_result_stats", "assessment_result_users", "assessment_score_counts"])
+            for statement in RESULT_STATS_SCHEMA:
+                cur.execute(statement)
+            if created:
+                # First start with the analytics tables: fill them from the existing results
+                rebuild_result_stats(cur)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"❌ Assessment analytics init error: {e}")
     finally:
         put_conn(conn)
 
+def _missing_tables(cur, names: List[str]) -> bool:
+    cur.execute("SELECT COUNT(*) FROM unnest(%s::text[]) AS t(name) WHERE to_regclass(t.name) IS NULL", (names,))
+    return cur.fetchone()[0] > 0
+
 psycopg2.extras.register_uuid()
 
 def _now_iso() -> str:
@@ -76,6 +329,14 @@ def _now_iso() -> str:
 def _gen_id() -> str:
     return str(uuid.uuid4())
 
+def _serialise(obj: Any) -> Any:
+    """Make a DB value JSON-friendly (datetimes and UUIDs to strings)."""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    return obj
+
 def _parse_json(val: Any) -> Any:
     if isinstance(val, str):
         try:
@@ -85,6 +346,26 @@ def _parse_json(val: Any) -> Any:
     return val
 
 # --- User Management ---
+
+# associate_id -> ((role, name), user row, synced_at): users already in step with their token.
+# Bounded LRU; entries expire after ASSESSMENT_USER_SYNC_TTL_SECONDS and are dropped
+# on any write to the user (here, or in another worker through the cache bus).
+_synced_users: "OrderedDict[str, tuple]" = OrderedDict()
+_synced_users_lock = threading.Lock()
+
+def _forget_synced_user(uid: Optional[str]):
+    with _synced_users_lock:
+        if uid is None:
+            _synced_users.clear()
+        else:
+            _synced_users.pop(uid, None)
+
+def _user_changed(uid: str):
+    _forget_synced_user(uid)
+    cache_bus.publish("assessment_users", uid)
+
+cache_bus.subscribe("assessment_users", lambda event: _forget_synced_user(event.key))
+
 def create_user(user: dict) -> dict:
     conn = get_conn()
     try:
@@ -103,6 +384,7 @@ def create_user(user: dict) -> dict:
             )
             row = cur.fetchone()
         conn.commit()
+        _user_changed(user["id"])
         return dict(row)
     finally:
         put_conn(conn)
@@ -121,7 +403,7 @@ def get_user_by_id(uid: str) -> Optional[dict]:
     conn = get_conn()
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute("SELECT * FROM users WHERE id = %s", (uid,))
+            _execute_prepared(cur, "get_user_by_id", (uid,))
             row = cur.fetchone()
         return dict(row) if row else None
     finally:
@@ -156,6 +438,7 @@ def update_user(uid: str, updates: dict) -> Optional[dict]:
             cur.execute(f"UPDATE users SET {set_clause} WHERE id = %s RETURNING *", (*values, uid))
             row = cur.fetchone()
         conn.commit()
+        _user_changed(uid)
         return dict(row) if row else None
     finally:
         put_conn(conn)
@@ -171,16 +454,23 @@ def upsert_user_from_token(token_data: Any) -> dict:
         "Associate": "candidate"
     }
     role = role_map.get(token_data.role, "candidate")
+    uid = token_data.associate_id
+    identity = (role, token_data.name)
     
-    user = get_user_by_id(token_data.associate_id)
+    with _synced_users_lock:
+        cached = _synced_users.get(uid)
+        if cached is not None and cached[0] == identity and time.monotonic() - cached[2] < settings.ASSESSMENT_USER_SYNC_TTL_SECONDS:
+            _synced_users.move_to_end(uid)
+            return cached[1]
+    
+    user = get_user_by_id(uid)
     if user:
         # Update if role changed or name changed
         if user["role"] != role or user["name"] != token_data.name:
-            return update_user(token_data.associate_id, {"role": role, "name": token_data.name})
-        return user
+            user = update_user(uid, {"role": role, "name": token_data.name})
     else:
         # Create new user
-        return create_user({
+        user = create_user({
             "id": token_data.associate_id,
             "name": token_data.name,
             "email": token_data.email,
@@ -188,6 +478,13 @@ def upsert_user_from_token(token_data: Any) -> dict:
             "role": role,
             "is_first_login": False
         })
+    if user:
+        with _synced_users_lock:
+            _synced_users[uid] = (identity, user, time.monotonic())
+            _synced_users.move_to_end(uid)
+            while len(_synced_users) > settings.ASSESSMENT_USER_SYNC_CACHE_SIZE:
+                _synced_users.popitem(last=False)
+    return user
 
 def delete_user(uid: str) -> bool:
     conn = get_conn()
@@ -196,6 +493,7 @@ def delete_user(uid: str) -> bool:
             cur.execute("UPDATE assessments SET assigned_to = array_remove(assigned_to, %s) WHERE %s = ANY(assigned_to)", (uid, uid))
             cur.execute("DELETE FROM users WHERE id = %s", (uid,))
         conn.commit()
+        _user_changed(uid)
         return True
     finally:
         put_conn(conn)
@@ -224,7 +522,7 @@ def get_assessment(aid: str) -> Optional[dict]:
     conn = get_conn()
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute("SELECT * FROM assessments WHERE assessment_id = %s", (aid,))
+            _execute_prepared(cur, "get_assessment", (aid,))
             row = cur.fetchone()
         if not row: return None
         d = dict(row)
@@ -233,36 +531,47 @@ def get_assessment(aid: str) -> Optional[dict]:
     finally:
         put_conn(conn)
 
+# Assessment metadata for list views: everything but the questions, which only detail and
+# take views load; their count is computed in Postgres
+ASSESSMENT_SUMMARY_COLUMNS = """assessment_id, title, description, difficulty, created_by, created_at,
+    scheduled_for, scheduled_from, scheduled_to, duration_minutes, assigned_to, retake_permissions,
+    CASE WHEN jsonb_typeof(questions) = 'array' THEN jsonb_array_length(questions) ELSE 0 END AS questions_count"""
+
 def get_all_assessments() -> List[dict]:
+    """Summaries (no questions, ``questions_count`` instead) of every assessment, newest first."""
     conn = get_conn()
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute("SELECT * FROM assessments ORDER BY created_at DESC")
-            rows = cur.fetchall()
-        return [{**dict(r), "questions": _parse_json(r["questions"])} for r in rows]
+            cur.execute(f"SELECT {ASSESSMENT_SUMMARY_COLUMNS} FROM assessments ORDER BY created_at DESC")
+            return [dict(r) for r in cur.fetchall()]
     finally:
         put_conn(conn)
 
 def get_assessments_by_candidate(candidate_id: str) -> List[dict]:
+    """Summaries of the assessments assigned to a candidate, newest first."""
     conn = get_conn()
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute("SELECT * FROM assessments WHERE %s = ANY(assigned_to) ORDER BY created_at DESC", (candidate_id,))
-            rows = cur.fetchall()
-        return [{**dict(r), "questions": _parse_json(r["questions"])} for r in rows]
+            cur.execute(
+                f"SELECT {ASSESSMENT_SUMMARY_COLUMNS} FROM assessments WHERE %s = ANY(assigned_to) ORDER BY created_at DESC",
+                (candidate_id,)
+            )
+            return [dict(r) for r in cur.fetchall()]
     finally:
         put_conn(conn)
 
 def get_assessments_by_examiner(examiner_id: str) -> List[dict]:
+    """Summaries of the assessments created by an examiner or by any admin, newest first."""
     conn = get_conn()
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute("SELECT id FROM users WHERE role = %s", ("admin",))
-            admin_ids = [r["id"] for r in cur.fetchall()]
-            ids = [examiner_id] + admin_ids
-            cur.execute("SELECT * FROM assessments WHERE created_by = ANY(%s) ORDER BY created_at DESC", (ids,))
-            rows = cur.fetchall()
-        return [{**dict(r), "questions": _parse_json(r["questions"])} for r in rows]
+            cur.execute(
+                f"""SELECT {ASSESSMENT_SUMMARY_COLUMNS} FROM assessments
+                    WHERE created_by = %s OR created_by IN (SELECT id FROM users WHERE role = %s)
+                    ORDER BY created_at DESC""",
+                (examiner_id, "admin")
+            )
+            return [dict(r) for r in cur.fetchall()]
     finally:
         put_conn(conn)
 
@@ -296,23 +605,83 @@ def delete_assessment(aid: str) -> bool:
     try:
         with conn.cursor() as cur:
             cur.execute("DELETE FROM assessments WHERE assessment_id = %s", (aid,))
+            # Analytics follow the results: dropped only if no results of the assessment remain
+            for table in ("assessment_result_stats", "assessment_result_users", "assessment_score_counts"):
+                cur.execute(
+                    f"DELETE FROM {table} WHERE assessment_id = %s "
+                    "AND NOT EXISTS (SELECT 1 FROM results WHERE assessment_id::text = %s)",
+                    (str(aid), str(aid))
+                )
         conn.commit()
         return True
     finally:
         put_conn(conn)
 
 # --- Results Management ---
-def save_result(result: dict) -> None:
+class AttemptNotAllowed(Exception):
+    """The user has already attempted the assessment and holds no retake permission."""
+
+def _lock_attempts(cur, assessment_id: str, user_id: str) -> None:
+    """Serialise attempt writes of one (assessment, user) until the transaction ends."""
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"attempt:{assessment_id}:{user_id}",))
+
+def _count_attempts(cur, assessment_id: str, user_id: str) -> int:
+    name = "count_attempts" if _use_attempt_columns(cur) else "count_attempts_json"
+    _execute_prepared(cur, name, (assessment_id, user_id))
+    return cur.fetchone()[0]
+
+def _write_result(cur, result: dict, attempt_number: int) -> None:
+    """Write a result, completing the started placeholder if there is one (attempt lock held)."""
+    aid, uid = result["assessment_id"], result["user_id"]
+    # Like placeholders, a result without questions does not count as an attempt
+    graded = bool(result.get("total_questions"))
+    if not graded:
+        attempt_number = 0
+    if _use_attempt_columns(cur):
+        params = (aid, uid, json.dumps(result), _now_iso(), "graded" if graded else "started",
+                  attempt_number, float(result.get("score") or 0) if graded else None)
+        _execute_prepared(cur, "complete_started_result", params)
+        if cur.fetchone() is None:
+            _execute_prepared(cur, "insert_result", params)
+    else:
+        _execute_prepared(cur, "find_placeholder_result_json", (aid, uid))
+        placeholder = cur.fetchone()
+        if placeholder:
+            _execute_prepared(cur, "update_result_json", (json.dumps(result), _now_iso(), placeholder[0]))
+        else:
+            _execute_prepared(cur, "insert_result_json", (aid, uid, json.dumps(result), _now_iso()))
+    if graded:
+        _record_result_stats(cur, result)
+
+def save_graded_result(result: dict) -> int:
+    """Save a graded attempt and return its attempt number, all in one transaction.
+
+    The attempt check, the use of a retake permission and the write run under
+    a lock on (assessment, user), so concurrent submissions by one user cannot
+    both count as their first attempt. Raises AttemptNotAllowed if the user
+    already attempted the assessment and has no retake permission.
+    """
+    aid, uid = result["assessment_id"], result["user_id"]
     conn = get_conn()
     try:
         with conn.cursor() as cur:
-            cur.execute("SELECT id FROM results WHERE assessment_id = %s AND user_id = %s AND (result->>'total_questions')::int = 0", (result["assessment_id"], result["user_id"]))
-            placeholder = cur.fetchone()
-            if placeholder:
-                cur.execute("UPDATE results SET result = %s::jsonb, timestamp = %s WHERE id = %s", (json.dumps(result), _now_iso(), placeholder[0]))
-            else:
-                cur.execute("INSERT INTO results (assessment_id, user_id, result, timestamp) VALUES (%s, %s, %s::jsonb, %s)", (result["assessment_id"], result["user_id"], json.dumps(result), _now_iso()))
+            _lock_attempts(cur, aid, uid)
+            attempts = _count_attempts(cur, aid, uid)
+            if attempts > 0:
+                # A retake permission allows exactly one more attempt
+                cur.execute(
+                    "UPDATE assessments SET retake_permissions = array_remove(retake_permissions, %s) "
+                    "WHERE assessment_id = %s AND %s = ANY(retake_permissions)",
+                    (uid, aid, uid)
+                )
+                if cur.rowcount == 0:
+                    raise AttemptNotAllowed(f"{uid} has already attempted {aid}")
+            _write_result(cur, result, attempts + 1)
         conn.commit()
+        return attempts + 1
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         put_conn(conn)
 
@@ -336,6 +705,38 @@ def get_results_by_user(user_id: str) -> List[dict]:
     finally:
         put_conn(conn)
 
+def get_results_with_users(assessment_id: str) -> List[dict]:
+    """Results of an assessment joined with their user's name and email (None if the user is gone)."""
+    conn = get_conn()
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(
+                """SELECT r.*, u.name AS user_name, u.email AS user_email
+                   FROM results r LEFT JOIN users u ON u.id = r.user_id
+                   WHERE r.assessment_id = %s ORDER BY r.timestamp DESC""",
+                (assessment_id,)
+            )
+            rows = cur.fetchall()
+        return [{**dict(r), "result": _parse_json(r["result"])} for r in rows]
+    finally:
+        put_conn(conn)
+
+def get_results_with_titles(user_id: str) -> List[dict]:
+    """Results of a user joined with their assessment's title (None if the assessment is gone)."""
+    conn = get_conn()
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(
+                """SELECT r.*, a.title AS assessment_title
+                   FROM results r LEFT JOIN assessments a ON a.assessment_id = r.assessment_id
+                   WHERE r.user_id = %s ORDER BY r.timestamp DESC""",
+                (user_id,)
+            )
+            rows = cur.fetchall()
+        return [{**dict(r), "result": _parse_json(r["result"])} for r in rows]
+    finally:
+        put_conn(conn)
+
 def get_all_results() -> List[dict]:
     conn = get_conn()
     try:
@@ -346,29 +747,82 @@ def get_all_results() -> List[dict]:
     finally:
         put_conn(conn)
 
+def get_result_analytics(assessment_ids: Optional[List[str]] = None) -> List[dict]:
+    """Per-assessment result analytics (attempts, unique users, score distribution, times).
+
+    Read from the analytics tables, so the cost does not grow with the number of results.
+    """
+    params: tuple = ()
+    where = ""
+    if assessment_ids is not None:
+        where = "WHERE s.assessment_id = ANY(%s)"
+        params = ([str(a) for a in assessment_ids],)
+    conn = get_conn()
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(
+                f"""SELECT s.*, m.score AS score_median
+                    FROM assessment_result_stats s
+                    LEFT JOIN LATERAL (
+                        -- Upper median: the score at position attempts / 2 of the sorted scores
+                        SELECT score FROM (
+                            SELECT score, SUM(attempts) OVER (ORDER BY score) AS running
+                            FROM assessment_score_counts c WHERE c.assessment_id = s.assessment_id
+                        ) h WHERE running > s.attempts / 2 ORDER BY score LIMIT 1
+                    ) m ON TRUE
+                    {where}""",
+                params
+            )
+            return [dict(r) for r in cur.fetchall()]
+    finally:
+        put_conn(conn)
+
 def get_user_attempt_count(assessment_id: str, user_id: str) -> int:
     conn = get_conn()
     try:
         with conn.cursor() as cur:
-            cur.execute("SELECT COUNT(*) FROM results WHERE assessment_id = %s AND user_id = %s AND (result->>'total_questions')::int > 0", (assessment_id, user_id))
-            return cur.fetchone()[0]
+            return _count_attempts(cur, assessment_id, user_id)
     finally:
         put_conn(conn)
 
 def mark_assessment_started(assessment_id: str, user_id: str) -> None:
+    """Record that the user opened the assessment, unless they already have a result.
+
+    The unique index on started rows turns a concurrent second start into a
+    no-op instead of a duplicate placeholder.
+    """
     conn = get_conn()
     try:
         with conn.cursor() as cur:
-            cur.execute("SELECT id FROM results WHERE assessment_id = %s AND user_id = %s", (assessment_id, user_id))
-            if cur.fetchone(): return
+            _lock_attempts(cur, assessment_id, user_id)
+            columns = _use_attempt_columns(cur)
+            if columns:
+                already = _count_attempts(cur, assessment_id, user_id)
+            else:
+                cur.execute("SELECT id FROM results WHERE assessment_id = %s AND user_id = %s", (assessment_id, user_id))
+                already = cur.fetchone() is not None
+            if already:
+                conn.rollback()
+                return
             placeholder = {
                 "assessment_id": assessment_id, "user_id": user_id, "score": 0, "max_score": 100,
                 "total_questions": 0, "correct_count": 0, "detailed": [],
                 "analytics": {"time_taken_seconds": 0, "accuracy_percent": 0, "avg_time_per_question_seconds": 0},
                 "graded_at": _now_iso()
             }
-            cur.execute("INSERT INTO results (assessment_id, user_id, result, timestamp) VALUES (%s, %s, %s::jsonb, %s)", (assessment_id, user_id, json.dumps(placeholder), _now_iso()))
+            if columns:
+                cur.execute(
+                    """INSERT INTO results (assessment_id, user_id, result, timestamp, status, attempt_number)
+                       VALUES (%s, %s, %s::jsonb, %s, 'started', 0)
+                       ON CONFLICT (assessment_id, user_id) WHERE status = 'started' DO NOTHING""",
+                    (assessment_id, user_id, json.dumps(placeholder), _now_iso())
+                )
+            else:
+                _execute_prepared(cur, "insert_result_json", (assessment_id, user_id, json.dumps(placeholder), _now_iso()))
         conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         put_conn(conn)
 
@@ -0,0 +1,58 @@
+"""
+Async facade over the assessment database helpers.
+
+The helpers in ``utils.assessment_db`` use psycopg2, which blocks: called
+from an ``async def`` route, every query stalls the event loop and every
+other request in the worker. This wrapper runs each helper on a thread pool
+the size of the connection pool, with a timeout, so routes can ``await``
+queries and ``asyncio.gather`` independent ones. The hot queries behind it
+are prepared statements (see ``PREPARED_STATEMENTS``).
+"""
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from config import settings
+from utils import assessment_db
+
+logger = logging.getLogger("chrms.assessment.db")
+
+
+class AsyncAssessmentDB:
+    def __init__(self, module, max_workers: int = 20, timeout: Optional[float] = 30):
+        self._module = module
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="assessment-db")
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run a blocking database call on the pool's threads, with a timeout."""
+        loop = asyncio.get_running_loop()
+        call = loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        limit = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(call, limit)
+        except asyncio.TimeoutError:
+            name = getattr(fn, "__name__", repr(fn))
+            logger.error(f"Assessment DB call {name} timed out after {limit}s")
+            raise TimeoutError(f"Assessment DB call {name} timed out after {limit}s") from None
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._module, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        return call
+
+
+# Singleton instance
+async_assessment_db = AsyncAssessmentDB(
+    assessment_db,
+    max_workers=settings.ASSESSMENT_DB_POOL_SIZE,
+    timeout=settings.ASSESSMENT_DB_CALL_TIMEOUT_SECONDS
+)
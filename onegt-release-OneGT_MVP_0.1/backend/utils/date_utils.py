@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Optional
 
 def format_date_for_sheet(iso_date_str: str) -> str:
     """
@@ -41,3 +42,25 @@ def parse_date_from_sheet(sheet_date_str: str) -> str:
             continue
     
     return sheet_date_str
+
+# Formats seen in sheet date columns, most common first
+SHEET_DATE_FORMATS = [
+    "%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y",
+    "%Y/%m/%d", "%d-%b-%Y", "%b %y", "%d %b %Y"
+]
+
+def parse_sheet_datetime(date_str) -> Optional[datetime]:
+    """
+    Parses a sheet date in any of SHEET_DATE_FORMATS into a datetime.
+    Returns None if the value is empty or not a recognised date.
+    """
+    if not date_str or not str(date_str).strip():
+        return None
+
+    date_str = str(date_str).strip()
+    for fmt in SHEET_DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+    return None
@@ -1,34 +1,60 @@
 """
 cache.py – Simple in-memory TTL cache (mirrors src/lib/api-cache.ts)
+
+With SHARED_CACHE_PATH set, entries live in the shared cache tier instead,
+so every worker sees the same entries and a clear() in one reaches all.
+Clears are also published on the cache invalidation bus for replicas on
+other hosts.
 """
 import time
 from typing import Any, Optional
 
+from services.cache_bus import CacheEvent, cache_bus
+from services.shared_cache import SharedCacheTier, open_shared_tier
+
 TTL_SECONDS = 300  # 5 minutes
 
 
 class ApiCache:
-    def __init__(self) -> None:
+    def __init__(self, shared: Optional[SharedCacheTier] = None) -> None:
         self._store: dict[str, tuple[Any, float]] = {}
+        self._shared = shared
 
     def get(self, key: str) -> Optional[Any]:
-        entry = self._store.get(key)
+        if self._shared is not None:
+            found = self._shared.get(key)
+            entry = found[0] if found else None
+        else:
+            entry = self._store.get(key)
         if entry is None:
             return None
         value, expires_at = entry
         if time.time() > expires_at:
-            self._store.pop(key, None)
+            self._drop(key)
             return None
         return value
 
     def set(self, key: str, value: Any, ttl: int = TTL_SECONDS) -> None:
-        self._store[key] = (value, time.time() + ttl)
+        if self._shared is not None:
+            self._shared.put(key, (value, time.time() + ttl), time.time())
+        else:
+            self._store[key] = (value, time.time() + ttl)
 
     def clear(self, key: Optional[str] = None) -> None:
-        if key:
+        self._drop(key)
+        cache_bus.publish("api", key or None)
+
+    def on_remote_change(self, event: CacheEvent) -> None:
+        self._drop(event.key)
+
+    def _drop(self, key: Optional[str]) -> None:
+        if self._shared is not None:
+            self._shared.invalidate(key or None)
+        elif key:
             self._store.pop(key, None)
         else:
             self._store.clear()
 
 
-api_cache = ApiCache()
+api_cache = ApiCache(open_shared_tier("api"))
+cache_bus.subscribe("api", api_cache.on_remote_change)